@@ -0,0 +1,62 @@
+import argparse
+import ast
+import sys
+import timeit
+from types import CodeType
+from typing import Dict, Any
+from src.blockchain.contract import create_safe_environment
+from src.blockchain.gas import GasMeter, instrument
+
+# Representative contracts, from a tight arithmetic loop (the worst case for metering) to dict heavy state updates
+WORKLOADS: Dict[str, str] = {
+    'tight_loop': "total = 0\nfor i in range(params['n']):\n    total += i\nstate['total'] = total",
+    'state_updates': "for i in range(params['n']):\n    key = str(i % 100)\n    state[key] = state.get(key, 0) + i * 2",
+    'function_calls': "def fee(amount):\n    return amount * 3 // 100\nstate['fees'] = 0\n"
+                      "for i in range(params['n']):\n    state['fees'] += fee(i)",
+    'comprehension': "state['squares'] = sum([i * i for i in range(params['n']) if i % 3])",
+}
+
+
+class NullInterface:
+    def get_balance(self, address: str) -> float:
+        return 0
+
+    def get_block_number(self) -> int:
+        return 0
+
+
+def run(compiled: CodeType, params: Dict[str, Any]) -> None:
+    meter = GasMeter(10 ** 12)
+    exec(compiled, create_safe_environment(NullInterface(), {}, params, meter), {})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the overhead of contract gas metering')
+    parser.add_argument('--iterations', type=int, default=100000, help='Loop iterations per contract call')
+    parser.add_argument('--repeat', type=int, default=10, help='Timing runs per workload')
+    parser.add_argument('--max-overhead', type=float, default=50.0,
+                        help='Fail when the metered code is slower than this percentage over the plain code')
+    args = parser.parse_args()
+
+    params = {'n': args.iterations}
+    overheads: Dict[str, float] = {}
+    for name, code in WORKLOADS.items():
+        plain = compile(ast.parse(code), name, 'exec')
+        metered = compile(instrument(ast.parse(code)), name, 'exec')
+        # Interleaved so both versions see the same machine load, the fastest run of each counts
+        plain_time, metered_time = float('inf'), float('inf')
+        for _ in range(args.repeat):
+            plain_time = min(plain_time, timeit.timeit(lambda: run(plain, params), number=1))
+            metered_time = min(metered_time, timeit.timeit(lambda: run(metered, params), number=1))
+        overheads[name] = (metered_time / plain_time - 1) * 100
+        print(f"{name:16} plain {plain_time * 1e3:8.2f} ms  metered {metered_time * 1e3:8.2f} ms  "
+              f"overhead {overheads[name]:6.1f}%")
+
+    worst = max(overheads, key=overheads.get)
+    print(f"Worst case: {worst} at {overheads[worst]:.1f}% (limit {args.max_overhead:.1f}%)")
+    if overheads[worst] > args.max_overhead:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import random
+import string
+import time
+from typing import List, Callable
+from src.blockchain.hashing import hashing_algorithm, hashing_algorithm_many, prime_table
+from src.blockchain.primes import sieve_primes
+
+
+def random_inputs(count: int, max_length: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [''.join(rng.choices(string.ascii_letters, k=rng.randint(1, max_length))) for _ in range(count)]
+
+
+def timed(f: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the custom hashing algorithm')
+    parser.add_argument('--inputs', type=int, default=2000, help='Number of strings to hash')
+    parser.add_argument('--max-length', type=int, default=64, help='Longest input string')
+    parser.add_argument('--sympy-inputs', type=int, default=20, help='Inputs hashed through sympy.prime for comparison')
+    args = parser.parse_args()
+
+    inputs = random_inputs(args.inputs, args.max_length)
+    print(f"Prime table build/load: {timed(lambda: hashing_algorithm_many(inputs[:1] + [max(inputs, key=len)])):.3f}s "
+          f"({prime_table.count} primes)")
+
+    single = timed(lambda: [hashing_algorithm(s) for s in inputs])
+    batch = timed(lambda: hashing_algorithm_many(inputs))
+    print(f"hashing_algorithm:      {args.inputs / single:,.0f} hashes/s")
+    print(f"hashing_algorithm_many: {args.inputs / batch:,.0f} hashes/s")
+
+    try:
+        from sympy import prime
+    except ImportError:
+        print("sympy not installed, skipping the comparison with sympy.prime")
+        return
+    sample = inputs[:args.sympy_inputs]
+    lookups = [len(s) ** 5 % 9999999 for s in sample]
+    with_sympy = timed(lambda: [prime(n) for n in lookups if n])
+    with_table = timed(lambda: [prime_table.nth(n) for n in lookups if n])
+    print(f"n-th prime lookup: sympy {with_sympy / len(sample) * 1e3:.2f} ms, table {with_table / len(sample) * 1e6:.2f} us "
+          f"({with_sympy / max(with_table, 1e-9):,.0f}x faster)")
+    print(f"Sieve of the first 100k primes: {timed(lambda: sieve_primes(100000)):.3f}s")
+
+
+if __name__ == '__main__':
+    main()
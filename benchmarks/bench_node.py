@@ -0,0 +1,206 @@
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List, Callable, Optional
+from benchmarks.synthetic import build_chain, account_names, proof_chain
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.hashing import hashing_algorithm
+from src.blockchain.helpers import hash_block
+from src.blockchain.miner import Miner
+from src.config.config import BLOCKCHAIN_CONFIG
+
+config = BLOCKCHAIN_CONFIG
+
+
+def measure(results: Dict[str, Dict[str, float]], name: str, operations: int, f: Callable[[], Any],
+            repeat: int = 1) -> None:
+    # Keeps the fastest of repeat runs; operations is how many units of work one run performs
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    results[name] = {'seconds': best, 'operations': operations, 'ops_per_sec': operations / best if best > 0 else 0.0}
+    print(f"{name:32} {best * 1e3:10.2f} ms  {results[name]['ops_per_sec']:14,.0f} ops/s")
+
+
+def bench_chain(blockchain: Blockchain, args: argparse.Namespace, results: Dict[str, Dict[str, float]]) -> None:
+    rng = random.Random(1)
+    names = account_names(args.accounts)
+    users = [rng.choice(names) for _ in range(args.operations)]
+
+    measure(results, 'get_user_balance', len(users), lambda: [blockchain.get_user_balance(user) for user in users],
+            args.repeat)
+    measure(results, 'hash_block', len(blockchain.chain), lambda: [hash_block(block) for block in blockchain.chain],
+            args.repeat)
+
+    def validate() -> None:
+        blockchain._truncate_verified(0)
+        blockchain.is_chain_valid()
+    measure(results, 'is_chain_valid', len(blockchain.chain), validate, args.repeat)
+    measure(results, 'is_chain_valid_incremental', 1, blockchain.is_chain_valid, args.repeat)
+
+    with tempfile.TemporaryDirectory() as directory:
+        def save() -> None:
+            blockchain.store = None
+            blockchain.persisted_height = 0
+            blockchain.state_dirty = True
+            blockchain.save_chain(f'{directory}/chain')
+        measure(results, 'save_chain', len(blockchain.chain), save)
+        loaded = Blockchain()
+        loaded.executor = None
+        measure(results, 'load_chain', len(blockchain.chain), lambda: loaded.load_chain(f'{directory}/chain'))
+        loaded.store.close()
+        blockchain.store.close()
+        blockchain.store = None
+
+    # Transactions on top of the synthetic chain, then the block that takes them out of the mempool
+    count = min(args.operations, config['BLOCK_MAX_TRANSACTIONS'])
+    pairs = [rng.sample(names, 2) for _ in range(count)]
+    measure(results, 'add_transaction', count,
+            lambda: [blockchain.add_transaction(sender, receiver, 1) for sender, receiver in pairs])
+    prev_block = blockchain.get_prev_block()
+    proof = proof_chain(len(blockchain.chain) + 1, args.cache_dir)[-1]
+    measure(results, 'create_block', count, lambda: blockchain.create_block(proof, hash_block(prev_block)))
+
+
+def bench_routes(blockchain: Blockchain, args: argparse.Namespace, results: Dict[str, Dict[str, float]]) -> None:
+    # The routes work on the module level blockchain, which is swapped for the synthetic one.
+    # src.api re-exports the blueprint under the module's name, so the module is looked up directly
+    routes = importlib.import_module('src.api.routes')
+    from src.api.app import app
+    client = app.test_client()
+    names = account_names(args.accounts)
+    requests_per_route = max(args.operations // 10, 1)
+
+    # Routes that save write to CHAIN_DIR and CONTRACT_DIR, which must not be the node's real ones
+    directory = tempfile.TemporaryDirectory()
+    directories = {name: config[name] for name in ('CHAIN_DIR', 'CONTRACT_DIR')}
+    config.update({'CHAIN_DIR': f'{directory.name}/chain', 'CONTRACT_DIR': f'{directory.name}/contracts'})
+    original, routes.blockchain = routes.blockchain, blockchain
+    try:
+        for name, call in [
+            ('route_chain_tip', lambda i: client.get('/chain_tip')),
+            ('route_get_balance', lambda i: client.get(f'/get_balance/{names[i % len(names)]}')),
+            ('route_get_chain_page', lambda i: client.get('/get_chain?limit=100')),
+            ('route_get_chain_full', lambda i: client.get('/get_chain')),
+            ('route_add_transaction', lambda i: client.post('/add_transaction', json={
+                'sender': names[i % len(names)], 'receiver': names[(i + 1) % len(names)], 'amount': 1})),
+        ]:
+            measure(results, name, requests_per_route, lambda: [call(i) for i in range(requests_per_route)])
+    finally:
+        routes.blockchain = original
+        config.update(directories)
+        if blockchain.store is not None:
+            blockchain.store.close()
+            blockchain.store = None
+        directory.cleanup()
+
+
+def bench_hashing(args: argparse.Namespace, results: Dict[str, Dict[str, float]]) -> None:
+    rng = random.Random(2)
+    inputs = [''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(1, 64))) for _ in range(args.operations)]
+    hashing_algorithm(max(inputs, key=len))  # loads the prime table outside the timing
+    measure(results, 'hashing_algorithm', len(inputs), lambda: [hashing_algorithm(s) for s in inputs], args.repeat)
+
+
+def bench_pow(args: argparse.Namespace, results: Dict[str, Dict[str, float]]) -> None:
+    miner = Miner(workers=args.pow_workers)
+    try:
+        for difficulty in args.pow_difficulties:
+            hashes = 0
+
+            def mine() -> None:
+                nonlocal hashes
+                # Several previous proofs, since the work needed for a single one varies a lot
+                for prev_proof in range(1, args.pow_samples + 1):
+                    miner.mine(prev_proof, difficulty)
+                    hashes += miner.last_stats['hashes']
+            measure(results, f'proof_of_work_d{difficulty}', args.pow_samples, mine)
+            results[f'proof_of_work_d{difficulty}']['hash_rate'] = hashes / results[f'proof_of_work_d{difficulty}']['seconds']
+    finally:
+        miner.shutdown()
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    # Operations whose throughput fell by more than tolerance percent against the baseline
+    regressions: List[str] = []
+    print(f"\n{'operation':32} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline or not baseline[name]['ops_per_sec']:
+            continue
+        change = (result['ops_per_sec'] / baseline[name]['ops_per_sec'] - 1) * 100
+        flag = ''
+        if change < -tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:32} {baseline[name]['ops_per_sec']:14,.0f} {result['ops_per_sec']:14,.0f} {change:+7.1f}%{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Benchmark node operations on a synthetic chain')
+    parser.add_argument('--transactions', type=int, default=10000, help='Transactions on the synthetic chain')
+    parser.add_argument('--accounts', type=int, default=1000, help='Accounts the transactions are spread over')
+    parser.add_argument('--block-size', type=int, default=500, help='Transactions per synthetic block')
+    parser.add_argument('--operations', type=int, default=2000, help='Calls per measured operation')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of the cheap operations, the fastest counts')
+    parser.add_argument('--pow-difficulties', type=lambda s: [int(d) for d in s.split(',')], default=[2, 3, 4],
+                        help='Comma separated proof of work difficulties')
+    parser.add_argument('--pow-samples', type=int, default=5, help='Proofs mined per difficulty')
+    parser.add_argument('--pow-workers', type=int, default=1, help='Mining processes, 0 uses every CPU')
+    parser.add_argument('--cache-dir', default='cache', help='Where the synthetic proof sequence is cached')
+    parser.add_argument('--skip', default='', help='Comma separated groups to skip: chain, routes, hashing, pow')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=20.0,
+                        help='Percent drop in throughput against the baseline reported as a regression')
+    args = parser.parse_args(argv)
+    args.block_size = min(args.block_size, config['BLOCK_MAX_TRANSACTIONS'])
+    skip = set(filter(None, args.skip.split(',')))
+
+    results: Dict[str, Dict[str, float]] = {}
+    if not {'chain', 'routes'} <= skip:
+        start = time.perf_counter()
+        blockchain = build_chain(args.transactions, args.accounts, args.block_size, args.cache_dir)
+        print(f"Built a chain of {len(blockchain.chain)} blocks with {args.transactions} transactions "
+              f"over {args.accounts} accounts in {time.perf_counter() - start:.1f}s\n")
+        if 'chain' not in skip:
+            bench_chain(blockchain, args, results)
+        if 'routes' not in skip:
+            bench_routes(blockchain, args, results)
+    if 'hashing' not in skip:
+        bench_hashing(args, results)
+    if 'pow' not in skip:
+        bench_pow(args, results)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'arguments': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['meta']['arguments'] != report['meta']['arguments']:
+            print("Warning: the baseline was run with different arguments")
+        if compare(results, baseline['results'], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
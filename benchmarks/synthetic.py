@@ -0,0 +1,66 @@
+import json
+import os
+import random
+import threading
+from typing import List, Dict, Any
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.helpers import hash_block
+from src.blockchain.miner import Miner, search_nonces
+from src.config.config import BLOCKCHAIN_CONFIG
+
+config = BLOCKCHAIN_CONFIG
+
+
+def proof_chain(length: int, cache_dir: str, difficulty: int = config['DIFFICULTY']) -> List[int]:
+    # A block's proof only depends on the previous proof, so one sequence serves every synthetic
+    # chain. It is cached on disk because mining it is the slow part of building a large chain.
+    path = os.path.join(cache_dir, f'bench_proofs_{difficulty}.json')
+    proofs: List[int] = [1]
+    if os.path.exists(path):
+        with open(path) as file:
+            proofs = json.load(file)
+    if len(proofs) < length:
+        stop = threading.Event()
+        while len(proofs) < length:
+            proof, _ = search_nonces(1, 10000, 10000, proofs[-1], difficulty, stop)
+            stop.clear()
+            proofs.append(proof)
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(proofs, file)
+    return proofs[:length]
+
+
+def account_names(accounts: int) -> List[str]:
+    return [f'account{i:07d}' for i in range(accounts)]
+
+
+def build_chain(transactions: int, accounts: int, block_size: int, cache_dir: str, seed: int = 0) -> Blockchain:
+    # Funds every account with system rewards, then fills blocks with random transfers between them.
+    # Everything goes through add_transaction/create_block, so the ledger and mempool are built as in a live node.
+    rng = random.Random(seed)
+    names = account_names(accounts)
+    funding_blocks = -(-accounts // block_size)
+    transfer_blocks = -(-transactions // block_size)
+    proofs = proof_chain(1 + funding_blocks + transfer_blocks, cache_dir)
+
+    # Twice what an average account spends on transfers of at most 100 plus gas
+    funding = 200 * (transactions // accounts + 1)
+    blockchain = Blockchain()
+    blockchain.executor = None
+    blockchain.miner = Miner(workers=1)
+
+    def seal() -> None:
+        prev_block: Dict[str, Any] = blockchain.get_prev_block()
+        blockchain.create_block(proofs[len(blockchain.chain)], hash_block(prev_block))
+
+    for start in range(0, accounts, block_size):
+        for name in names[start:start + block_size]:
+            blockchain.add_transaction('0', name, funding)
+        seal()
+    for start in range(0, transactions, block_size):
+        for _ in range(min(block_size, transactions - start)):
+            sender, receiver = rng.sample(names, 2) if accounts > 1 else (names[0], names[0])
+            blockchain.add_transaction(sender, receiver, rng.randint(1, 100))
+        seal()
+    return blockchain
@@ -1,5 +1,4 @@
 import argparse
-from src.api.app import app
 from src.utils.logger import setup_logger
 import signal
 import sys
@@ -11,11 +10,18 @@ def main():
     parser.add_argument('--port', type=int, default=5000, help='Flask app PORT argument')
     parser.add_argument('--host', type=str, default='127.0.0.1', help='Flask app HOST argument')
     parser.add_argument('--debug', action='store_true', help='Enable Flask debug mode')
+    parser.add_argument('--workers', type=int, default=1, help='Reader processes; more than 1 adds a single writer behind them')
+    parser.add_argument('--writer-port', type=int, default=None, help='Local port of the writer process, defaults to PORT + 1')
     args = parser.parse_args()
     
     logger.info(f"Starting server on {args.host}:{args.port}")
     try:
-        app.run(host=args.host, port=args.port, debug=args.debug)
+        if args.workers > 1:
+            from src.serving.server import serve
+            serve(args.host, args.port, args.workers, args.writer_port or args.port + 1)
+        else:
+            from src.api.app import app
+            app.run(host=args.host, port=args.port, debug=args.debug)
     except Exception as e:
         logger.error(f"Server failed to start: {str(e)}")
         raise
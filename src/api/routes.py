@@ -1,11 +1,16 @@
 from flask import request, Blueprint, Response
-from typing import Tuple, Dict, List, Any, Optional
+from typing import Tuple, Dict, List, Any, Optional, Callable
 from src.blockchain.blockchain import Blockchain
-from src.blockchain.helpers import make_response, validate_fields, hash_block
+from src.blockchain.executor import ExecutorBusy
+from src.blockchain.gas import OutOfGas
+from src.blockchain.helpers import make_response, make_blocks_response, make_not_modified_response, validate_fields, hash_block
 from src.config.config import BLOCKCHAIN_CONFIG, LOGGING_CONFIG
 from src.utils.logger import setup_logger   
 from src.utils.middleware import log_requests
+from src.utils import metrics
 import datetime
+import functools
+from urllib.parse import urlparse
 
 
 config = BLOCKCHAIN_CONFIG
@@ -18,6 +23,28 @@ routes = Blueprint('routes', __name__)
 blockchain = Blockchain()
 
 
+def serialized(handler: Callable[..., Tuple[Response, int]]) -> Callable[..., Tuple[Response, int]]:
+    # Requests are served on concurrent threads, so routes that change the node hold its lock
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs) -> Tuple[Response, int]:
+        with blockchain.lock:
+            return handler(*args, **kwargs)
+    return wrapper
+
+# Node state, read from the blockchain only when /metrics is scraped
+for name, help_text, read in [
+    ('blockchain_chain_height', 'Blocks on the local chain', lambda: len(blockchain.chain)),
+    ('blockchain_verified_height', 'Blocks that passed validation', lambda: blockchain.verified_height),
+    ('blockchain_mempool_transactions', 'Transactions waiting in the mempool', lambda: len(blockchain.mempool)),
+    ('blockchain_mempool_bytes', 'Serialized size of the mempool', lambda: blockchain.mempool.size_bytes),
+    ('blockchain_peers', 'Registered peer nodes', lambda: len(blockchain.nodes)),
+    ('blockchain_gossip_pending', 'Transactions queued for peers', lambda: blockchain.gossip.pending()),
+    ('blockchain_gossip_dropped', 'Transactions dropped from the gossip queues', lambda: blockchain.gossip.dropped),
+    ('blockchain_pow_hash_rate', 'Hash rate of the last proof of work', lambda: blockchain.miner.last_stats.get('hash_rate', 0)),
+]:
+    metrics.REGISTRY.register(metrics.Gauge(name, help_text, read))
+
+
 # Mine a block
 @routes.route('/mine_block', methods=['POST'])
 @log_requests
@@ -26,37 +53,40 @@ def mine_block() -> Tuple[Response, int]:
     try:
         # getting miner info:
         request_data: Optional[Dict[str, Any]] = request.get_json()
-        logger.info(f'Received request data')
+        logger.debug('Received request data')
         if not request_data or 'miner_address' not in request_data:
             message: str = 'Miner address is required to proceed'
             return make_response(message, 400)
 
         miner_address: str = request_data['miner_address']
 
-        # mining process:
-        logger.info(f'Mining block')
+        # mining process, outside the node lock so other requests, and a replace_chain cancelling it, are served meanwhile:
+        logger.debug('Mining block')
         prev_block: Dict[str, Any] = blockchain.get_prev_block()
-        proof: int = blockchain.proof_of_work(prev_block['proof'])
+        proof: Optional[int] = blockchain.proof_of_work(prev_block['proof'])
+        if proof is None:
+            logger.warning('Mining cancelled, the chain was replaced by a longer one')
+            return make_response('Mining cancelled, the chain was replaced by a longer one', 409)
         prev_hash: str = hash_block(prev_block)
-        logger.info(f'Block mined successfully')
-
-        # Add mining reward before creating new block
-        logger.info(f'Adding mining reward')
-        total_gas: float = sum(transaction['gas'] for transaction in blockchain.mempool)
-        blockchain.add_transaction(sender='0', receiver=miner_address, amount=config['BLOCK_REWARD'] + total_gas)
-        logger.info(f'Mining reward added successfully')
-
-        # Create the block with updated mempool including mining reward
-        logger.info(f'Creating block')
-        block: Dict[str, Any] = blockchain.create_block(proof, prev_hash)
-        logger.info(f'Block created successfully')
-
-        message: str = 'Congratulations on mining a block!'
-        data: Dict[str, Any] = block
-        logger.info(f'Saving chain')
-        blockchain.save_chain()
-        logger.info(f'Chain saved successfully')
-        logger.info(f"Block {block['index']} mined successfully")
+        logger.debug('Block mined successfully')
+
+        with blockchain.lock:
+            if blockchain.get_prev_block() is not prev_block:
+                # Another block or chain took the tip while mining, so the proof no longer extends it
+                logger.warning('Mined block is stale, the chain tip changed while mining')
+                return make_response('Mined block is stale, the chain tip changed while mining', 409)
+
+            # Create the block, with the mining reward for the gas of the transactions it holds
+            logger.debug('Creating block')
+            block: Dict[str, Any] = blockchain.create_block(proof, prev_hash, reward_address=miner_address)
+            logger.debug('Block created successfully')
+
+            message: str = 'Congratulations on mining a block!'
+            data: Dict[str, Any] = dict(block.to_dict(), hash_rate=blockchain.miner.last_stats['hash_rate'])
+            logger.debug('Saving chain')
+            blockchain.save_chain()
+            logger.debug('Chain saved successfully')
+        logger.info("Block %s mined successfully", block['index'])
         return make_response(message, 200, data)
     except Exception as e:
         logger.error(f"Error mining block: {str(e)}")
@@ -66,6 +96,7 @@ def mine_block() -> Tuple[Response, int]:
 # Registering a node
 @routes.route('/register_node', methods=['POST'])
 @log_requests
+@serialized
 def register_node() -> Tuple[Response, int]:
     logger.info("Processing register_node request")
     try:
@@ -93,20 +124,35 @@ def register_node() -> Tuple[Response, int]:
         return make_response(f'Error while registering nodes: {str(e)}', 500)
 
 
-# Getting the full blockchain
+# Getting the blockchain, optionally a range of it: /get_chain?from=<index>&to=<index>&limit=<count>
 @routes.route('/get_chain', methods=['GET'])
 @log_requests
 def get_chain() -> Tuple[Response, int]:
     try:
         logger.info("Processing get_chain request")
+        length: int = len(blockchain.chain)
+        start: int = request.args.get('from', 1, type=int)
+        end: int = request.args.get('to', length, type=int)
+        limit: Optional[int] = request.args.get('limit', type=int)
+        if limit is not None:
+            end = min(end, start + min(limit, config['CHAIN_PAGE_LIMIT']) - 1)
+        start, end = max(start, 1), min(end, length)
+
+        # Mined blocks never change, so the tip hash and the range identify the response
+        etag: str = f"{blockchain.get_tip_hash()}-{start}-{end}"
+        if request.if_none_match.contains(etag):
+            logger.info("Chain not modified since last request")
+            return make_not_modified_response(etag)
+
         message: str = 'Blockchain length fetch successful'
         data: Dict[str, Any] = {
-            'chain': blockchain.chain,
-            'length': len(blockchain.chain)
+            'length': length,
+            'from': start,
+            'to': end
         }
-        logger.info(f"Returning chain with length {len(blockchain.chain)}")
-        response: Tuple[Response, int] = make_response(message, 200, data)
-        blockchain.save_chain()
+        logger.info(f"Returning blocks {start} to {end} of chain with length {length}")
+        response: Tuple[Response, int] = make_blocks_response(
+            message, 200, [block.json() for block in blockchain.get_blocks(start, end)], data, etag=etag)
         logger.info("Chain response sent")
         return response
     except Exception as e:
@@ -114,9 +160,111 @@ def get_chain() -> Tuple[Response, int]:
         return make_response(f'Error while getting chain: {str(e)}', 500)
 
 
+# Block headers without transactions, for light clients: /get_headers?from=<index>&to=<index>&limit=<count>
+@routes.route('/get_headers', methods=['GET'])
+@log_requests
+def get_headers() -> Tuple[Response, int]:
+    try:
+        length: int = len(blockchain.chain)
+        start: int = request.args.get('from', 1, type=int)
+        end: int = request.args.get('to', length, type=int)
+        limit: int = request.args.get('limit', config['HEADERS_PAGE_LIMIT'], type=int)
+        end = min(end, start + min(limit, config['HEADERS_PAGE_LIMIT']) - 1)
+        start, end = max(start, 1), min(end, length)
+
+        etag: str = f"headers-{blockchain.get_tip_hash()}-{start}-{end}"
+        if request.if_none_match.contains(etag):
+            return make_not_modified_response(etag)
+
+        message: str = 'Block headers fetch successful'
+        data: Dict[str, Any] = {
+            'headers': blockchain.get_headers(start, end),
+            'length': length,
+            'from': start,
+            'to': end
+        }
+        return make_response(message, 200, data, etag=etag)
+    except Exception as e:
+        logger.error(f"Error getting headers: {str(e)}")
+        return make_response(f'Error while getting headers: {str(e)}', 500)
+
+
+# Merkle inclusion proof for a mined transaction: /get_proof/<transaction_hash>?block=<index>
+@routes.route('/get_proof/<transaction_hash>', methods=['GET'])
+@log_requests
+def get_proof(transaction_hash: str) -> Tuple[Response, int]:
+    try:
+        block_index: Optional[int] = request.args.get('block', type=int)
+        proof: Optional[Dict[str, Any]] = blockchain.get_transaction_proof(transaction_hash, block_index)
+        if proof is None:
+            return make_response(f'Transaction {transaction_hash} not found on the chain', 404)
+        return make_response('Inclusion proof fetch successful', 200, proof)
+    except ValueError as e:
+        return make_response(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error getting inclusion proof: {str(e)}")
+        return make_response(f'Error while getting inclusion proof: {str(e)}', 500)
+
+
+# Looking up a mined or pending transaction by hash
+@routes.route('/get_transaction/<transaction_hash>', methods=['GET'])
+@log_requests
+def get_transaction(transaction_hash: str) -> Tuple[Response, int]:
+    try:
+        result: Optional[Dict[str, Any]] = blockchain.get_transaction(transaction_hash)
+        if result is None:
+            return make_response(f'Transaction {transaction_hash} not found', 404)
+        return make_response('Transaction fetch successful', 200, result)
+    except Exception as e:
+        logger.error(f"Error getting transaction: {str(e)}")
+        return make_response(f'Error while getting transaction: {str(e)}', 500)
+
+
+# Mined transactions sent or received by an address, newest first: /get_history/<address>?offset=<n>&limit=<count>
+@routes.route('/get_history/<address>', methods=['GET'])
+@log_requests
+def get_history(address: str) -> Tuple[Response, int]:
+    try:
+        offset: int = max(request.args.get('offset', 0, type=int), 0)
+        limit: int = request.args.get('limit', config['HISTORY_PAGE_LIMIT'], type=int)
+        limit = max(min(limit, config['HISTORY_PAGE_LIMIT']), 0)
+        total, history = blockchain.get_history(address, offset, limit)
+        data: Dict[str, Any] = {
+            'address': address,
+            'history': history,
+            'total': total,
+            'offset': offset,
+            'limit': limit
+        }
+        return make_response('Address history fetch successful', 200, data)
+    except Exception as e:
+        logger.error(f"Error getting address history: {str(e)}")
+        return make_response(f'Error while getting address history: {str(e)}', 500)
+
+
+# Getting the height and hash of the latest block
+@routes.route('/chain_tip', methods=['GET'])
+@log_requests
+def chain_tip() -> Tuple[Response, int]:
+    try:
+        tip_hash: str = blockchain.get_tip_hash()
+        if request.if_none_match.contains(tip_hash):
+            return make_not_modified_response(tip_hash)
+        message: str = 'Chain tip fetch successful'
+        data: Dict[str, Any] = {
+            'height': len(blockchain.chain),
+            'tip_hash': tip_hash
+        }
+        return make_response(message, 200, data, etag=tip_hash)
+    except Exception as e:
+        logger.error(f"Error getting chain tip: {str(e)}")
+        return make_response(f'Error while getting chain tip: {str(e)}', 500)
+
+
 # Replace the chain with the longest one among peers
 @routes.route('/replace_chain', methods=['POST'])
 @log_requests
+@serialized
 def replace_chain() -> Tuple[Response, int]:
     try:
         logger.info("Processing replace_chain request")
@@ -124,10 +272,9 @@ def replace_chain() -> Tuple[Response, int]:
         logger.info(f"Chain replacement {'successful' if is_replaced else 'not needed'}")
         message: str = f'The chain {"was replaced by" if is_replaced else "is already"} the longest one'
         data: Dict[str, Any] = {
-            'is_replaced': is_replaced,
-            'chain': blockchain.chain
+            'is_replaced': is_replaced
         }
-        response: Tuple[Response, int] = make_response(message, 200, data)
+        response: Tuple[Response, int] = make_blocks_response(message, 200, [block.json() for block in blockchain.chain], data)
         blockchain.save_chain()
         logger.info("Chain replacement response sent")
         return response
@@ -148,7 +295,6 @@ def is_valid() -> Tuple[Response, int]:
             'is_valid': valid
         }
         response: Tuple[Response, int] = make_response(message, 200, data)
-        blockchain.save_chain()
         logger.info(f"Blockchain validity check completed: {'valid' if valid else 'invalid'}")
         return response
     except Exception as e:
@@ -170,10 +316,10 @@ def get_user_balance(user: str) -> Tuple[Response, int]:
         message: str = f'Fetched {user}\'s balance successfully'
         data: Dict[str, Any] = {
             'user': user,
-            'balance': balance
+            'balance': balance,
+            'available_balance': blockchain.get_available_balance(user)
         }
         response: Tuple[Response, int] = make_response(message, 200, data)
-        blockchain.save_chain()
         logger.info(f"Fetched {user}\'s balance successfully")
         return response
     except Exception as e:
@@ -184,6 +330,7 @@ def get_user_balance(user: str) -> Tuple[Response, int]:
 # Load the blockchain from persistent storage
 @routes.route('/load_chain', methods=['GET'])
 @log_requests
+@serialized
 def load_chain() -> Tuple[Response, int]:
     try:
         logger.info("Processing load_chain request")
@@ -196,7 +343,6 @@ def load_chain() -> Tuple[Response, int]:
             logger.error("Error loading blockchain from memory, starting fresh.")
             message: str = f'Error loading blockchain from memory, starting fresh.'
             response: Tuple[Response, int] = make_response(message, 400)
-        blockchain.save_chain()
         logger.info("Blockchain initiated successfully")
         return response
     except Exception as e:
@@ -207,6 +353,7 @@ def load_chain() -> Tuple[Response, int]:
 # Add transaction to the memory pool, to await mining
 @routes.route('/add_transaction', methods=['POST'])
 @log_requests
+@serialized
 def add_transaction() -> Tuple[Response, int]:
     try:
         logger.info("Processing add_transaction request")
@@ -239,6 +386,7 @@ def add_transaction() -> Tuple[Response, int]:
 # Broadcast a transaction amongst peers
 @routes.route('/broadcast_transaction', methods=['POST'])
 @log_requests
+@serialized
 def broadcast_transaction() -> Tuple[Response, int]:
     # TODO: find if this is needed or can be merged with add_transaction
     try:
@@ -274,6 +422,76 @@ def broadcast_transaction() -> Tuple[Response, int]:
         return make_response(f'Error while broadcasting transaction: {str(e)}', 500)
 
 
+# Add many transactions to the memory pool in one request
+@routes.route('/add_transactions', methods=['POST'])
+@log_requests
+@serialized
+def add_transactions() -> Tuple[Response, int]:
+    try:
+        logger.info("Processing add_transactions request")
+        request_data: Optional[Dict[str, Any]] = request.get_json()
+        if not request_data or not isinstance(request_data.get('transactions'), list):
+            logger.error("No transactions provided")
+            return make_response("A list of transactions is required", 400)
+        if len(request_data['transactions']) > config['MAX_BATCH_TRANSACTIONS']:
+            return make_response(f"At most {config['MAX_BATCH_TRANSACTIONS']} transactions per request", 413)
+
+        results: List[Dict[str, Any]] = blockchain.add_transactions(request_data['transactions'])
+        accepted: int = sum(result['status'] == 'accepted' for result in results)
+        if accepted:
+            blockchain.save_chain()
+        message: str = f"Accepted {accepted} of {len(results)} transactions"
+        logger.info(message)
+        # 207 when only some were accepted, the results say which
+        status: int = 400 if not accepted else 201 if accepted == len(results) else 207
+        return make_response(message, status, {'accepted': accepted, 'results': results})
+    except Exception as e:
+        logger.error(f"Error adding transactions: {str(e)}")
+        return make_response(f'Error while adding transactions: {str(e)}', 500)
+
+
+# Receive a batch of transactions gossiped by a peer
+def _client_address() -> Optional[str]:
+    # Reader processes forward requests from loopback and name the client they came from
+    if request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' in request.headers:
+        return request.headers['X-Forwarded-For'].split(',')[-1].strip()
+    return request.remote_addr
+
+
+def _gossip_origin(request_data: Dict[str, Any]) -> Optional[str]:
+    # The known peer that sent a gossip batch, named in the batch or matched by address
+    origin = request_data.get('origin')
+    if isinstance(origin, str) and origin in blockchain.nodes:
+        return origin
+    matches = [node for node in blockchain.nodes if urlparse(f'//{node}').hostname == _client_address()]
+    # Several peers behind one address cannot be told apart
+    return matches[0] if len(matches) == 1 else None
+
+
+@routes.route('/receive_transactions', methods=['POST'])
+@log_requests
+@serialized
+def receive_transactions() -> Tuple[Response, int]:
+    try:
+        logger.info("Processing receive_transactions request")
+        request_data: Optional[Dict[str, Any]] = request.get_json()
+        if not request_data or not isinstance(request_data.get('transactions'), list):
+            logger.error("No transactions provided")
+            return make_response("A list of transactions is required", 400)
+
+        results: List[Dict[str, Any]] = blockchain.add_transactions(request_data['transactions'],
+                                                                    origin=_gossip_origin(request_data))
+        accepted: int = sum(result['status'] == 'accepted' for result in results)
+        if accepted:
+            blockchain.save_chain()
+        message: str = f"Accepted {accepted} of {len(results)} transactions"
+        logger.info(message)
+        return make_response(message, 201, {'accepted': accepted})
+    except Exception as e:
+        logger.error(f"Error receiving transactions: {str(e)}")
+        return make_response(f'Error while receiving transactions: {str(e)}', 500)
+
+
 @routes.route('/health', methods=['GET'])
 @log_requests
 def health_check() -> Tuple[Response, int]:
@@ -291,45 +509,86 @@ def health_check() -> Tuple[Response, int]:
         return make_response(f'Error during health check: {str(e)}', 500)
 
 
+@routes.route('/metrics', methods=['GET'])
+def get_metrics() -> Tuple[Response, int]:
+    # Prometheus text format, not wrapped in log_requests so scrapes stay out of the request metrics
+    if not metrics.enabled():
+        return make_response('Metrics are disabled', 404)
+    return Response(metrics.REGISTRY.render(), mimetype=metrics.CONTENT_TYPE), 200
+
+
 @routes.route('/deploy_contract', methods=['POST'])
 @log_requests
+@serialized
 def deploy_contract() -> Tuple[Response, int]:
     try:
         data: Optional[Dict[str, Any]] = request.get_json()
         required_fields: List[str] = ['code', 'owner']
-        if err := validate_fields(data, required_fields):
+        if err := validate_fields(data or {}, required_fields):
             return make_response(err, 400)
             
         contract_address: str = blockchain.deploy_contract(
             code=data['code'],
             owner=data['owner']
         )
+        blockchain.save_chain()
         message: str = 'Contract deployed successfully'
         data: Dict[str, str] = {
             'contract_address': contract_address
         }
         return make_response(message, 201, data)
+    except ValueError as e:
+        logger.error(f"Contract rejected: {str(e)}")
+        return make_response(f'Contract rejected: {str(e)}', 400)
     except Exception as e:
-
+        logger.error(f"Error deploying contract: {str(e)}")
         return make_response(f'Error deploying contract: {str(e)}', 500)
 
 @routes.route('/execute_contract/<contract_address>', methods=['POST'])
 @log_requests
 def execute_contract(contract_address: str) -> Tuple[Response, int]:
     try:
-        params: Dict[str, Any] = request.get_json() or {}
+        params: Dict[str, Any] = request.get_json(silent=True) or {}
+        if contract_address not in blockchain.contracts:
+            return make_response(f'Unknown contract {contract_address}', 404)
         result: Dict[str, Any] = blockchain.execute_smart_contract(contract_address, params)
         message: str = 'Contract executed successfully'
         data: Dict[str, Any] = {
             'result': result
         }
         return make_response(message, 201, data)
+    except ExecutorBusy as e:
+        logger.warning(f"Contract execution refused: {str(e)}")
+        return make_response(str(e), 503)
+    except OutOfGas as e:
+        logger.warning(f"Contract ran out of gas: {str(e)}")
+        return make_response(str(e), 400)
     except Exception as e:
+        logger.error(f"Error executing contract: {str(e)}")
         message: str = f'Error executing contract: {str(e)}'
+        return make_response(message, 500)
+
+@routes.route('/call_contract/<contract_address>', methods=['POST'])
+@log_requests
+def call_contract(contract_address: str) -> Tuple[Response, int]:
+    # Runs the contract on a snapshot of its state and discards the changes
+    try:
+        params: Dict[str, Any] = request.get_json(silent=True) or {}
+        if contract_address not in blockchain.contracts:
+            return make_response(f'Unknown contract {contract_address}', 404)
+        result: Dict[str, Any] = blockchain.execute_smart_contract(contract_address, params, read_only=True)
+        message: str = 'Contract called successfully'
         data: Dict[str, Any] = {
             'result': result
         }
-        return make_response(message, 500, data)
-
-
-
+        return make_response(message, 200, data)
+    except ExecutorBusy as e:
+        logger.warning(f"Contract call refused: {str(e)}")
+        return make_response(str(e), 503)
+    except OutOfGas as e:
+        logger.warning(f"Contract ran out of gas: {str(e)}")
+        return make_response(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error calling contract: {str(e)}")
+        message: str = f'Error calling contract: {str(e)}'
+        return make_response(message, 500)
@@ -3,6 +3,10 @@ from .blockchain import Blockchain
 from .helpers import hash_block, make_response, validate_fields
 from .hashing import hashing_algorithm
 from .contract import SmartContract
+from .ledger import Ledger
+from .miner import Miner
+from .mempool import Mempool
+from .models import Block, Transaction
 
 __all__: List[str] = [
     'Blockchain',
@@ -10,5 +14,10 @@ __all__: List[str] = [
     'make_response',
     'validate_fields',
     'hashing_algorithm',
-    'SmartContract'
+    'SmartContract',
+    'Ledger',
+    'Miner',
+    'Mempool',
+    'Block',
+    'Transaction'
 ]
@@ -1,13 +1,28 @@
-from typing import List, Set, Dict, Any, Optional, Union
+from typing import List, Set, Dict, Any, Optional, Tuple, Union
 import datetime
-import hashlib
-import json
-import requests
+import threading
 from urllib.parse import urlparse
 from src.utils.logger import setup_logger
 from src.config.config import BLOCKCHAIN_CONFIG
-from src.blockchain.helpers import hash_block
+from src.blockchain.helpers import hash_block, hash_transaction, validate_fields
 from src.blockchain.contract import SmartContract
+from src.blockchain.ledger import Ledger
+from src.blockchain.index import TransactionIndex
+from src.blockchain.dedup import ProcessedTransactions
+from src.blockchain.miner import Miner, valid_proof
+from src.blockchain.storage import Store, open_store
+from src.blockchain.sqlite_store import SQLiteStore
+from src.blockchain.snapshot import SnapshotStore
+from src.blockchain.chain import StoredChain, stored_prefix
+from src.blockchain.network import PeerClient, TransactionGossip
+from src.blockchain.mempool import Mempool
+from src.blockchain.models import Block, Transaction
+from src.blockchain.merkle import merkle_root, merkle_proof
+from src.blockchain.registry import ContractRegistry
+from src.blockchain.executor import ContractExecutor
+from src.blockchain.gas import OutOfGas
+from src.blockchain.state import ContractStateStore
+from src.utils import metrics
 
 config = BLOCKCHAIN_CONFIG
 logger = setup_logger('blockchain.core')
@@ -17,84 +32,300 @@ class Blockchain:
 
     def __init__(self) -> None:
         logger.info("Initializing new blockchain")
-        self.chain: List[Dict[str, Any]] = []
-        self.mempool: List[Dict[str, Any]] = []
-        self.processed_transactions: Set[str] = set()
+        # A list until the blocks are saved or loaded, then a StoredChain reading older blocks from the store
+        self.chain: Union[List[Dict[str, Any]], StoredChain] = []
+        self.mempool: Mempool = Mempool()
         self.nodes: Set[str] = set()
-        self.contracts: Dict[str, SmartContract] = {}
+        self.peers: PeerClient = PeerClient()
+        self.gossip: TransactionGossip = TransactionGossip(self.peers)
+        self.contracts: ContractRegistry = ContractRegistry()
+        # Undo journal of contract state changes, sealed per block so reorganizations can roll them back
+        self.contract_state: ContractStateStore = ContractStateStore(self.contracts)
+        # Contracts run in a pool of worker processes unless CONTRACT_WORKERS is 0
+        self.executor: Optional[ContractExecutor] = ContractExecutor() if config['CONTRACT_WORKERS'] else None
+        self.ledger: Ledger = Ledger()
+        # Where each mined transaction is and which transactions touch each address
+        self.index: TransactionIndex = TransactionIndex()
+        # Compact record of mined transaction hashes; pending ones are looked up in the mempool
+        self.processed_transactions: ProcessedTransactions = ProcessedTransactions()
+        self.miner: Miner = Miner()
+        # Held by the API around every change, so requests served on concurrent threads apply them one at a time
+        self.lock: threading.RLock = threading.RLock()
+        self.store: Optional[Store] = None
+        # Storage backend of the store, STORAGE_BACKEND when None
+        self.backend: Optional[str] = None
+        self.snapshots: Optional[SnapshotStore] = None
+        # Height of the newest snapshot of the ledger, index and duplicate filter
+        self.snapshot_height: int = 0
+        # Number of leading chain blocks known to match the store, and whether mempool/nodes changed since the last save
+        self.persisted_height: int = 0
+        self.state_dirty: bool = True
+        self._tip_hash_cache: Tuple[Optional[Dict[str, Any]], str] = (None, '')
+        # Blocks below verified_height passed validation; checkpoints map heights to block hashes
+        self.verified_height: int = 0
+        self.verified_tip_hash: str = ''
+        self.checkpoints: Dict[int, str] = {}
+        # Gas used by contract calls since the last block, reset by create_block
+        self.block_gas_used: int = 0
         self.create_block(proof=1, prev_hash='0' * config['DIFFICULTY'])
         self.gas_fee: float = config['GAS_FEE']
+        self.contract_gas_limit: int = config['CONTRACT_GAS_LIMIT']
+        self.block_gas_limit: int = config['BLOCK_GAS_LIMIT']
 
-    def save_chain(self, filename: str = config['CHAIN_FILE']) -> None:
+    def _get_store(self, directory: str) -> Store:
+        if self.store is None or self.store.directory != directory:
+            if self.store is not None:
+                self.close_store()
+            self.store = open_store(directory, self.backend)
+            if isinstance(self.store, SQLiteStore):
+                # Contracts go into the same database instead of CONTRACT_DIR
+                self.contracts.attach(self.store)
+            self.snapshots = SnapshotStore(directory)
+            # From here on mempool changes are recorded, so saves only write what changed
+            self.mempool.drain_journal()
+            self.persisted_height = 0
+            self.snapshot_height = 0
+            self.state_dirty = True
+        return self.store
+
+    @metrics.timed('save_chain')
+    def save_chain(self, directory: Optional[str] = None) -> None:
+        # CHAIN_DIR is read at call time, so it can be pointed elsewhere after import
+        directory = directory or config['CHAIN_DIR']
         try:
-            with open(filename, 'w') as file:
-                state = {
-                    'chain': self.chain,
-                    'nodes': list(self.nodes),
-                    'mempool': self.mempool,
-                    'processed_transactions': list(self.processed_transactions)
-                }
-                json.dump(state, file)
-                logger.info(f"Chain saved successfully to {filename}")
+            store = self._get_store(directory)
+            # Blocks past the fork point of a reorganization are stale on disk
+            if store.height > self.persisted_height:
+                store.truncate(self.persisted_height)
+            new_blocks = len(self.chain) > store.height
+            for block in self.chain[store.height:]:
+                store.append(block)
+            self.persisted_height = len(self.chain)
+            # Saved blocks are read back from the store when they are needed
+            if not isinstance(self.chain, StoredChain):
+                self.chain = StoredChain(store, 0, list(self.chain))
+            self.chain.release(self.persisted_height)
+            if isinstance(store, SQLiteStore):
+                # which also answers balance and location lookups
+                self.ledger.use_store(store)
+                self.index.use_store(store)
+            # Mempool changes are appended to a log, which is rewritten with only the live transactions
+            # when blocks were added (mining just removed a batch) or when it has grown well past the pool
+            changes = self.mempool.drain_journal()
+            if new_blocks or store.mempool_log_size > 2 * len(self.mempool) + config['MEMPOOL_LOG_SLACK']:
+                store.save_mempool(self.mempool.items())
+            elif changes:
+                store.log_mempool(changes)
+            if self.state_dirty:
+                store.save_state('nodes', sorted(self.nodes))
+                store.save_state('validation', {
+                    'verified_height': self.verified_height,
+                    'verified_tip_hash': self.verified_tip_hash,
+                    'checkpoints': self.checkpoints
+                })
+                store.save_state('contract_state', self.contract_state.to_dict())
+                self.state_dirty = False
+            self.contracts.flush()
+            # The SQLite store keeps balances and locations itself, there is nothing to snapshot
+            if (config['SNAPSHOT_INTERVAL'] and not isinstance(store, SQLiteStore)
+                    and len(self.chain) - self.snapshot_height >= config['SNAPSHOT_INTERVAL']):
+                self._save_snapshot()
+            logger.info(f"Chain saved successfully to {directory}")
         except Exception as e:
             logger.error(f"Error saving chain: {str(e)}")
             raise
 
-    def load_chain(self, filename: str = config['CHAIN_FILE']) -> bool:
-        try:
-            with open(filename, 'r') as file:
-                state = json.load(file)
-                self.chain = state['chain']
-                self.mempool = state['mempool']
-                self.processed_transactions = set(state['processed_transactions '])
-                self.nodes = set(state['nodes'])
-                logger.info(f"Chain loaded successfully from {filename}")
-                return True
-        except FileNotFoundError:
+    @metrics.timed('load_chain')
+    def load_chain(self, directory: Optional[str] = None) -> bool:
+        directory = directory or config['CHAIN_DIR']
+        store = self._get_store(directory)
+        mempool = store.load_mempool()
+        if not store.height and mempool is None:
             logger.warning('Nonexistent blockchain.')
             return False
+        # Only the tip is parsed here, _restore_derived_state parses the blocks it replays
+        self.chain = self._read_chain(store.height - 1)
+        self.mempool = Mempool()
+        for transaction_hash, transaction in mempool or []:
+            self.mempool.add(transaction_hash, transaction)
+        # Starts the journal; the log is rewritten once, dropping entries replaced or evicted since it was written
+        self.mempool.drain_journal()
+        store.save_mempool(self.mempool.items())
+        self.nodes = set(store.load_state('nodes', []))
+        self._restore_derived_state()
+        self._load_validation_state(store.load_state('validation', {}))
+        self.contract_state.load(store.load_state('contract_state', {}))
+        self.persisted_height = len(self.chain)
+        # The replayed blocks are all in the store
+        self.chain.release(self.persisted_height)
+        self.state_dirty = False
+        logger.info(f"Chain loaded successfully from {directory}")
+        return True
+
+    def close_store(self) -> None:
+        # Blocks, balances and locations only kept in the store are read before it is closed
+        if isinstance(self.chain, StoredChain):
+            self.chain = list(self.chain)
+        if self.index.store is not None:
+            self.ledger.rebuild(self.chain, self.mempool)
+            self.index.rebuild(self.chain)
+        self.store.close()
+        self.store = None
+
+    def _read_chain(self, stored: int) -> StoredChain:
+        # The chain with its blocks from `stored` on parsed and held in memory, the tip always among them
+        stored = max(min(stored, self.store.height - 1), 0)
+        return StoredChain(self.store, stored, [Block.from_json(record) for record in self.store.iter_records(stored)])
+
+    def _save_snapshot(self) -> None:
+        height = len(self.chain)
+        self.snapshots.save(height, hash_block(self.chain[-1]) if self.chain else '', {
+            'ledger': self.ledger.snapshot(),
+            'index': self.index.snapshot(),
+            'processed_transactions': self.processed_transactions.snapshot()
+        })
+        self.snapshot_height = height
+
+    def _restore_derived_state(self) -> None:
+        if isinstance(self.store, SQLiteStore):
+            # Balances and locations are looked up in the store, only the blocks of the duplicate filter's window are read
+            self.ledger.restore({'balances': {}})
+            self.ledger.use_store(self.store)
+            self.index.use_store(self.store)
+            self.processed_transactions.rebuild(self.chain[-self.processed_transactions.window_blocks:])
+            for transaction in self.mempool:
+                self.ledger.add_pending(transaction)
+            self.snapshot_height = 0
+            return
+        # Start from the newest snapshot still on the chain and replay only the blocks after it
+        snapshot = self.snapshots.load(self.chain)
+        if snapshot is None:
+            # Every block is replayed, so all of them are parsed once
+            self.chain = self._read_chain(0)
+            self.ledger.rebuild(self.chain, self.mempool)
+            self.index.rebuild(self.chain)
+            self.processed_transactions.rebuild(self.chain)
+            self.snapshot_height = 0
+            return
+        height, state = snapshot
+        # Blocks up to the snapshot stay in the store
+        self.chain = self._read_chain(height)
+        self.ledger.restore(state['ledger'])
+        self.index.restore(state['index'])
+        self.processed_transactions.restore(state['processed_transactions'])
+        for block in self.chain[height:]:
+            self.ledger.apply_block(block)
+            self.index.apply_block(block)
+            self.processed_transactions.apply_block(block)
+        for transaction in self.mempool:
+            self.ledger.add_pending(transaction)
+        self.snapshot_height = height
+        logger.info(f"Restored derived state at height {height}, replayed {len(self.chain) - height} blocks")
+
+    def _load_validation_state(self, state: Dict[str, Any]) -> None:
+        # Our own store is trusted up to the recorded height as long as the block there still hashes the same
+        height = state.get('verified_height', 0)
+        if 0 < height <= len(self.chain) and hash_block(self.chain[height - 1]) == state.get('verified_tip_hash'):
+            self.verified_height = height
+            self.verified_tip_hash = state['verified_tip_hash']
+            self.checkpoints = {int(h): block_hash for h, block_hash in state.get('checkpoints', {}).items()}
+        else:
+            self.verified_height, self.verified_tip_hash, self.checkpoints = 0, '', {}
 
     def add_node(self, address: str) -> None:
         parsed_url = urlparse(address)
         self.nodes.add(parsed_url.netloc)
+        self.state_dirty = True
         logger.info(f"Added new node: {parsed_url.netloc}")
 
+    @metrics.timed('replace_chain')
     def replace_chain(self) -> bool:
-        longest_chain = None
-        max_len = len(self.chain)
-
-        for node in self.nodes:
-            try:
-                response = requests.get(f'http://{node}/get_chain', timeout=config['NODE_TIMEOUT'])
-                if response.status_code == 200:
-                    node_chain = response.json()['chain']
-                    node_length = response.json()['length']
-                    if node_length > max_len and self.is_chain_valid(node_chain):
-                        max_len = node_length
-                        longest_chain = node_chain
-                if longest_chain:
-                    self.chain = longest_chain
-                    logger.info(f"Chain replaced with longer chain from node {node}")
-                    return True
-            except requests.exceptions.RequestException:
-                logger.error(f"Failed to connect to node {node}")
+        # All peers are asked concurrently; answers arriving after SYNC_DEADLINE are ignored.
+        # Only verified blocks count as shared, like in _find_fork_point
+        shared_height = min(self.verified_height, len(self.chain))
+        candidates = self.peers.fetch_chains(self.nodes, len(self.chain), shared_height,
+                                             lambda index: self._verified_hash(index))
+        for node, (node_length, fork_point, blocks) in sorted(candidates.items(), key=lambda item: item[1][0], reverse=True):
+            # The shared prefix is taken from our own verified blocks, only the blocks after it were downloaded
+            candidate = self.chain[:fork_point] + blocks
+            valid, verified_height, tip_hash, checkpoints = self._validate_blocks(candidate, fork_point)
+            if not valid:
+                logger.warning(f"Rejected invalid chain from node {node}")
                 continue
+            # a block mined on top of the old tip would be orphaned, so stop mining it
+            self.miner.cancel()
+            self._reorganize(candidate)
+            self._mark_verified(verified_height, tip_hash, checkpoints)
+            logger.info(f"Chain replaced with longer chain of length {node_length} from node {node}")
+            return True
         logger.info("Chain replacement not needed - current chain is longest")
         return False
 
-    def create_block(self, proof: int, prev_hash: str) -> Dict[str, Any]:
-        logger.info(f"Creating new block with proof: {proof}")
+    def _reorganize(self, new_chain: List[Dict[str, Any]]) -> None:
+        # Roll the ledger back to the last block both chains share, then replay the new blocks.
+        # Blocks both chains leave in the store are the same ones
+        fork_point = min(stored_prefix(self.chain), stored_prefix(new_chain))
+        for own_block, new_block in zip(self.chain[fork_point:], new_chain[fork_point:]):
+            if own_block is not new_block and own_block != new_block:
+                break
+            fork_point += 1
+        # The shared prefix keeps the existing objects, blocks received from peers are converted from dicts
+        new_chain = self.chain[:fork_point] + [Block.from_dict(block) for block in new_chain[fork_point:]]
+        # Contract calls made since the old tip are undone along with the blocks they were made on
+        reverted_contracts = self.contract_state.revert_pending()
+        for block in reversed(self.chain[fork_point:]):
+            self.ledger.revert_block(block)
+            self.index.revert_block(block)
+            self.processed_transactions.revert_block(block)
+            reverted_contracts |= self.contract_state.revert_block(block)
+        for block in new_chain[fork_point:]:
+            self.ledger.apply_block(block)
+            self.index.apply_block(block)
+            self.processed_transactions.apply_block(block)
+            self.contract_state.apply_block(block)
+        if self.executor is not None:
+            for address in reverted_contracts:
+                self.executor.invalidate(address)
+        self.persisted_height = min(self.persisted_height, fork_point)
+        self.snapshot_height = min(self.snapshot_height, fork_point)
+        self._truncate_verified(fork_point)
+        logger.info(f"Reorganized chain at block {fork_point}: "
+                    f"{len(self.chain) - fork_point} blocks reverted, {len(new_chain) - fork_point} applied")
+        self.chain = new_chain
+
+    def create_block(self, proof: int, prev_hash: str, reward_address: Optional[str] = None) -> Dict[str, Any]:
+        logger.info("Creating new block with proof: %s", proof)
         try:
-            block = {
-                'index': len(self.chain) + 1,
-                'timestamp': str(datetime.datetime.now()),
-                'transactions': self.mempool,
-                'proof': proof,
-                'prev_hash': prev_hash
-            }
-            self.mempool = []
+            # The highest paying transactions up to the block size limit, the rest keep waiting
+            limit = config['BLOCK_MAX_TRANSACTIONS']
+            selected = self.mempool.pop_best(limit - 1 if reward_address is not None else limit)
+            if reward_address is not None:
+                # The reward pays for exactly the transactions selected above, and goes in first
+                total_gas = sum(transaction['gas'] for _, transaction in selected)
+                reward_hash, reward, _ = self._admit_transaction('0', reward_address, config['BLOCK_REWARD'] + total_gas)
+                if reward_hash is not None:
+                    self.mempool.remove(reward_hash)
+                    selected.insert(0, (reward_hash, reward))
+            transaction_hashes = [transaction_hash for transaction_hash, _ in selected]
+            block = Block(
+                len(self.chain) + 1,
+                str(datetime.datetime.now()),
+                # The mempool already knows each transaction's hash, so it is handed over rather than recomputed
+                [Transaction.from_dict(transaction, transaction_hash) for transaction_hash, transaction in selected],
+                proof,
+                prev_hash,
+                merkle_root(transaction_hashes)
+            )
+            self.state_dirty = True
+            self.block_gas_used = 0
             self.chain.append(block)
-            logger.info(f"Block {block['index']} created successfully")
+            self.ledger.apply_block(block)
+            self.index.apply_block(block)
+            self.processed_transactions.apply_block(block)
+            self.contract_state.apply_block(block)
+            for transaction in block['transactions']:
+                self.ledger.release_pending(transaction)
+            logger.info("Block %s created successfully", block['index'])
             return block
         except Exception as e:
             logger.error(f"Error creating block: {str(e)}")
@@ -104,90 +335,300 @@ class Blockchain:
         logger.debug("Getting previous block")
         return self.chain[-1]
 
+    def get_tip_hash(self) -> str:
+        tip = self.chain[-1]
+        if self._tip_hash_cache[0] is not tip:
+            self._tip_hash_cache = (tip, hash_block(tip))
+        return self._tip_hash_cache[1]
+
+    def get_blocks(self, start: int, end: int) -> List[Dict[str, Any]]:
+        # start and end are 1-based block indexes, both inclusive
+        return self.chain[max(start, 1) - 1:max(end, 0)]
+
+    def get_headers(self, start: int, end: int) -> List[Dict[str, Any]]:
+        return [dict(block.header(), hash=hash_block(block), transaction_count=len(block.transactions))
+                for block in self.get_blocks(start, end)]
+
+    def _read_transaction(self, block_index: int, position: int) -> Transaction:
+        # Transactions of blocks only in the store are read by themselves, without parsing their block
+        if block_index <= stored_prefix(self.chain):
+            return self.store.read_transaction(block_index, position)
+        return self.chain[block_index - 1]['transactions'][position]
+
+    def get_transaction(self, transaction_hash: str) -> Optional[Dict[str, Any]]:
+        location = self.index.locate(transaction_hash)
+        if location is not None:
+            block_index, position = location
+            return {
+                'transaction': self._read_transaction(block_index, position).to_dict(),
+                'status': 'confirmed',
+                'block_index': block_index,
+                'position': position,
+                'confirmations': len(self.chain) - block_index + 1
+            }
+        if transaction_hash in self.mempool:
+            return {'transaction': self.mempool.entries[transaction_hash].transaction, 'status': 'pending'}
+        return None
+
+    def get_history(self, address: str, offset: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        total, locations = self.index.get_history(address, offset, limit)
+        history = []
+        for block_index, position in locations:
+            transaction = self._read_transaction(block_index, position)
+            history.append({
+                'transaction': transaction.to_dict(),
+                'transaction_hash': hash_transaction(transaction),
+                'block_index': block_index,
+                'position': position
+            })
+        return total, history
+
+    def get_transaction_proof(self, transaction_hash: str, block_index: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        # Merkle path from a mined transaction to the root in its block header, None if it is not on the chain
+        if block_index is None:
+            location = self.index.locate(transaction_hash)
+            if location is None:
+                return None
+            block_index = location[0]
+        for block in self.get_blocks(block_index, block_index):
+            hashes = [hash_transaction(transaction) for transaction in block['transactions']]
+            if transaction_hash not in hashes:
+                continue
+            if 'merkle_root' not in block:
+                raise ValueError(f"Block {block['index']} was created without a Merkle root")
+            position = hashes.index(transaction_hash)
+            return {
+                'transaction': block['transactions'][position].to_dict(),
+                'transaction_hash': transaction_hash,
+                'block_index': block['index'],
+                'block_hash': hash_block(block),
+                'header': block.header(),
+                'proof': merkle_proof(hashes, position)
+            }
+        return None
+
+    @metrics.timed('get_user_balance')
     def get_user_balance(self, user: str) -> float:
-        balance = 0
-        for block in self.chain:
-            for transaction in block.get('transactions', []):
-                if transaction['sender'] == user:
-                    balance -= transaction['amount'] + transaction['gas']
-                elif transaction['receiver'] == user:
-                    balance += transaction['amount']
-        logger.info(f"Calculated balance for user {user}: {balance}")
+        balance = self.ledger.get_balance(user)
+        logger.debug("Calculated balance for user %s: %s", user, balance)
         return balance
 
-    def add_transaction(self, sender: str, receiver: str, amount: float) -> Union[bool, int]:
+    def get_available_balance(self, user: str) -> float:
+        # Confirmed balance minus whatever the user's pending mempool transactions will spend
+        return self.ledger.get_available_balance(user)
+
+    def _is_processed(self, transaction_hash: str) -> bool:
+        if transaction_hash in self.mempool or self.processed_transactions.is_recent(transaction_hash):
+            return True
+        if self.index.store is not None:
+            # The filter only covers blocks since the node started, the store's index is asked directly
+            return self.index.locate(transaction_hash) is not None
+        # A Bloom filter hit may be a false positive, the index has the final say
+        return (self.processed_transactions.may_be_older(transaction_hash)
+                and self.index.locate(transaction_hash) is not None)
+
+    def _admit_transaction(self, sender: str, receiver: str, amount: float) -> Tuple[Optional[str], Dict[str, Any], Optional[str]]:
+        # Checks a transaction and puts it in the mempool.
+        # Returns its hash, or None and the reason it was turned away
         if amount <= 0:
             logger.error("Invalid transaction: amount must be positive")
             raise ValueError('Transaction amount must be positive')
+        transaction = {'sender': sender, 'receiver': receiver, 'amount': amount, 'gas': amount * self.gas_fee * (sender != '0')}
         if sender != '0':  # user 0 is the system mining rewards, thus no balance check and gas fee isn't applied
-            sender_balance = self.get_user_balance(sender)
+            sender_balance = self.get_available_balance(sender)
             if sender_balance < amount * (1 + self.gas_fee):
                 logger.warning(f"Transaction failed: insufficient balance for user {sender}")
-                return False
-        transaction = {'sender': sender, 'receiver': receiver, 'amount': amount, 'gas': amount * self.gas_fee * (sender != '0')}
-        transaction_hash = hashlib.sha256(json.dumps(transaction, sort_keys=True).encode()).hexdigest()
-        if transaction_hash in self.processed_transactions:
+                return None, transaction, 'Insufficient balance'
+        transaction_hash = hash_transaction(transaction)
+        if self._is_processed(transaction_hash):
             logger.warning(f"Transaction {transaction_hash} already processed")
+            return None, transaction, 'Transaction already processed'
+        admitted, evicted = self.mempool.add(transaction_hash, transaction)
+        for evicted_hash, evicted_transaction in evicted:
+            if evicted_hash == transaction_hash:
+                continue
+            # Evicted transactions were never mined, so they can be submitted again later
+            self.ledger.release_pending(evicted_transaction)
+        if not admitted:
+            logger.warning(f"Transaction {transaction_hash} rejected by the mempool")
+            return None, transaction, 'Rejected by the mempool'
+        self.ledger.add_pending(transaction)
+        return transaction_hash, transaction, None
+
+    def add_transaction(self, sender: str, receiver: str, amount: float) -> Union[bool, int]:
+        transaction_hash, transaction, error = self._admit_transaction(sender, receiver, amount)
+        if error:
             return False
-        self.mempool.append(transaction)
-        self.processed_transactions.add(transaction_hash)
-        self.broadcast_transaction(transaction)
-        logger.info(f"Added transaction: {sender} -> {receiver}, amount: {amount}")
+        self.broadcast_transaction(transaction, transaction_hash)
+        logger.info("Added transaction: %s -> %s, amount: %s", sender, receiver, amount)
         return self.get_prev_block()['index'] + 1
 
-    def broadcast_transaction(self, transaction: Dict[str, Any]) -> None:
-        for node in self.nodes:
-            try:
-                response = requests.post(f'http://{node}/add_transaction', json=transaction, timeout=config['NODE_TIMEOUT'])
-                if response.status_code != 201:
-                    logger.error(f'Failed to broadcast transaction to node: {node}')
-            except requests.exceptions.RequestException:
-                logger.error(f'Could not connect to node: {node}')
+    def add_transactions(self, transactions: List[Dict[str, Any]], origin: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Admits a batch in order, so each funds check sees the pending debits of the entries before it,
+        # then gossips everything that was accepted in one go, except back to the node it came from
+        next_index = self.get_prev_block()['index'] + 1
+        results: List[Dict[str, Any]] = []
+        accepted: List[Tuple[str, Dict[str, Any]]] = []
+        for data in transactions:
+            error = validate_fields(data, ['sender', 'receiver', 'amount']) if isinstance(data, dict) else 'Transaction must be an object'
+            if not error and (isinstance(data['amount'], bool) or not isinstance(data['amount'], (int, float))):
+                error = 'Transaction amount must be a number'
+            if not error:
+                try:
+                    transaction_hash, transaction, error = self._admit_transaction(data['sender'], data['receiver'], data['amount'])
+                except ValueError as e:
+                    error = str(e)
+            if error:
+                results.append({'status': 'rejected', 'error': error})
+            else:
+                accepted.append((transaction_hash, transaction))
+                results.append({'status': 'accepted', 'transaction_hash': transaction_hash, 'block': next_index})
+        if accepted and self.nodes:
+            if origin is not None:
+                self.gossip.mark_seen(origin, (transaction_hash for transaction_hash, _ in accepted))
+            self.gossip.enqueue(self.nodes, accepted)
+        logger.info(f"Added {len(accepted)} of {len(transactions)} transactions")
+        return results
 
-    def proof_of_work(self, prev_proof: Optional[int] = None, difficulty: int = config['DIFFICULTY']) -> int:
+    def broadcast_transaction(self, transaction: Dict[str, Any], transaction_hash: Optional[str] = None) -> None:
+        # Queued for the background dispatcher, which batches transactions per peer
+        if self.nodes:
+            self.gossip.enqueue(self.nodes, [(transaction_hash or hash_transaction(transaction), transaction)])
+
+    @metrics.timed('proof_of_work')
+    def proof_of_work(self, prev_proof: Optional[int] = None, difficulty: int = config['DIFFICULTY']) -> Optional[int]:
         logger.info("Starting proof of work calculation")
         # TODO: Implement a method to adjust the difficulty based on average mining time
         if prev_proof is None:
             prev_proof = self.get_prev_block()['proof']
-        new_proof = 1
-        target = '0' * difficulty
-        while True:
-            # TODO: make a better PoW proof for mining (see hashing.py)
-            hash_operation = hashlib.sha256(str((new_proof ** 2) - (prev_proof ** 2)).encode()).hexdigest()
-            if hash_operation[:difficulty] == target:
-                logger.info(f"Found proof of work: {new_proof}")
-                return new_proof
-            new_proof += 1
+        # TODO: make a better PoW proof for mining (see hashing.py)
+        proof = self.miner.mine(prev_proof, difficulty)
+        if metrics.enabled():
+            metrics.HASHES.inc(self.miner.last_stats.get('hashes', 0))
+        if proof is None:
+            logger.warning("Proof of work cancelled")
+        else:
+            logger.info(f"Found proof of work: {proof}")
+        return proof
 
-    def is_chain_valid(self, chain: Optional[List[Dict[str, Any]]] = None) -> bool:
-        logger.info("Validating blockchain")
-        if chain is None:
-            chain = self.chain
-        prev_block = chain[0]
-        block_index = 1
-        while block_index < len(chain):
+    def _verified_hash(self, height: int) -> str:
+        # A verified block's hash is stored as the prev_hash of its successor, except for the newest one
+        if height == self.verified_height:
+            return self.verified_tip_hash
+        return self.chain[height]['prev_hash']
+
+    def _find_fork_point(self, chain: List[Dict[str, Any]]) -> int:
+        # Number of leading blocks of chain that link onto our verified blocks.
+        # Binary search over the checkpoints, then walk forward at most one checkpoint interval
+        limit = min(self.verified_height, len(chain) - 1)
+        interval = config['CHECKPOINT_INTERVAL']
+        low, high = 0, limit // interval
+        while low < high:
+            middle = (low + high + 1) // 2
+            height = middle * interval
+            if height in self.checkpoints and chain[height]['prev_hash'] == self.checkpoints[height]:
+                low = middle
+            else:
+                high = middle - 1
+        fork_point = low * interval
+        while fork_point < limit and chain[fork_point + 1]['prev_hash'] == self._verified_hash(fork_point + 1):
+            fork_point += 1
+        return fork_point
+
+    def _validate_blocks(self, chain: List[Dict[str, Any]], start: int) -> Tuple[bool, int, str, Dict[int, str]]:
+        # Checks chain[start:] assuming chain[:start] are our own verified blocks.
+        # Returns whether it is valid, the verified height reached, the hash of that block and new checkpoints
+        if start == 0:
+            start = 1
+            prev_hash = hash_block(chain[0])
+        else:
+            prev_hash = self._verified_hash(start)
+        checkpoints: Dict[int, str] = {}
+        for block_index in range(start, len(chain)):
             block = chain[block_index]
-            if block['prev_hash'] != hash_block(prev_block):
+            if block['prev_hash'] != prev_hash:
                 logger.error(f"Invalid chain: hash mismatch at block {block_index}")
-                return False
-            prev_proof = prev_block['proof']
-            proof = block['proof']
-            hash_operation = hashlib.sha256(str((proof ** 2) - (prev_proof ** 2)).encode()).hexdigest()
-            if hash_operation[:config['DIFFICULTY']] != '0' * config['DIFFICULTY']:
+                return False, block_index, prev_hash, checkpoints
+            if not valid_proof(block['proof'], chain[block_index - 1]['proof']):
                 logger.error(f"Invalid chain: proof of work invalid at block {block_index}")
-                return False
-            prev_block = chain[block_index]
-            block_index += 1
-        logger.info("Chain validation successful")
-        return True
+                return False, block_index, prev_hash, checkpoints
+            if not self._valid_merkle_root(block):
+                logger.error(f"Invalid chain: Merkle root mismatch at block {block_index}")
+                return False, block_index, prev_hash, checkpoints
+            prev_hash = hash_block(block)
+            if (block_index + 1) % config['CHECKPOINT_INTERVAL'] == 0:
+                checkpoints[block_index + 1] = prev_hash
+        return True, len(chain), prev_hash, checkpoints
+
+    def _valid_merkle_root(self, block: Dict[str, Any]) -> bool:
+        # Blocks without a root are hashed whole, so the hash chain already covers their transactions
+        if 'merkle_root' not in block:
+            return True
+        hashes = [hash_transaction(transaction) for transaction in block['transactions']]
+        # A repeated transaction would let two different transaction lists share a root
+        return len(set(hashes)) == len(hashes) and merkle_root(hashes) == block['merkle_root']
 
-    def execute_smart_contract(self, contract_code: str, params: Dict[str, Any]) -> Optional[Any]:
+    def _mark_verified(self, height: int, tip_hash: str, checkpoints: Dict[int, str]) -> None:
+        if height > self.verified_height:
+            self.verified_height = height
+            self.verified_tip_hash = tip_hash
+            self.checkpoints.update(checkpoints)
+            self.state_dirty = True
+
+    def _truncate_verified(self, height: int) -> None:
+        if height < self.verified_height:
+            self.verified_tip_hash = self._verified_hash(height) if height else ''
+            self.verified_height = height
+            self.checkpoints = {h: block_hash for h, block_hash in self.checkpoints.items() if h <= height}
+            self.state_dirty = True
+
+    @metrics.timed('is_chain_valid')
+    def is_chain_valid(self, chain: Optional[List[Dict[str, Any]]] = None) -> bool:
+        logger.info("Validating blockchain")
+        if chain is None:
+            # Only blocks appended since the last validation need checking
+            valid, height, tip_hash, checkpoints = self._validate_blocks(self.chain, self.verified_height)
+            self._mark_verified(height, tip_hash, checkpoints)
+        else:
+            fork_point = self._find_fork_point(chain)
+            valid = self._validate_blocks(self.chain[:fork_point] + chain[fork_point:], fork_point)[0]
+        if valid:
+            logger.info("Chain validation successful")
+        return valid
+
+    def deploy_contract(self, code: str, owner: str) -> str:
+        contract = SmartContract(code, owner)
+        valid, error = contract.validate()
+        if not valid:
+            raise ValueError(error)
+        self.contracts.deploy(contract)
+        logger.info(f"Deployed contract {contract.address} for {owner}")
+        return contract.address
+
+    @metrics.timed('contract_execution')
+    def execute_smart_contract(self, contract_address: str, params: Dict[str, Any],
+                               read_only: bool = False) -> Dict[str, Any]:
+        logger.info("Executing smart contract %s", contract_address)
+        contract = self.contracts.get(contract_address)
+        if contract is None:
+            raise KeyError(f'Unknown contract {contract_address}')
+        # Each call gets the per call limit, or whatever is left of the block's budget if that is less.
+        # Read-only calls change nothing that goes into a block, so they only have the per call limit.
+        gas_limit = self.contract_gas_limit
+        if not read_only:
+            gas_limit = min(gas_limit, self.block_gas_limit - self.block_gas_used)
+            if gas_limit <= 0:
+                raise OutOfGas('Block gas limit reached, try again after the next block')
+        gas_before = contract.gas_used
         try:
-            logger.info("Executing smart contract")
-            exec(contract_code, {}, params)
-            result = params.get('result', None)
-            logger.info(f"Smart contract execution completed with result: {result}")
-            return result
-        except Exception as e:
-            logger.error(f'Error while executing smart contract: {e}')
-            return None
+            if self.executor is not None:
+                state, gas_used = self.executor.execute(contract, self, params, gas_limit, read_only)
+            else:
+                state, gas_used = contract.execute(self, params, gas_limit, read_only)
+        finally:
+            if not read_only:
+                self.block_gas_used += contract.gas_used - gas_before
+                self.state_dirty = True
+            self.contracts.mark_dirty(contract_address)
+        logger.info("Smart contract execution completed, gas used: %s", gas_used)
+        return {'state': state, 'gas_used': gas_used}
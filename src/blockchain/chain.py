@@ -0,0 +1,101 @@
+from collections import OrderedDict
+import threading
+from typing import Any, Dict, Iterator, List, Sequence, Tuple, Union
+from src.blockchain.models import Block
+from src.config.config import BLOCKCHAIN_CONFIG
+
+config = BLOCKCHAIN_CONFIG
+
+# Blocks read from the store at a time when iterating
+PAGE_BLOCKS = 1000
+
+
+class StoredChain(Sequence):
+    # The chain with its leading blocks left in the store, parsed when they are read; the blocks after
+    # them, always including the tip, are held in memory. Slices from the start are StoredChains too,
+    # so building a candidate chain on our own prefix never reads the prefix
+    def __init__(self, store: Any, stored: int, blocks: List[Block],
+                 cache_blocks: int = config['CHAIN_CACHE_BLOCKS']) -> None:
+        self.store: Any = store
+        # (number of leading blocks only in the store, the blocks after them), replaced as a whole
+        # so threads reading the chain never see one updated without the other
+        self._state: Tuple[int, List[Block]] = (stored, blocks)
+        self.cache_blocks: int = cache_blocks
+        self._cache: 'OrderedDict[int, Block]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @property
+    def stored(self) -> int:
+        return self._state[0]
+
+    def __len__(self) -> int:
+        stored, blocks = self._state
+        return stored + len(blocks)
+
+    def _read(self, height: int) -> Block:
+        with self._cache_lock:
+            block = self._cache.get(height)
+            if block is not None:
+                self._cache.move_to_end(height)
+                return block
+        [record] = self.store.iter_records(height, height + 1)
+        block = Block.from_json(record)
+        with self._cache_lock:
+            self._cache[height] = block
+            if len(self._cache) > self.cache_blocks:
+                self._cache.popitem(last=False)
+        return block
+
+    def __getitem__(self, item: Union[int, slice]) -> Any:
+        stored, blocks = self._state
+        length = stored + len(blocks)
+        if isinstance(item, slice):
+            start, stop, step = item.indices(length)
+            if start == 0 and step == 1:
+                return self._prefix(stop)
+            return [self[height] for height in range(start, stop, step)]
+        height = item + length if item < 0 else item
+        if not 0 <= height < length:
+            raise IndexError('chain index out of range')
+        return blocks[height - stored] if height >= stored else self._read(height)
+
+    def _prefix(self, length: int) -> 'StoredChain':
+        # The tip of the prefix is kept in memory like ours
+        stored, blocks = self._state
+        if length > stored:
+            return StoredChain(self.store, stored, blocks[:length - stored], self.cache_blocks)
+        if not length:
+            return StoredChain(self.store, 0, [], self.cache_blocks)
+        return StoredChain(self.store, length - 1, [self._read(length - 1)], self.cache_blocks)
+
+    def __iter__(self) -> Iterator[Block]:
+        stored, blocks = self._state
+        for start in range(0, stored, PAGE_BLOCKS):
+            # A page is read in full, so no cursor stays open on the store between blocks
+            for record in list(self.store.iter_records(start, min(start + PAGE_BLOCKS, stored))):
+                yield Block.from_json(record)
+        yield from blocks
+
+    def __add__(self, other: Sequence[Dict[str, Any]]) -> 'StoredChain':
+        stored, blocks = self._state
+        return StoredChain(self.store, stored, blocks + list(other), self.cache_blocks)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Sequence) and len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def append(self, block: Block) -> None:
+        self._state[1].append(block)
+
+    def release(self, height: int) -> None:
+        # Blocks below height are in the store now and are dropped from memory, except the tip
+        stored, blocks = self._state
+        height = min(height, stored + len(blocks) - 1)
+        if height > stored:
+            self._state = (height, blocks[height - stored:])
+
+
+def stored_prefix(chain: Sequence[Dict[str, Any]]) -> int:
+    # Leading blocks of chain that are only in the store
+    return chain.stored if isinstance(chain, StoredChain) else 0
@@ -1,20 +1,49 @@
 import hashlib
 import time
 import ast
+import base64
+import builtins
+import marshal
 import signal
+import sys
+import threading
 from contextlib import contextmanager
+from types import CodeType
 from typing import Dict, Any, Optional, NoReturn, Generator
 from src.utils.logger import setup_logger
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.blockchain.gas import GasMeter, OutOfGas, METERING_VERSION, instrument
+from src.blockchain.state import StateOverlay, contract_view
 
+config = BLOCKCHAIN_CONFIG
 logger = setup_logger('blockchain.contract')
 
+PROHIBITED_NAMES = {'import', 'eval', 'exec', 'open', 'file', 'system', 'subprocess',
+                    'compile', 'globals', 'locals', 'vars', 'getattr', 'setattr', 'delattr'}
+# Generator, coroutine, frame and traceback attributes lead to the globals and builtins of running code
+INTROSPECTION_ATTRIBUTES = {'gi_frame', 'gi_code', 'gi_yieldfrom', 'cr_frame', 'cr_code', 'cr_await',
+                            'ag_frame', 'ag_code', 'ag_await', 'f_builtins', 'f_globals', 'f_locals',
+                            'f_back', 'f_code', 'tb_frame', 'tb_next'}
+# The only builtins a contract sees. Without an explicit __builtins__ exec hands it the whole module
+SAFE_BUILTINS = {name: getattr(builtins, name) for name in (
+    'abs', 'all', 'any', 'bool', 'chr', 'dict', 'divmod', 'enumerate', 'filter', 'float', 'frozenset',
+    'int', 'isinstance', 'len', 'list', 'map', 'max', 'min', 'ord', 'pow', 'range', 'reversed', 'round',
+    'set', 'sorted', 'str', 'sum', 'tuple', 'zip', '__build_class__',
+    'Exception', 'ArithmeticError', 'IndexError', 'KeyError', 'TypeError', 'ValueError', 'ZeroDivisionError'
+)}
+
 @contextmanager
 def timeout(seconds: int) -> Generator[None, None, None]:
     def timeout_handler(signum: int, frame: Any) -> NoReturn:
-        logger.debug(f"Timeout triggered by signal {signum}")
-        logger.debug(f"At execution frame: {frame.f_code.co_name}")
+        logger.debug("Timeout triggered by signal %s", signum)
+        logger.debug("At execution frame: %s", frame.f_code.co_name)
         raise TimeoutError("Execution timed out")
     
+    # SIGALRM can only be handled in the main thread, other threads rely on the process pool deadline
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    
     logger.debug("Setting up timeout handler")
     original_handler = signal.signal(signal.SIGALRM, timeout_handler)
     signal.alarm(seconds)
@@ -37,76 +66,155 @@ class SmartContract:
         self.created_at = time.time()
         self.gas_used = 0
         self.last_execution = None
+        self.compiled: Optional[CodeType] = None
         
     def _generate_address(self) -> str:
         unique_string = f"{self.owner}{self.code}{time.time()}"
         return hashlib.sha256(unique_string.encode()).hexdigest()
         
-    def _validate_syntax(self) -> bool:
+    def _parse(self) -> Optional[ast.Module]:
         try:
-            ast.parse(self.code)
-            return True
+            return ast.parse(self.code)
         except SyntaxError as e:
             logger.error(f"Contract syntax error: {str(e)}")
-            return False
+            return None
             
-    def _validate_security(self) -> Optional[str]:
-        prohibited = ['import', 'eval', 'exec', '__', 'open', 
-                     'file', 'system', 'subprocess']
-        
-        for item in prohibited:
-            if item in self.code:
-                logger.error(f"Prohibited operation found: {item}")
-                return f"Prohibited operation: {item}"
+    def _validate_security(self, tree: ast.Module) -> Optional[str]:
+        # Checks the identifiers the contract actually uses, so strings and comments are not flagged
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                logger.error("Prohibited operation found: import")
+                return "Prohibited operation: import"
+            if isinstance(node, ast.Name):
+                names = [node.id]
+            elif isinstance(node, ast.Attribute):
+                names = [node.attr]
+            elif isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+                names = [node.name]
+            elif isinstance(node, ast.MatchClass):
+                # `case object(attr=x)` reads attributes just like `obj.attr`
+                names = node.kwd_attrs
+            else:
+                continue
+            for name in names:
+                if name in PROHIBITED_NAMES or name in INTROSPECTION_ATTRIBUTES or '__' in name:
+                    logger.error(f"Prohibited operation found: {name}")
+                    return f"Prohibited operation: {name}"
         return None
         
     def validate(self) -> tuple[bool, Optional[str]]:
+        # Parses, checks and compiles the contract once, execute only runs the cached code object
         logger.info(f"Validating contract {self.address}")
         
-        if not self._validate_syntax():
+        tree = self._parse()
+        if tree is None:
             return False, "Invalid syntax"
             
-        security_error = self._validate_security()
+        security_error = self._validate_security(tree)
         if security_error:
             return False, security_error
             
+        self.compiled = compile(instrument(tree), f'<contract {self.address}>', 'exec')
         return True, None
         
-    def execute(self, blockchain, params: dict) -> tuple[dict, float]:
-        logger.info(f"Executing contract {self.address}")
-        start_time = time.time()
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'address': self.address,
+            'code': self.code,
+            'owner': self.owner,
+            'state': self.state,
+            'created_at': self.created_at,
+            'gas_used': self.gas_used,
+            'last_execution': self.last_execution,
+            # marshal output is tied to the interpreter version, so it is only reused on the same one
+            'python': sys.implementation.cache_tag,
+            'metering': METERING_VERSION,
+            'compiled': base64.b64encode(marshal.dumps(self.compiled)).decode() if self.compiled else None
+        }
+        
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SmartContract':
+        contract = cls.__new__(cls)
+        contract.address = data['address']
+        contract.code = data['code']
+        contract.owner = data['owner']
+        contract.state = data['state']
+        contract.created_at = data['created_at']
+        contract.gas_used = data['gas_used']
+        contract.last_execution = data['last_execution']
+        contract.compiled = None
+        if (data.get('compiled') and data.get('python') == sys.implementation.cache_tag
+                and data.get('metering') == METERING_VERSION):
+            contract.compiled = marshal.loads(base64.b64decode(data['compiled']))
+        else:
+            contract.validate()
+        return contract
+        
+    def execute(self, blockchain, params: dict, gas_limit: int = config['CONTRACT_GAS_LIMIT'],
+                read_only: bool = False) -> tuple[dict, int]:
+        logger.info("Executing contract %s", self.address)
+        meter = GasMeter(gas_limit)
+        # The contract works on a copy-on-write view, its changes only reach self.state through the commit below
+        overlay = StateOverlay(self.state)
         
         try:
+            if self.compiled is None:
+                raise Exception("Contract has not been validated")
+            
             # Create restricted environment
-            safe_globals = self._create_safe_environment(blockchain, params)
+            safe_globals = self._create_safe_environment(blockchain, overlay, params, meter)
             
-            # Execute with timeout
+            # Gas stops runaway loops, the timeout is only a backstop for long running builtins
             try:
-                with timeout(seconds=2):  # TODO: make timeout configurable or dynamic
-                    exec(self.code, safe_globals, {})
+                with timeout(seconds=config['CONTRACT_TIMEOUT']):
+                    run_metered(self.compiled, safe_globals, meter)
             except TimeoutError as e:
                 logger.error(f"Contract execution timed out: {str(e)}")
                 raise Exception("Contract execution timed out")
                 
-            execution_time = time.time() - start_time
-            self.gas_used += execution_time * 1000  # Convert to milliseconds
+            logger.info("Contract executed successfully. Gas used: %s", meter.used)
+            if read_only:
+                return dict(overlay), meter.used
+            blockchain.contract_state.commit(self, *overlay.diff())
             self.last_execution = time.time()
+            return self.state, meter.used
             
-            logger.info(f"Contract executed successfully. Gas used: {self.gas_used}")
-            return self.state, self.gas_used
-            
+        except OutOfGas as e:
+            logger.error(f"Contract execution failed: {str(e)}")
+            raise
         except Exception as e:
             logger.error(f"Contract execution failed: {str(e)}")
             raise Exception(str(e))
+        finally:
+            # Gas is charged for failed calls too
+            self.gas_used += meter.used
             
-    def _create_safe_environment(self, blockchain, params: dict) -> dict:
-        return {
-            'blockchain': BlockchainInterface(blockchain),
-            'params': params.copy(),
-            'state': self.state,
-            'now': time.time,
-            'sender': params.get('sender'),
-        }
+    def _create_safe_environment(self, blockchain, state: StateOverlay, params: dict, meter: GasMeter) -> dict:
+        return create_safe_environment(BlockchainInterface(blockchain), state, params, meter)
+        
+def create_safe_environment(interface, state: dict, params: dict, meter: GasMeter) -> dict:
+    return {
+        '__builtins__': SAFE_BUILTINS,
+        # Read by class bodies for __module__
+        '__name__': 'contract',
+        'blockchain': interface,
+        'params': params.copy(),
+        'state': contract_view(state),
+        'now': time.time,
+        'sender': params.get('sender'),
+        **meter.bindings(),
+    }
+        
+def run_metered(compiled: CodeType, safe_globals: dict, meter: GasMeter) -> None:
+    try:
+        exec(compiled, safe_globals, {})
+    except Exception:
+        # Whatever the contract raised once the meter ran dry (StopIteration, or RuntimeError from
+        # inside a generator) is reported as running out of gas
+        meter.check()
+        raise
+    # The contract may have caught the last charge and finished without another one
+    meter.check()
         
 class BlockchainInterface:
     def __init__(self, blockchain):
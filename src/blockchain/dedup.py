@@ -0,0 +1,124 @@
+import math
+from collections import deque
+from typing import Dict, Any, Deque, List, Set, Tuple
+from src.blockchain.helpers import hash_transaction
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.utils.logger import setup_logger
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('blockchain.dedup')
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+        self.size: int = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes: int = max(1, round(self.size / capacity * math.log(2)))
+        self.bits: bytearray = bytearray((self.size + 7) // 8)
+        self.count: int = 0
+
+    def _positions(self, digest: bytes) -> List[int]:
+        # The items are already SHA-256 digests, so two slices of them are combined instead of hashing again
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:16], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, digest: bytes) -> None:
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class ScalableBloomFilter:
+    # Adds a larger filter with a tighter error rate whenever the newest one is full, so the
+    # combined false positive rate stays below error_rate however many items are added
+    def __init__(self, capacity: int = config['DEDUP_BLOOM_CAPACITY'],
+                 error_rate: float = config['DEDUP_BLOOM_ERROR_RATE']) -> None:
+        self.filters: List[BloomFilter] = [BloomFilter(capacity, error_rate / 2)]
+
+    def add(self, digest: bytes) -> None:
+        last = self.filters[-1]
+        if last.count >= last.capacity:
+            last = BloomFilter(last.capacity * 2, last.error_rate / 2)
+            self.filters.append(last)
+        last.add(digest)
+
+    def __contains__(self, digest: bytes) -> bool:
+        return any(digest in bloom for bloom in reversed(self.filters))
+
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+
+class ProcessedTransactions:
+    # Hashes of mined transactions: exact sets of raw digests for the newest window_blocks blocks,
+    # a Bloom filter for everything older. A Bloom hit only means "maybe", the caller confirms it.
+    def __init__(self, window_blocks: int = config['DEDUP_WINDOW_BLOCKS']) -> None:
+        self.window_blocks: int = window_blocks
+        # (block index, digests of its transactions), oldest first
+        self.window: Deque[Tuple[int, Set[bytes]]] = deque()
+        self.recent: Dict[bytes, int] = {}
+        self.older: ScalableBloomFilter = ScalableBloomFilter()
+
+    def apply_block(self, block: Dict[str, Any]) -> None:
+        digests = {bytes.fromhex(hash_transaction(transaction)) for transaction in block.get('transactions', [])}
+        self.window.append((block['index'], digests))
+        for digest in digests:
+            self.recent[digest] = self.recent.get(digest, 0) + 1
+        self._expire()
+
+    def _expire(self) -> None:
+        while len(self.window) > self.window_blocks:
+            _, expired = self.window.popleft()
+            for digest in expired:
+                self._forget_recent(digest)
+                self.older.add(digest)
+
+    def revert_block(self, block: Dict[str, Any]) -> None:
+        # Blocks that already left the window stay in the Bloom filter, which only costs a confirmation lookup
+        if self.window and self.window[-1][0] == block['index']:
+            for digest in self.window.pop()[1]:
+                self._forget_recent(digest)
+
+    def _forget_recent(self, digest: bytes) -> None:
+        remaining = self.recent[digest] - 1
+        if remaining:
+            self.recent[digest] = remaining
+        else:
+            del self.recent[digest]
+
+    def rebuild(self, chain: List[Dict[str, Any]]) -> None:
+        logger.info(f"Rebuilding processed transaction filter from {len(chain)} blocks")
+        self.window = deque()
+        self.recent = {}
+        self.older = ScalableBloomFilter()
+        for block in chain:
+            self.apply_block(block)
+
+    def snapshot(self) -> Dict[str, Any]:
+        # The counts in recent follow from the window
+        return {'window': self.window, 'older': self.older}
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.window = deque(state['window'])
+        self.recent = {}
+        self.older = state['older']
+        for _, digests in self.window:
+            for digest in digests:
+                self.recent[digest] = self.recent.get(digest, 0) + 1
+        # DEDUP_WINDOW_BLOCKS may have been lowered since the snapshot was taken
+        self._expire()
+
+    def is_recent(self, transaction_hash: str) -> bool:
+        return bytes.fromhex(transaction_hash) in self.recent
+
+    def may_be_older(self, transaction_hash: str) -> bool:
+        return bytes.fromhex(transaction_hash) in self.older
@@ -0,0 +1,251 @@
+from typing import Dict, Any, Tuple, List, Set
+from collections import OrderedDict
+import itertools
+import marshal
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+from src.utils.logger import setup_logger
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.blockchain.contract import SmartContract, BlockchainInterface, create_safe_environment, run_metered
+from src.blockchain.gas import GasMeter, OutOfGas
+from src.blockchain.state import StateOverlay, apply_diff
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('blockchain.executor')
+
+# Contracts whose code and state a worker keeps between calls
+WORKER_CACHE_SIZE = 64
+# BlockchainInterface methods a worker may ask the parent to run
+REMOTE_CALLS = {'get_balance'}
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class RemoteBlockchainInterface:
+    # Worker side stand-in for BlockchainInterface, balance lookups are answered by the parent
+    def __init__(self, conn: Any, block_number: int) -> None:
+        self._conn = conn
+        self._block_number = block_number
+
+    def get_balance(self, address: str) -> float:
+        self._conn.send(('call', 'get_balance', address))
+        status, value = self._conn.recv()
+        if status == 'error':
+            raise Exception(value)
+        return value
+
+    def get_block_number(self) -> int:
+        return self._block_number
+
+
+def _cache_entry(cache: 'OrderedDict[str, Any]', address: str, value: Any) -> None:
+    # Both ends of the pipe run this on every call, so their caches evict the same contracts
+    if value is not None:
+        cache[address] = value
+    cache.move_to_end(address)
+    while len(cache) > WORKER_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _worker_main(conn: Any) -> None:
+    # address -> [code object, state]
+    cache: 'OrderedDict[str, List[Any]]' = OrderedDict()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        _, address, code, state, params, block_number, gas_limit, commit = message
+        _cache_entry(cache, address, [marshal.loads(code), None] if code is not None else None)
+        entry = cache[address]
+        if state is not None:
+            entry[1] = pickle.loads(state)
+
+        # The contract works on a copy-on-write view, its diff is what goes back
+        overlay = StateOverlay(entry[1])
+        meter = GasMeter(gas_limit)
+        try:
+            run_metered(entry[0], create_safe_environment(RemoteBlockchainInterface(conn, block_number), overlay, params, meter), meter)
+        except OutOfGas as e:
+            conn.send(('error', True, str(e), meter.used))
+            continue
+        except Exception as e:
+            conn.send(('error', False, f'{type(e).__name__}: {str(e)}', meter.used))
+            continue
+        changes, deleted = overlay.diff()
+        if commit:
+            apply_diff(entry[1], changes, deleted)
+        conn.send(('done', changes, deleted, meter.used))
+
+
+class _Worker:
+    def __init__(self, context: Any) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # Mirror of the worker's cache: the state version it holds for each contract it has loaded
+        self.cache: 'OrderedDict[str, int]' = OrderedDict()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class ContractExecutor:
+    def __init__(self, workers: int = config['CONTRACT_WORKERS'], queue_depth: int = config['CONTRACT_QUEUE_DEPTH'],
+                 timeout: float = config['CONTRACT_TIMEOUT']) -> None:
+        self.workers: int = workers
+        self.queue_depth: int = queue_depth
+        self.timeout: float = timeout
+        self._context = multiprocessing.get_context('spawn')
+        self._idle: 'queue.Queue[_Worker]' = queue.Queue()
+        # Every live worker, idle or busy, so shutdown can stop them all
+        self._workers: Set[_Worker] = set()
+        self._started: bool = False
+        self._waiting: int = 0
+        self._lock = threading.Lock()
+        self._contract_locks: Dict[str, threading.Lock] = {}
+        # The parent's state version per contract, bumped every time a diff is applied
+        self._versions: Dict[str, int] = {}
+        self._version_counter = itertools.count(1)
+
+    def _start(self) -> None:
+        with self._lock:
+            if not self._started:
+                logger.info(f"Starting {self.workers} contract worker processes")
+                self._started = True
+                for _ in range(self.workers):
+                    self._add_worker()
+
+    def _add_worker(self) -> None:
+        worker = _Worker(self._context)
+        self._workers.add(worker)
+        self._idle.put(worker)
+
+    def _replace(self, worker: _Worker) -> None:
+        # A worker that may be in the middle of a call is never reused
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+            if self._started:
+                self._add_worker()
+
+    def _remote_call(self, interface: BlockchainInterface, message: Tuple[Any, ...]) -> Tuple[str, Any]:
+        # Failures are sent back to the worker, where they fail the contract like any exception it raises
+        if message[1] not in REMOTE_CALLS:
+            return 'error', f'{message[1]} is not available to contracts'
+        try:
+            return 'ok', getattr(interface, message[1])(*message[2:])
+        except Exception as e:
+            return 'error', f'{type(e).__name__}: {str(e)}'
+
+    def _contract_lock(self, address: str) -> threading.Lock:
+        with self._lock:
+            return self._contract_locks.setdefault(address, threading.Lock())
+
+    def execute(self, contract: SmartContract, blockchain: Any, params: Dict[str, Any],
+                gas_limit: int = config['CONTRACT_GAS_LIMIT'], read_only: bool = False) -> Tuple[Dict[str, Any], int]:
+        if not self._started:
+            self._start()
+        with self._lock:
+            if self._waiting >= self.queue_depth:
+                raise ExecutorBusy(f'Contract executor queue is full ({self.queue_depth} calls waiting)')
+            self._waiting += 1
+        deadline = time.monotonic() + self.timeout
+        try:
+            # Calls to one contract are serialized so their state diffs apply in order
+            contract_lock = self._contract_lock(contract.address)
+            if not contract_lock.acquire(timeout=self.timeout):
+                raise TimeoutError('Timed out waiting for the contract')
+            try:
+                worker = self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                contract_lock.release()
+                raise TimeoutError('Timed out waiting for a contract worker')
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        try:
+            return self._run(worker, contract, blockchain, params, gas_limit, read_only, deadline)
+        finally:
+            contract_lock.release()
+
+    def _run(self, worker: _Worker, contract: SmartContract, blockchain: Any, params: Dict[str, Any],
+             gas_limit: int, read_only: bool, deadline: float) -> Tuple[Dict[str, Any], int]:
+        address = contract.address
+        # Until the call completes every failure replaces the worker, so none is lost from the pool
+        try:
+            version = self._versions.setdefault(address, next(self._version_counter))
+            code = None if address in worker.cache else marshal.dumps(contract.compiled)
+            # State only travels when the worker's copy is out of date
+            state = None if worker.cache.get(address) == version else pickle.dumps(contract.state)
+            _cache_entry(worker.cache, address, version)
+            interface = BlockchainInterface(blockchain)
+            worker.conn.send(('run', address, code, state, params, len(blockchain.chain), gas_limit, not read_only))
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not worker.conn.poll(remaining):
+                    raise TimeoutError('Contract execution timed out')
+                message = worker.conn.recv()
+                if message[0] == 'call':
+                    worker.conn.send(self._remote_call(interface, message))
+                    continue
+                if message[0] in ('done', 'error'):
+                    break
+        except BaseException as e:
+            logger.error(f"Contract {address} failed in worker {worker.process.pid}: {type(e).__name__}: {str(e)}")
+            self._replace(worker)
+            if isinstance(e, TimeoutError):
+                raise Exception('Contract execution timed out')
+            if isinstance(e, (EOFError, OSError)):
+                raise Exception('Contract worker crashed')
+            raise
+
+        # From here on the worker has finished the call, so it goes back to the pool whatever happens
+        try:
+            if message[0] == 'error':
+                # The worker's cached state is untouched by a failed call, the gas it burned is still charged
+                _, out_of_gas, error, gas_used = message
+                contract.gas_used += gas_used
+                raise OutOfGas(error) if out_of_gas else Exception(error)
+            _, changes, deleted, gas_used = message
+            contract.gas_used += gas_used
+            logger.info("Contract %s executed in worker %s. Gas used: %s", address, worker.process.pid, gas_used)
+            if read_only:
+                # The worker discarded the changes too, so its cached state is still current
+                return dict(StateOverlay(contract.state, changes, deleted)), gas_used
+            # Until the diff is committed here the worker's copy counts as stale, and is resent next time
+            worker.cache[address] = None
+            blockchain.contract_state.commit(contract, changes, deleted)
+            # The worker already holds the new state, so it stays in sync without shipping it back
+            new_version = next(self._version_counter)
+            self._versions[address] = new_version
+            worker.cache[address] = new_version
+            contract.last_execution = time.time()
+            return contract.state, gas_used
+        finally:
+            # Unless shutdown stopped it in the meantime
+            if worker in self._workers:
+                self._idle.put(worker)
+
+    def invalidate(self, address: str) -> None:
+        # For state changed outside the executor, workers then receive it again on their next call
+        self._versions.pop(address, None)
+
+    def shutdown(self) -> None:
+        # Busy workers are killed too; the calls they were running fail with 'Contract worker crashed'
+        with self._lock:
+            self._started = False
+            workers, self._workers = self._workers, set()
+            while not self._idle.empty():
+                self._idle.get()
+        for worker in workers:
+            worker.kill()
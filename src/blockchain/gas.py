@@ -0,0 +1,101 @@
+from typing import Any, Dict
+import ast
+import itertools
+import operator
+
+# Bumped whenever instrument changes, so contracts compiled by an older version are recompiled on load
+METERING_VERSION = 1
+# Names the instrumented code uses. The contract validator rejects dunder names, so contracts can neither call nor shadow them.
+CHARGE_NAME = '__gas__'
+TICKS_NAME = '__gas_ticks__'
+ZIP_NAME = '__gas_zip__'
+TICK_TARGET = '__gas_tick__'
+
+
+class OutOfGas(Exception):
+    pass
+
+
+class GasMeter:
+    __slots__ = ('limit', '_ticks')
+
+    def __init__(self, limit: int) -> None:
+        self.limit: int = limit
+        # One spare tick so running dry means the limit was exceeded rather than just reached
+        self._ticks = itertools.repeat(True, limit + 1)
+
+    @property
+    def charge(self) -> Any:
+        # The iterator's own __next__ is a C call, much cheaper than a Python level counter.
+        # Once exhausted every further charge raises again, so contract code cannot swallow it and keep looping.
+        return self._ticks.__next__
+
+    def bindings(self) -> Dict[str, Any]:
+        # What the instrumented code expects to find in its globals
+        return {CHARGE_NAME: self.charge, TICKS_NAME: self._ticks, ZIP_NAME: zip}
+
+    @property
+    def exhausted(self) -> bool:
+        return operator.length_hint(self._ticks) == 0
+
+    @property
+    def used(self) -> int:
+        return min(self.limit + 1 - operator.length_hint(self._ticks), self.limit)
+
+    def check(self) -> None:
+        if self.exhausted:
+            raise OutOfGas(f'Out of gas: limit of {self.limit} exceeded')
+
+
+def _charge() -> ast.Call:
+    return ast.Call(func=ast.Name(id=CHARGE_NAME, ctx=ast.Load()), args=[], keywords=[])
+
+
+def _metered_iteration(node: Any) -> None:
+    # for x in xs  ->  for __gas_tick__, x in zip(ticks, xs)
+    # zip draws a tick before every item in C, roughly half the cost of a charge call per iteration.
+    # When the ticks run out the loop just ends, and the meter reports the contract as out of gas afterwards.
+    node.iter = ast.Call(func=ast.Name(id=ZIP_NAME, ctx=ast.Load()),
+                         args=[ast.Name(id=TICKS_NAME, ctx=ast.Load()), node.iter], keywords=[])
+    node.target = ast.Tuple(elts=[ast.Name(id=TICK_TARGET, ctx=ast.Store()), node.target], ctx=ast.Store())
+
+
+class GasInstrumenter(ast.NodeTransformer):
+    # One unit of gas for entering the contract, every loop iteration (plus one for the final
+    # check of a for loop), every call to a function the contract defines and every comprehension
+    # iteration. Straight-line code between these points is bounded by the size of the contract,
+    # so it is not metered.
+
+    def _charge_body(self, node: Any) -> Any:
+        self.generic_visit(node)
+        node.body.insert(0, ast.Expr(value=_charge()))
+        return node
+
+    visit_Module = _charge_body
+    visit_AsyncFor = _charge_body
+    visit_While = _charge_body
+    visit_FunctionDef = _charge_body
+    visit_AsyncFunctionDef = _charge_body
+
+    def visit_For(self, node: ast.For) -> ast.For:
+        self.generic_visit(node)
+        _metered_iteration(node)
+        return node
+
+    def visit_Lambda(self, node: ast.Lambda) -> ast.Lambda:
+        self.generic_visit(node)
+        # The charge returns True, so `True and body` evaluates to the body
+        node.body = ast.BoolOp(op=ast.And(), values=[_charge(), node.body])
+        return node
+
+    def visit_comprehension(self, node: ast.comprehension) -> ast.comprehension:
+        self.generic_visit(node)
+        if node.is_async:
+            node.ifs.insert(0, _charge())
+        else:
+            _metered_iteration(node)
+        return node
+
+
+def instrument(tree: ast.Module) -> ast.Module:
+    return ast.fix_missing_locations(GasInstrumenter().visit(tree))
@@ -1,20 +1,30 @@
-from sympy import prime
-from functools import reduce
-from typing import List
+from functools import lru_cache
+from typing import List, Iterable
 from src.config.config import BLOCKCHAIN_CONFIG
+from src.blockchain.primes import PrimeTable
 from src.utils.logger import setup_logger
 
 logger = setup_logger('blockchain.hashing')
 
 config = BLOCKCHAIN_CONFIG['HASH_CONFIG']
 
+# n-th prime lookups come from a sieve that is built once and memory-mapped from disk
+prime_table = PrimeTable(config.get('prime_cache_dir', 'cache'), config.get('prime_limit', 9999999))
 
-def get_dynamic_primes(s: str) -> List[int]:
-    logger.debug(f"Processing input of length {len(s)}")
-    n = len(s) ** config.get('size_exponent', 5) % config.get('prime_limit', 9999999)
+
+@lru_cache(maxsize=1024)
+def _primes_for_length(length: int) -> List[int]:
+    n = length ** config.get('size_exponent', 5) % config.get('prime_limit', 9999999)
     if n == 0:
         return [2]
-    return [prime(n//(i+1)) for i in range(config.get('primes_no', 1))]
+    # n//(i+1) is 0 for one character inputs, which used to make the prime lookup raise
+    return [prime_table.nth(max(n//(i+1), 1)) for i in range(config.get('primes_no', 1))]
+
+
+def get_dynamic_primes(s: str) -> List[int]:
+    # The primes only depend on the length of the input
+    logger.debug("Processing input of length %d", len(s))
+    return _primes_for_length(len(s))
 
 
 def get_ord_sum(s: str) -> int:
@@ -26,7 +36,11 @@ def mix_value(v: int, p: int, mix_sum: int) -> int:
 
 
 def calculate_hash(primes: List[int], n: int) -> int:
-    return reduce(lambda acc, p: int(bin(mix_value(acc, p, n))[2:], 10) % p, primes * config.get('mix_rounds', 1), n)
+    # Each round reads the binary digits of the mixed value as a decimal number, modulo the prime
+    acc = n
+    for p in primes * config.get('mix_rounds', 1):
+        acc = int(format(mix_value(acc, p, n), 'b')) % p
+    return acc
 
 
 def standardize_hash_value(value: int) -> str:
@@ -35,4 +49,13 @@ def standardize_hash_value(value: int) -> str:
 
 def hashing_algorithm(input_string: str) -> str:
     logger.info("Processing hash calculation")
-    return standardize_hash_value(calculate_hash(get_dynamic_primes(input_string), get_ord_sum(input_string)))
+    return standardize_hash_value(calculate_hash(_primes_for_length(len(input_string)), get_ord_sum(input_string)))
+
+
+def hashing_algorithm_many(input_strings: Iterable[str]) -> List[str]:
+    inputs = list(input_strings)
+    logger.info(f"Processing hash calculation for {len(inputs)} inputs")
+    # Size the prime table for the longest lookup once, instead of growing it part way through
+    prime_table.ensure(max((len(s) ** config.get('size_exponent', 5) % config.get('prime_limit', 9999999)
+                            for s in inputs), default=0))
+    return [standardize_hash_value(calculate_hash(_primes_for_length(len(s)), get_ord_sum(s))) for s in inputs]
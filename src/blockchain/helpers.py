@@ -1,9 +1,13 @@
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import itertools
 import datetime
 import hashlib
 import json
 from flask import jsonify, Response
+from werkzeug.http import http_date
+from src.blockchain.models import Block, Transaction
 from src.utils.logger import setup_logger
+from src.utils.encoding import dumps
 
 logger = setup_logger('blockchain.helpers')
 
@@ -16,7 +20,8 @@ def validate_fields(data: Dict[str, Any], required_fields: List[str]) -> Optiona
 
 
 def make_response(message: str, status_code: int, 
-                 data: Optional[Dict[str, Any]] = None) -> Tuple[Response, int]:
+                 data: Optional[Dict[str, Any]] = None,
+                 etag: Optional[str] = None) -> Tuple[Response, int]:
     response = {
         'status': 'success' if status_code < 400 else 'error',
         'message': message,
@@ -24,14 +29,65 @@ def make_response(message: str, status_code: int,
     }
     if data:
         response.update(data)
-    return jsonify(response), status_code
+    json_response = jsonify(response)
+    if etag:
+        json_response.set_etag(etag)
+    return json_response, status_code
+
+
+def make_blocks_response(message: str, status_code: int, records: Iterable[bytes],
+                         data: Optional[Dict[str, Any]] = None,
+                         etag: Optional[str] = None) -> Tuple[Response, int]:
+    # Same body as make_response with a 'chain' list, but streamed from already serialized blocks
+    response = {
+        'status': 'success' if status_code < 400 else 'error',
+        'message': message,
+        'timestamp': http_date(datetime.datetime.now())
+    }
+    if data:
+        response.update(data)
+    head = dumps(response)[:-1] + b',"chain":['
+
+    def generate() -> Iterator[bytes]:
+        yield head
+        iterator = iter(records)
+        separator = b''
+        while True:
+            chunk = b','.join(itertools.islice(iterator, 256))
+            if not chunk:
+                break
+            yield separator + chunk
+            separator = b','
+        yield b']}\n'
+
+    stream_response = Response(generate(), mimetype='application/json')
+    if etag:
+        stream_response.set_etag(etag)
+    return stream_response, status_code
+
+
+def make_not_modified_response(etag: str) -> Tuple[Response, int]:
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response, 304
 
 
 def hash_block(block: Dict[str, Any]) -> str:
-    logger.debug(f"Hashing block {block.get('index', 'unknown')}")
+    if isinstance(block, Block):
+        return block.block_hash
+    logger.debug("Hashing block %s", block.get('index', 'unknown'))
+    if 'merkle_root' in block:
+        # The Merkle root commits to the transactions, so only the header is hashed
+        block = {key: value for key, value in block.items() if key != 'transactions'}
     try:
         encoded_block = json.dumps(block, sort_keys=True).encode()
         return hashlib.sha256(encoded_block).hexdigest()
     except Exception as e:
         logger.error(f"Error hashing block: {str(e)}")
         raise
+
+
+def hash_transaction(transaction: Dict[str, Any]) -> str:
+    if isinstance(transaction, Transaction):
+        return transaction.transaction_hash
+    return hashlib.sha256(json.dumps(transaction, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,93 @@
+from typing import Dict, Any, List, Optional, Tuple
+from src.blockchain.helpers import hash_transaction
+from src.utils.logger import setup_logger
+
+logger = setup_logger('blockchain.index')
+
+# (block index, position of the transaction in the block)
+Location = Tuple[int, int]
+
+
+class TransactionIndex:
+    def __init__(self) -> None:
+        # Transaction hash -> where it was mined
+        self.transactions: Dict[str, Location] = {}
+        # Address -> locations of every transaction it sent or received, in chain order
+        self.history: Dict[str, List[Location]] = {}
+        # Store holding the locations of the first `stored` blocks, see use_store
+        self.store: Optional[Any] = None
+        self.stored: int = 0
+
+    def use_store(self, store: Any) -> None:
+        # Called once the store holds every block applied so far. Its blocks are looked up there from
+        # then on, transactions and history only keep the blocks applied since
+        self.store = store
+        self.stored = store.height
+        self.transactions = {}
+        self.history = {}
+
+    def _addresses(self, transaction: Dict[str, Any]) -> Tuple[str, ...]:
+        # A transaction a user sends to themselves is posted once
+        sender, receiver = transaction['sender'], transaction['receiver']
+        return (sender,) if sender == receiver else (sender, receiver)
+
+    def apply_block(self, block: Dict[str, Any]) -> None:
+        for position, transaction in enumerate(block.get('transactions', [])):
+            location = (block['index'], position)
+            self.transactions[hash_transaction(transaction)] = location
+            for address in self._addresses(transaction):
+                self.history.setdefault(address, []).append(location)
+
+    def revert_block(self, block: Dict[str, Any]) -> None:
+        # Blocks are reverted newest first, so their postings are always at the end of each history
+        if self.store is not None and block['index'] <= self.stored:
+            # The store's rows of a reverted block are ignored until it is truncated
+            self.stored = block['index'] - 1
+            return
+        transactions = block.get('transactions', [])
+        for position in range(len(transactions) - 1, -1, -1):
+            transaction = transactions[position]
+            location = (block['index'], position)
+            transaction_hash = hash_transaction(transaction)
+            if self.transactions.get(transaction_hash) == location:
+                del self.transactions[transaction_hash]
+            for address in self._addresses(transaction):
+                postings = self.history.get(address)
+                if postings and postings[-1] == location:
+                    postings.pop()
+                    if not postings:
+                        del self.history[address]
+
+    def rebuild(self, chain: List[Dict[str, Any]]) -> None:
+        logger.info(f"Rebuilding transaction index from {len(chain)} blocks")
+        self.transactions = {}
+        self.history = {}
+        self.store = None
+        for block in chain:
+            self.apply_block(block)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'transactions': self.transactions, 'history': self.history}
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.transactions = state['transactions']
+        self.history = state['history']
+        self.store = None
+
+    def locate(self, transaction_hash: str) -> Optional[Location]:
+        location = self.transactions.get(transaction_hash)
+        if location is None and self.store is not None:
+            location = self.store.find_transaction(transaction_hash, self.stored)
+        return location
+
+    def get_history(self, address: str, offset: int, limit: int) -> Tuple[int, List[Location]]:
+        # Newest first; returns the total number of postings and the requested page
+        postings = self.history.get(address, [])
+        offset = max(offset, 0)
+        end = max(len(postings) - offset, 0)
+        page = postings[max(end - limit, 0):end][::-1]
+        if self.store is None:
+            return len(postings), page
+        # The store has the older postings, after the ones held here
+        total, older = self.store.get_history(address, max(offset - len(postings), 0), limit - len(page), self.stored)
+        return len(postings) + total, page + older
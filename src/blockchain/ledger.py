@@ -0,0 +1,81 @@
+from typing import Dict, Any, List, Iterable, Optional
+from src.utils.logger import setup_logger
+
+logger = setup_logger('blockchain.ledger')
+
+
+class Ledger:
+    def __init__(self) -> None:
+        # Confirmed balances, derived from the transactions of every block on the chain
+        self.balances: Dict[str, float] = {}
+        # Debits (amount + gas) of transactions still waiting in the mempool
+        self.pending_debits: Dict[str, float] = {}
+        # Store whose balances table the confirmed balances are read from, see use_store
+        self.store: Optional[Any] = None
+
+    def use_store(self, store: Any) -> None:
+        # Called once the store holds every block applied so far. Confirmed balances are read from it
+        # from then on, balances only keeps the changes of blocks applied or reverted since
+        self.store = store
+        self.balances = {}
+
+    def _credit(self, user: str, amount: float) -> None:
+        self.balances[user] = self.balances.get(user, 0) + amount
+
+    def _apply_transaction(self, transaction: Dict[str, Any], direction: int) -> None:
+        # a transaction a user sends to themselves only counts as a debit
+        sender = transaction['sender']
+        receiver = transaction['receiver']
+        self._credit(sender, -direction * (transaction['amount'] + transaction['gas']))
+        if receiver != sender:
+            self._credit(receiver, direction * transaction['amount'])
+
+    def apply_block(self, block: Dict[str, Any]) -> None:
+        for transaction in block.get('transactions', []):
+            self._apply_transaction(transaction, 1)
+
+    def revert_block(self, block: Dict[str, Any]) -> None:
+        for transaction in reversed(block.get('transactions', [])):
+            self._apply_transaction(transaction, -1)
+
+    def rebuild(self, chain: List[Dict[str, Any]], mempool: Iterable[Dict[str, Any]] = ()) -> None:
+        logger.info(f"Rebuilding ledger from {len(chain)} blocks")
+        self.balances = {}
+        self.pending_debits = {}
+        self.store = None
+        for block in chain:
+            self.apply_block(block)
+        for transaction in mempool:
+            self.add_pending(transaction)
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Pending debits are left out, they are rebuilt from the mempool
+        return {'balances': self.balances}
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.balances = state['balances']
+        self.pending_debits = {}
+        self.store = None
+
+    def add_pending(self, transaction: Dict[str, Any]) -> None:
+        if transaction['sender'] == '0':  # system rewards are never debited
+            return
+        sender = transaction['sender']
+        self.pending_debits[sender] = self.pending_debits.get(sender, 0) + transaction['amount'] + transaction['gas']
+
+    def release_pending(self, transaction: Dict[str, Any]) -> None:
+        sender = transaction['sender']
+        if sender not in self.pending_debits:
+            return
+        remaining = self.pending_debits[sender] - (transaction['amount'] + transaction['gas'])
+        if remaining <= 1e-9:
+            del self.pending_debits[sender]
+        else:
+            self.pending_debits[sender] = remaining
+
+    def get_balance(self, user: str) -> float:
+        balance = self.balances.get(user, 0)
+        return balance + self.store.get_balance(user) if self.store is not None else balance
+
+    def get_available_balance(self, user: str) -> float:
+        return self.get_balance(user) - self.pending_debits.get(user, 0)
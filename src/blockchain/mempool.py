@@ -0,0 +1,132 @@
+from typing import Dict, Any, List, Tuple, Set, Iterator, Optional
+import heapq
+import itertools
+import json
+from src.utils.logger import setup_logger
+from src.config.config import BLOCKCHAIN_CONFIG
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('blockchain.mempool')
+
+
+class MempoolEntry:
+    __slots__ = ('transaction_hash', 'transaction', 'priority', 'seq', 'size')
+
+    def __init__(self, transaction_hash: str, transaction: Dict[str, Any], seq: int) -> None:
+        self.transaction_hash = transaction_hash
+        self.transaction = transaction
+        # System rewards always go first, everything else is ordered by the gas it pays
+        self.priority: Tuple[bool, float] = (transaction['sender'] == '0', transaction['gas'])
+        self.seq = seq
+        self.size = len(json.dumps(transaction))
+
+
+class Mempool:
+    def __init__(self, max_transactions: int = config['MEMPOOL_MAX_TRANSACTIONS'],
+                 max_bytes: int = config['MEMPOOL_MAX_BYTES'],
+                 max_per_sender: int = config['MEMPOOL_MAX_PER_SENDER']) -> None:
+        self.max_transactions: int = max_transactions
+        self.max_bytes: int = max_bytes
+        self.max_per_sender: int = max_per_sender
+        self.entries: Dict[str, MempoolEntry] = {}
+        self.by_sender: Dict[str, Set[str]] = {}
+        self.size_bytes: int = 0
+        # Two heaps over the same entries with lazy deletion: best first for block assembly, worst first for eviction
+        self._best: List[Tuple[bool, float, int, str]] = []
+        self._worst: List[Tuple[bool, float, int, str]] = []
+        self._seq = itertools.count()
+        # Admissions as (hash, transaction) and removals as (hash,) since the last drain, so the store
+        # can persist changes instead of the whole pool; None until a store is attached
+        self.journal: Optional[List[Tuple[Any, ...]]] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, transaction_hash: str) -> bool:
+        return transaction_hash in self.entries
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (transaction for _, transaction in self.items())
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        # Arrival order, which is also the order the mempool is persisted in
+        return [(entry.transaction_hash, entry.transaction)
+                for entry in sorted(self.entries.values(), key=lambda entry: entry.seq)]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    def drain_journal(self) -> List[Tuple[Any, ...]]:
+        changes, self.journal = self.journal or [], []
+        return changes
+
+    def _is_live(self, item: Tuple[bool, float, int, str]) -> bool:
+        entry = self.entries.get(item[3])
+        return entry is not None and entry.seq == abs(item[2])
+
+    def _compact(self) -> None:
+        if len(self._best) > 2 * len(self.entries) + 64:
+            self._best = [item for item in self._best if self._is_live(item)]
+            self._worst = [item for item in self._worst if self._is_live(item)]
+            heapq.heapify(self._best)
+            heapq.heapify(self._worst)
+
+    def _peek_worst(self) -> MempoolEntry:
+        while not self._is_live(self._worst[0]):
+            heapq.heappop(self._worst)
+        return self.entries[self._worst[0][3]]
+
+    def add(self, transaction_hash: str, transaction: Dict[str, Any]) -> Tuple[bool, List[Tuple[str, Dict[str, Any]]]]:
+        # Returns whether the transaction was admitted and the entries evicted to make room for it
+        entry = MempoolEntry(transaction_hash, transaction, next(self._seq))
+        sender = transaction['sender']
+        if sender != '0' and len(self.by_sender.get(sender, ())) >= self.max_per_sender:
+            logger.warning(f"Mempool rejected transaction: {sender} already has {self.max_per_sender} pending")
+            return False, []
+        if len(self.entries) >= self.max_transactions or self.size_bytes + entry.size > self.max_bytes:
+            if self.entries and self._peek_worst().priority >= entry.priority:
+                logger.warning("Mempool full, rejected transaction paying less than every pending one")
+                return False, []
+
+        self.entries[transaction_hash] = entry
+        self.by_sender.setdefault(sender, set()).add(transaction_hash)
+        self.size_bytes += entry.size
+        heapq.heappush(self._best, (not entry.priority[0], -entry.priority[1], entry.seq, transaction_hash))
+        heapq.heappush(self._worst, (entry.priority[0], entry.priority[1], -entry.seq, transaction_hash))
+        if self.journal is not None:
+            self.journal.append((transaction_hash, transaction))
+
+        evicted: List[Tuple[str, Dict[str, Any]]] = []
+        while len(self.entries) > self.max_transactions or self.size_bytes > self.max_bytes:
+            worst = self._peek_worst()
+            evicted.append((worst.transaction_hash, self.remove(worst.transaction_hash)))
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} low fee transactions from the mempool")
+        return transaction_hash in self.entries, evicted
+
+    def remove(self, transaction_hash: str) -> Dict[str, Any]:
+        entry = self.entries.pop(transaction_hash)
+        sender_hashes = self.by_sender[entry.transaction['sender']]
+        sender_hashes.discard(transaction_hash)
+        if not sender_hashes:
+            del self.by_sender[entry.transaction['sender']]
+        self.size_bytes -= entry.size
+        if self.journal is not None:
+            self.journal.append((transaction_hash,))
+        self._compact()
+        return entry.transaction
+
+    def peek(self, limit: int) -> List[Dict[str, Any]]:
+        best = heapq.nsmallest(limit + len(self._best) - len(self.entries), self._best)
+        return [self.entries[item[3]].transaction for item in best if self._is_live(item)][:limit]
+
+    def pop_best(self, limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        selected: List[Tuple[str, Dict[str, Any]]] = []
+        while self._best and len(selected) < limit:
+            item = heapq.heappop(self._best)
+            if self._is_live(item):
+                selected.append((item[3], self.remove(item[3])))
+        return selected
+
+    def transactions_from(self, sender: str) -> List[Dict[str, Any]]:
+        return [self.entries[transaction_hash].transaction for transaction_hash in self.by_sender.get(sender, ())]
@@ -0,0 +1,48 @@
+from typing import Dict, List, Sequence
+import hashlib
+
+# Root of a block without transactions
+EMPTY_ROOT = '0' * 64
+
+
+def _hash_pair(left: str, right: str) -> str:
+    return hashlib.sha256((left + right).encode()).hexdigest()
+
+
+def _next_level(level: List[str]) -> List[str]:
+    # An odd node out is paired with itself
+    if len(level) % 2:
+        level = level + [level[-1]]
+    return [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+
+
+def merkle_root(hashes: Sequence[str]) -> str:
+    level = list(hashes)
+    if not level:
+        return EMPTY_ROOT
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_proof(hashes: Sequence[str], index: int) -> List[Dict[str, str]]:
+    # Sibling hashes from the leaf up to the root, each with the side it is concatenated on
+    if not 0 <= index < len(hashes):
+        raise IndexError(f'No leaf at position {index}')
+    proof: List[Dict[str, str]] = []
+    level = list(hashes)
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling >= len(level):
+            sibling = index
+        proof.append({'hash': level[sibling], 'position': 'left' if sibling < index else 'right'})
+        level = _next_level(level)
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf: str, proof: Sequence[Dict[str, str]], root: str) -> bool:
+    current = leaf
+    for step in proof:
+        current = _hash_pair(step['hash'], current) if step['position'] == 'left' else _hash_pair(current, step['hash'])
+    return current == root
@@ -0,0 +1,119 @@
+from typing import Dict, Any, Optional, Tuple, List
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from src.utils.logger import setup_logger
+from src.config.config import BLOCKCHAIN_CONFIG
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('blockchain.miner')
+
+# Set in every pool worker by _init_worker, shared with the parent process
+_stop_event: Any = None
+
+
+def valid_proof(proof: int, prev_proof: int, difficulty: int = config['DIFFICULTY']) -> bool:
+    hash_operation = hashlib.sha256(str((proof ** 2) - (prev_proof ** 2)).encode()).hexdigest()
+    return hash_operation[:difficulty] == '0' * difficulty
+
+
+def search_nonces(start: int, stride: int, batch_size: int, prev_proof: int,
+                  difficulty: int, stop_event: Any) -> Tuple[Optional[int], int]:
+    # Tries the batches start, start + stride, ... and checks the stop flag once per batch
+    target = '0' * difficulty
+    prev_square = prev_proof ** 2
+    sha256 = hashlib.sha256
+    hashes = 0
+    batch_start = start
+    while not stop_event.is_set():
+        for proof in range(batch_start, batch_start + batch_size):
+            if sha256(str(proof * proof - prev_square).encode()).hexdigest().startswith(target):
+                stop_event.set()
+                return proof, hashes + proof - batch_start + 1
+        hashes += batch_size
+        batch_start += stride
+    return None, hashes
+
+
+def _init_worker(stop_event: Any) -> None:
+    global _stop_event
+    _stop_event = stop_event
+
+
+def _worker_search(start: int, stride: int, batch_size: int,
+                   prev_proof: int, difficulty: int) -> Tuple[Optional[int], int]:
+    return search_nonces(start, stride, batch_size, prev_proof, difficulty, _stop_event)
+
+
+class Miner:
+    def __init__(self, workers: int = config['MINING_WORKERS'],
+                 batch_size: int = config['MINING_BATCH_SIZE']) -> None:
+        self.workers: int = workers or os.cpu_count() or 1
+        self.batch_size: int = batch_size
+        self.last_stats: Dict[str, Any] = {}
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event: Any = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            logger.info(f"Starting mining pool with {self.workers} workers")
+            self._stop_event = self._context.Event()
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                             initializer=_init_worker, initargs=(self._stop_event,))
+        return self._pool
+
+    def mine(self, prev_proof: int, difficulty: int = config['DIFFICULTY']) -> Optional[int]:
+        with self._lock:
+            start_time = time.perf_counter()
+            if self.workers == 1:
+                self._stop_event = self._stop_event or threading.Event()
+                self._stop_event.clear()
+                proof, hashes = search_nonces(1, self.batch_size, self.batch_size,
+                                              prev_proof, difficulty, self._stop_event)
+            else:
+                proof, hashes = self._mine_parallel(prev_proof, difficulty)
+            elapsed = time.perf_counter() - start_time
+            self.last_stats = {
+                'proof': proof,
+                'hashes': hashes,
+                'elapsed': elapsed,
+                'hash_rate': hashes / elapsed if elapsed > 0 else 0.0,
+                'workers': self.workers,
+                'cancelled': proof is None
+            }
+            logger.info(f"Mining finished: proof={proof}, {hashes} hashes at {self.last_stats['hash_rate']:.0f} H/s")
+            return proof
+
+    def _mine_parallel(self, prev_proof: int, difficulty: int) -> Tuple[Optional[int], int]:
+        pool = self._get_pool()
+        self._stop_event.clear()
+        stride = self.workers * self.batch_size
+        futures: List[Future] = [
+            pool.submit(_worker_search, 1 + worker * self.batch_size, stride,
+                        self.batch_size, prev_proof, difficulty)
+            for worker in range(self.workers)
+        ]
+        # Every worker returns once the stop flag is set, so waiting for all of them is bounded by one batch
+        wait(futures, return_when=FIRST_COMPLETED)
+        self._stop_event.set()
+        wait(futures)
+        results = [future.result() for future in futures]
+        proofs = [proof for proof, _ in results if proof is not None]
+        hashes = sum(count for _, count in results)
+        return (min(proofs) if proofs else None), hashes
+
+    def cancel(self) -> None:
+        if self._stop_event is not None and self._lock.locked():
+            logger.info("Cancelling running proof of work")
+            self._stop_event.set()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self.cancel()
+            self._pool.shutdown(wait=True)
+            self._pool = None
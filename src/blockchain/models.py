@@ -0,0 +1,178 @@
+from typing import Dict, Any, Iterator, Optional, Sequence, Tuple
+from collections.abc import Mapping
+import hashlib
+import json
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.utils.encoding import dumps
+
+config = BLOCKCHAIN_CONFIG
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, sort_keys=True)
+
+
+def _canonical(fields: Dict[str, str]) -> bytes:
+    # Same bytes as json.dumps(obj, sort_keys=True) of the dict form, from already encoded values
+    return ('{' + ', '.join(f'{_encode(key)}: {fields[key]}' for key in sorted(fields)) + '}').encode()
+
+
+class Transaction(Mapping):
+    # Read-only mapping with the dict's keys, so code written against the wire format keeps working
+    __slots__ = ('sender', 'receiver', 'amount', 'gas', 'extra', '_hash')
+    FIELDS = ('sender', 'receiver', 'amount', 'gas')
+
+    def __init__(self, sender: str, receiver: str, amount: float, gas: float,
+                 extra: Optional[Dict[str, Any]] = None, transaction_hash: Optional[str] = None) -> None:
+        self.sender = sender
+        self.receiver = receiver
+        self.amount = amount
+        self.gas = gas
+        # Fields other nodes may send that this version does not know about, kept so the hash still matches
+        self.extra = extra
+        self._hash = transaction_hash
+
+    @classmethod
+    def from_dict(cls, data: Mapping, transaction_hash: Optional[str] = None) -> 'Transaction':
+        if isinstance(data, Transaction):
+            return data
+        extra = {key: value for key, value in data.items() if key not in cls.FIELDS} or None
+        return cls(data['sender'], data['receiver'], data['amount'], data['gas'], extra, transaction_hash)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {'sender': self.sender, 'receiver': self.receiver, 'amount': self.amount, 'gas': self.gas}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def canonical(self) -> bytes:
+        return _encode(self.to_dict()).encode()
+
+    @property
+    def transaction_hash(self) -> str:
+        if self._hash is None:
+            self._hash = hashlib.sha256(self.canonical()).hexdigest()
+        return self._hash
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.FIELDS
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return len(self.FIELDS) + len(self.extra or ())
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Transaction):
+            return self.transaction_hash == other.transaction_hash
+        return isinstance(other, Mapping) and self.to_dict() == dict(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'Transaction({self.to_dict()!r})'
+
+
+class Block(Mapping):
+    __slots__ = ('index', 'timestamp', 'transactions', 'proof', 'prev_hash', 'merkle_root', 'extra', '_hash', '_json')
+    FIELDS = ('index', 'timestamp', 'transactions', 'proof', 'prev_hash', 'merkle_root')
+
+    def __init__(self, index: int, timestamp: str, transactions: Sequence[Transaction], proof: int, prev_hash: str,
+                 merkle_root: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> None:
+        self.index = index
+        self.timestamp = timestamp
+        self.transactions: Tuple[Transaction, ...] = tuple(transactions)
+        self.proof = proof
+        self.prev_hash = prev_hash
+        # Blocks created before Merkle roots were introduced have none and are hashed whole
+        self.merkle_root = merkle_root
+        self.extra = extra
+        self._hash: Optional[str] = None
+        self._json: Optional[bytes] = None
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> 'Block':
+        if isinstance(data, Block):
+            return data
+        extra = {key: value for key, value in data.items() if key not in cls.FIELDS} or None
+        return cls(data['index'], data['timestamp'], [Transaction.from_dict(t) for t in data['transactions']],
+                   data['proof'], data['prev_hash'], data.get('merkle_root'), extra)
+
+    @classmethod
+    def from_json(cls, record: bytes) -> 'Block':
+        # The record is kept as the block's serialized form, so loaded blocks are never encoded again
+        block = cls.from_dict(json.loads(record))
+        if config['BLOCK_JSON_CACHE']:
+            block._json = record
+        return block
+
+    def header(self) -> Dict[str, Any]:
+        data = {'index': self.index, 'timestamp': self.timestamp, 'proof': self.proof, 'prev_hash': self.prev_hash}
+        if self.merkle_root is not None:
+            data['merkle_root'] = self.merkle_root
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.header()
+        data['transactions'] = [transaction.to_dict() for transaction in self.transactions]
+        return data
+
+    def canonical(self) -> bytes:
+        # With a Merkle root the header alone is hashed, the root commits to the transactions
+        fields = {key: _encode(value) for key, value in self.header().items()}
+        if self.merkle_root is None:
+            fields['transactions'] = '[' + ', '.join(t.canonical().decode() for t in self.transactions) + ']'
+        return _canonical(fields)
+
+    def json(self) -> bytes:
+        # Wire format bytes, encoded once and reused by storage and every chain response
+        if self._json is not None:
+            return self._json
+        encoded = dumps(self.to_dict())
+        if config['BLOCK_JSON_CACHE']:
+            self._json = encoded
+        return encoded
+
+    @property
+    def block_hash(self) -> str:
+        # Blocks are never modified once built, so the hash is computed at most once
+        if self._hash is None:
+            self._hash = hashlib.sha256(self.canonical()).hexdigest()
+        return self._hash
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS and (key != 'merkle_root' or self.merkle_root is not None):
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.FIELDS[:-1]
+        if self.merkle_root is not None:
+            yield 'merkle_root'
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return len(self.FIELDS) - (self.merkle_root is None) + len(self.extra or ())
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Block):
+            # The hash may cover only the header, the transactions are compared by their cached hashes
+            return self.block_hash == other.block_hash and self.transactions == other.transactions
+        return isinstance(other, Mapping) and self.to_dict() == dict(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'Block({self.to_dict()!r})'
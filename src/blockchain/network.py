@@ -0,0 +1,237 @@
+from typing import Dict, Any, List, Optional, Iterable, Tuple, Deque, Set, Callable
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from src.utils.logger import setup_logger
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.utils import metrics
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('blockchain.network')
+
+BLOCK_FIELDS = ('index', 'timestamp', 'proof', 'prev_hash', 'transactions')
+
+
+class PeerClient:
+    def __init__(self, max_workers: int = config['PEER_WORKERS'], timeout: float = config['NODE_TIMEOUT']) -> None:
+        self.timeout: float = timeout
+        # One keep-alive session shared by every worker thread, with a connection pool sized to match
+        self.session: requests.Session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='peer')
+
+    def get_json(self, node: str, path: str) -> Optional[Dict[str, Any]]:
+        response = self.session.get(f'http://{node}{path}', timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    def post_json(self, node: str, path: str, data: Any) -> requests.Response:
+        return self.session.post(f'http://{node}{path}', json=data, timeout=self.timeout)
+
+    def _header_hash(self, node: str, index: int) -> Optional[str]:
+        data = self.get_json(node, f'/get_headers?from={index}&to={index}')
+        if data is None:
+            raise ValueError(f'No header {index}')
+        headers = data['headers']
+        return headers[0]['hash'] if headers else None
+
+    def _fork_point(self, node: str, shared_height: int, local_hash: Callable[[int], str]) -> int:
+        # Number of leading blocks the peer has in common with us, looked for among our first shared_height.
+        # The newest page of headers usually holds the last common block, deeper forks are found by a
+        # binary search over single headers, which works since a common block means a common history
+        if shared_height == 0:
+            return 0
+        start = max(shared_height - config['HEADERS_PAGE_LIMIT'] + 1, 1)
+        data = self.get_json(node, f'/get_headers?from={start}&to={shared_height}')
+        if data is None:
+            raise ValueError('No headers')
+        for header in reversed(data['headers']):
+            if header['index'] <= shared_height and header['hash'] == local_hash(header['index']):
+                return header['index']
+        low, high = 0, start - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._header_hash(node, middle) == local_hash(middle):
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _fetch_chain(self, node: str, min_height: int, shared_height: int,
+                     local_hash: Optional[Callable[[int], str]]) -> Optional[Tuple[int, int, List[Dict[str, Any]]]]:
+        # Peers that are not ahead of min_height only cost the /chain_tip request
+        tip = self.get_json(node, '/chain_tip')
+        if tip is not None and tip['height'] <= min_height:
+            return None
+        # Only the blocks after the last one we have in common are downloaded
+        fork_point = self._fork_point(node, shared_height, local_hash) if local_hash is not None else 0
+        data = self.get_json(node, f'/get_chain?from={fork_point + 1}')
+        if data is None or data['length'] <= min_height:
+            return None
+        blocks = data['chain']
+        if (not isinstance(blocks, list) or len(blocks) != data['length'] - fork_point
+                or not all(isinstance(block, dict) and all(field in block for field in BLOCK_FIELDS) for block in blocks)):
+            raise ValueError('Malformed chain')
+        return data['length'], fork_point, blocks
+
+    @metrics.timed('peer_sync')
+    def fetch_chains(self, nodes: Iterable[str], min_height: int, shared_height: int = 0,
+                     local_hash: Optional[Callable[[int], str]] = None,
+                     deadline: float = config['SYNC_DEADLINE']) -> Dict[str, Tuple[int, int, List[Dict[str, Any]]]]:
+        # Per node: its chain length, the blocks it shares with us and the blocks after those.
+        # local_hash gives the hash of our block at an index up to shared_height
+        futures: Dict[Future, str] = {
+            self.executor.submit(self._fetch_chain, node, min_height, shared_height, local_hash): node for node in nodes
+        }
+        done, not_done = wait(futures, timeout=deadline)
+        for future in not_done:
+            future.cancel()
+            logger.warning(f"Node {futures[future]} did not answer before the sync deadline")
+
+        chains: Dict[str, Tuple[int, int, List[Dict[str, Any]]]] = {}
+        for future in done:
+            node = futures[future]
+            try:
+                result = future.result()
+            # A peer answering with the wrong shape only drops out of this round
+            except (requests.exceptions.RequestException, ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                logger.error(f"Failed to fetch chain from node {node}: {str(e)}")
+                continue
+            if result is not None:
+                chains[node] = result
+        return chains
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+class TransactionGossip:
+    def __init__(self, client: PeerClient, batch_size: int = config['GOSSIP_BATCH_SIZE'],
+                 queue_limit: int = config['GOSSIP_QUEUE_LIMIT'], max_retries: int = config['GOSSIP_MAX_RETRIES'],
+                 backoff: float = config['GOSSIP_BACKOFF'], seen_limit: int = config['GOSSIP_SEEN_LIMIT']) -> None:
+        self.client: PeerClient = client
+        self.batch_size: int = batch_size
+        self.queue_limit: int = queue_limit
+        self.max_retries: int = max_retries
+        self.backoff: float = backoff
+        self.seen_limit: int = seen_limit
+        # Per peer: transactions waiting to be sent, hashes it already has, and its retry state
+        self.queues: Dict[str, Deque[Tuple[str, Dict[str, Any]]]] = {}
+        self.seen: Dict[str, 'OrderedDict[str, None]'] = {}
+        self.failures: Dict[str, int] = {}
+        self.retry_at: Dict[str, float] = {}
+        self.in_flight: Set[str] = set()
+        self.dropped: int = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running: bool = False
+
+    def _mark_seen(self, node: str, transaction_hashes: Iterable[str]) -> None:
+        seen = self.seen.setdefault(node, OrderedDict())
+        for transaction_hash in transaction_hashes:
+            seen[transaction_hash] = None
+            seen.move_to_end(transaction_hash)
+        while len(seen) > self.seen_limit:
+            seen.popitem(last=False)
+
+    def mark_seen(self, node: str, transaction_hashes: Iterable[str]) -> None:
+        with self._lock:
+            self._mark_seen(node, transaction_hashes)
+
+    def enqueue(self, nodes: Iterable[str], transactions: List[Tuple[str, Dict[str, Any]]]) -> None:
+        with self._lock:
+            for node in nodes:
+                queue = self.queues.setdefault(node, deque(maxlen=self.queue_limit))
+                seen = self.seen.get(node, {})
+                for transaction_hash, transaction in transactions:
+                    if transaction_hash in seen:
+                        continue
+                    if len(queue) == self.queue_limit:
+                        self.dropped += 1  # the deque drops its oldest entry
+                    queue.append((transaction_hash, transaction))
+            if self._thread is None:
+                self._running = True
+                self._thread = threading.Thread(target=self._run, name='transaction-gossip', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self.queues.values()) + len(self.in_flight)
+
+    def _run(self) -> None:
+        while self._running:
+            self._wakeup.wait(timeout=self.backoff)
+            self._wakeup.clear()
+            now = time.monotonic()
+            with self._lock:
+                for node, queue in self.queues.items():
+                    if not queue or node in self.in_flight or self.retry_at.get(node, 0) > now:
+                        continue
+                    batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+                    self.in_flight.add(node)
+                    self.client.executor.submit(self._send, node, batch)
+
+    @metrics.timed('gossip_send')
+    def _send(self, node: str, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        try:
+            data: Dict[str, Any] = {'transactions': [transaction for _, transaction in batch]}
+            if config['NODE_ADDRESS']:
+                # Lets the peer skip sending these transactions back to us
+                data['origin'] = config['NODE_ADDRESS']
+            response = self.client.post_json(node, '/receive_transactions', data)
+            delivered = response.status_code < 400
+            if not delivered:
+                logger.error(f'Failed to broadcast {len(batch)} transactions to node: {node}')
+        except requests.exceptions.RequestException:
+            logger.error(f'Could not connect to node: {node}')
+            delivered = False
+        if metrics.enabled():
+            metrics.GOSSIP_TRANSACTIONS.inc(len(batch), 'delivered' if delivered else 'failed')
+
+        with self._lock:
+            self.in_flight.discard(node)
+            if delivered:
+                self.failures.pop(node, None)
+                self.retry_at.pop(node, None)
+                self._mark_seen(node, (transaction_hash for transaction_hash, _ in batch))
+            else:
+                failures = self.failures.get(node, 0) + 1
+                if failures > self.max_retries:
+                    logger.warning(f'Giving up on {len(batch)} transactions for node {node} after {self.max_retries} retries')
+                    self.failures.pop(node, None)
+                    self.dropped += len(batch)
+                else:
+                    # Back to the front of the queue, the newest entries give way if it is full
+                    self.failures[node] = failures
+                    self.retry_at[node] = time.monotonic() + self.backoff * 2 ** (failures - 1)
+                    queue = self.queues[node]
+                    overflow = max(len(queue) + len(batch) - self.queue_limit, 0)
+                    if overflow:
+                        logger.warning(f'Gossip queue for node {node} is full, dropped {overflow} transactions to retry the failed batch')
+                        self.dropped += overflow
+                    queue.extendleft(reversed(batch))
+        self._wakeup.set()
+
+    def flush(self, timeout: float = config['SYNC_DEADLINE']) -> bool:
+        deadline = time.monotonic() + timeout
+        while self.pending():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self) -> None:
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
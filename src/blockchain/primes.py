@@ -0,0 +1,107 @@
+from typing import Optional
+from array import array
+import itertools
+import math
+import mmap
+import os
+import re
+import tempfile
+import threading
+from src.utils.logger import setup_logger
+
+logger = setup_logger('blockchain.primes')
+
+TABLE_FILE = re.compile(r'^primes_(\d+)\.bin$')
+
+
+def prime_upper_bound(count: int) -> int:
+    # Rosser's theorem: the n-th prime is below n(ln n + ln ln n) for n >= 6
+    if count < 6:
+        return 15
+    return int(count * (math.log(count) + math.log(math.log(count)))) + 1
+
+
+def sieve_primes(count: int) -> array:
+    # Odd-only sieve of Eratosthenes, returns the first count primes as 32-bit integers
+    limit = prime_upper_bound(count)
+    size = (limit - 1) // 2  # index i stands for the odd number 2i + 1
+    sieve = bytearray([1]) * size
+    sieve[0] = 0
+    for i in range(1, (math.isqrt(limit) - 1) // 2 + 1):
+        if sieve[i]:
+            step = 2 * i + 1
+            start = 2 * i * (i + 1)
+            sieve[start::step] = bytes(len(range(start, size, step)))
+    primes = array('I', [2])
+    primes.extend(itertools.islice(itertools.compress(range(1, 2 * size, 2), sieve), count - 1))
+    return primes
+
+
+class PrimeTable:
+    def __init__(self, cache_dir: str, max_count: int) -> None:
+        self.cache_dir: str = cache_dir
+        self.max_count: int = max_count
+        self.count: int = 0
+        self._mmap: Optional[mmap.mmap] = None
+        self._primes: Optional[memoryview] = None
+        # Serializes growing and remapping; lookups take no lock, see nth
+        self._lock = threading.Lock()
+
+    def _cached_sizes(self) -> list:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return sorted(int(match.group(1)) for match in map(TABLE_FILE.match, os.listdir(self.cache_dir)) if match)
+
+    def _path(self, count: int) -> str:
+        return os.path.join(self.cache_dir, f'primes_{count}.bin')
+
+    def _open(self, count: int) -> None:
+        with open(self._path(count), 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        # The previous map is not closed: a lookup in another thread may still be reading it,
+        # it is unmapped once the last reference to it is gone
+        primes = memoryview(mapped).cast('I')
+        self._mmap, self._primes, self.count = mapped, primes, len(primes)
+        logger.info(f"Memory-mapped prime table with {self.count} primes")
+
+    def ensure(self, n: int) -> None:
+        if n <= self.count:
+            return
+        if n > self.max_count:
+            raise ValueError(f'Prime table is limited to {self.max_count} primes')
+        with self._lock:
+            # Another thread may have grown the table while this one waited
+            if n <= self.count:
+                return
+            cached = [size for size in self._cached_sizes() if size >= n]
+            if not cached:
+                # Grow geometrically so a run of longer inputs does not rebuild the table every time
+                count = min(max(n, 2 * self.count, 1 << 16), self.max_count)
+                logger.info(f"Building prime table with {count} primes")
+                primes = sieve_primes(count)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # A unique temporary name, other processes may be building the same table
+                with tempfile.NamedTemporaryFile('wb', dir=self.cache_dir, prefix=f'primes_{count}.', suffix='.tmp',
+                                                 delete=False) as file:
+                    primes.tofile(file)
+                os.replace(file.name, self._path(count))
+                cached = [count]
+            self._open(cached[0])
+
+    def nth(self, n: int) -> int:
+        # 1-based like sympy.prime, so nth(1) == 2
+        if n < 1:
+            raise ValueError('n must be a positive integer')
+        # A local reference, so a concurrent remap cannot swap the table between the check and the read
+        primes = self._primes
+        if primes is None or n > len(primes):
+            self.ensure(n)
+            primes = self._primes
+        return primes[n - 1]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._primes is not None:
+                self._primes.release()
+                self._mmap.close()
+                self._primes, self._mmap, self.count = None, None, 0
@@ -0,0 +1,118 @@
+from typing import Dict, Any, Optional, Set, Iterator
+from collections import OrderedDict
+import os
+from src.utils.logger import setup_logger
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.blockchain.contract import SmartContract
+from src.blockchain.storage import write_json_atomic, read_json
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('blockchain.registry')
+
+
+class ContractRegistry:
+    def __init__(self, directory: Optional[str] = None,
+                 capacity: int = config['CONTRACT_CACHE_SIZE']) -> None:
+        self._directory: Optional[str] = directory
+        self.capacity: int = capacity
+        # Recently used contracts with their compiled code, least recently used first
+        self.hot: 'OrderedDict[str, SmartContract]' = OrderedDict()
+        self.dirty: Set[str] = set()
+        self._cold: Optional[Set[str]] = None
+        # A SQLiteStore keeping the contracts in its database instead of one file each in directory
+        self.store: Optional[Any] = None
+
+    def attach(self, store: Any) -> None:
+        self.store = store
+        self._cold = None
+        # Cached contracts may only exist in the old location
+        self.dirty.update(self.hot)
+
+    @property
+    def directory(self) -> str:
+        # Defaults to CONTRACT_DIR as configured when it is used, not when the registry was created
+        return self._directory or config['CONTRACT_DIR']
+
+    @property
+    def cold(self) -> Set[str]:
+        # Addresses of contracts only kept on disk, listed the first time they are needed
+        if self._cold is None:
+            self._cold = set()
+            if self.store is not None:
+                self._cold = set(self.store.contract_addresses())
+            elif os.path.isdir(self.directory):
+                self._cold = {name[:-5] for name in os.listdir(self.directory) if name.endswith('.json')}
+        return self._cold
+
+    def _path(self, address: str) -> str:
+        return os.path.join(self.directory, f'{address}.json')
+
+    def __contains__(self, address: str) -> bool:
+        return address in self.hot or address in self.cold
+
+    def __len__(self) -> int:
+        return len(self.hot) + len(self.cold - self.hot.keys())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(set(self.hot) | self.cold)
+
+    def __getitem__(self, address: str) -> SmartContract:
+        contract = self.get(address)
+        if contract is None:
+            raise KeyError(address)
+        return contract
+
+    def _write(self, contract: SmartContract) -> None:
+        if self.store is not None:
+            self.store.save_contract(contract.address, contract.to_dict())
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            write_json_atomic(self._path(contract.address), contract.to_dict())
+        self.cold.add(contract.address)
+        self.dirty.discard(contract.address)
+
+    def _evict(self) -> None:
+        while len(self.hot) > self.capacity:
+            address, contract = self.hot.popitem(last=False)
+            # Contracts that are already on disk and unchanged do not need writing again
+            if address in self.dirty or address not in self.cold:
+                self._write(contract)
+            logger.info(f"Evicted contract {address} from the cache")
+
+    def deploy(self, contract: SmartContract) -> None:
+        if contract.compiled is None:
+            raise ValueError('Contract must be validated before it is deployed')
+        self.hot[contract.address] = contract
+        self.dirty.add(contract.address)
+        self._evict()
+
+    def get(self, address: str) -> Optional[SmartContract]:
+        contract = self.hot.get(address)
+        if contract is not None:
+            self.hot.move_to_end(address)
+            return contract
+        if address not in self.cold:
+            return None
+        if self.store is not None:
+            data: Optional[Dict[str, Any]] = self.store.load_contract(address)
+        else:
+            data = read_json(self._path(address), None)
+        if data is None:
+            self.cold.discard(address)
+            return None
+        contract = SmartContract.from_dict(data)
+        self.hot[address] = contract
+        self._evict()
+        logger.info(f"Loaded contract {address} from disk")
+        return contract
+
+    def mark_dirty(self, address: str) -> None:
+        self.dirty.add(address)
+
+    def flush(self) -> None:
+        for address in list(self.dirty):
+            if address in self.hot:
+                self._write(self.hot[address])
+        self.dirty.clear()
+        if self.store is not None:
+            self.store.sync()
@@ -0,0 +1,72 @@
+import os
+import pickle
+import struct
+import zlib
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from src.blockchain.helpers import hash_block
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.utils.logger import setup_logger
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('blockchain.snapshot')
+
+MAGIC = b'BCSNAP01'
+# Magic, block height, length of the tip hash that follows; the compressed state comes after the hash
+HEADER = struct.Struct('>8sQH')
+
+
+class SnapshotStore:
+    # Derived state (balances, indexes, duplicate filters) as of a block height, so loading only replays
+    # the blocks after it. Files are pickled by this node into its own chain directory, never from peers.
+    def __init__(self, directory: str, keep: int = config['SNAPSHOT_KEEP']) -> None:
+        self.directory: str = os.path.join(directory, 'snapshots')
+        self.keep: int = keep
+
+    def _path(self, height: int) -> str:
+        return os.path.join(self.directory, f'{height:012d}.snapshot')
+
+    def heights(self) -> List[int]:
+        # Newest first
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted((int(name[:-9]) for name in os.listdir(self.directory) if name.endswith('.snapshot')),
+                      reverse=True)
+
+    def save(self, height: int, tip_hash: str, state: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        encoded_hash = tip_hash.encode()
+        payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        path = self._path(height)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, height, len(encoded_hash)))
+            file.write(encoded_hash)
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+        for old_height in self.heights()[self.keep:]:
+            os.remove(self._path(old_height))
+        logger.info(f"Saved state snapshot at height {height} ({HEADER.size + len(encoded_hash) + len(payload)} bytes)")
+
+    def load(self, chain: Sequence[Dict[str, Any]]) -> Optional[Tuple[int, Dict[str, Any]]]:
+        # The newest snapshot whose block is still on the chain; later ones may be from an orphaned fork
+        for height in self.heights():
+            if height > len(chain):
+                continue
+            try:
+                with open(self._path(height), 'rb') as file:
+                    magic, stored_height, hash_length = HEADER.unpack(file.read(HEADER.size))
+                    tip_hash = file.read(hash_length).decode()
+                    if magic != MAGIC or stored_height != height:
+                        raise ValueError('not a snapshot file')
+                    # The header is checked before the state is decompressed
+                    if height and hash_block(chain[height - 1]) != tip_hash:
+                        continue
+                    state = pickle.loads(zlib.decompress(file.read()))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable snapshot at height {height}: {str(e)}")
+                continue
+            logger.info(f"Loaded state snapshot at height {height}")
+            return height, state
+        return None
@@ -0,0 +1,296 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+from src.blockchain.helpers import hash_block, hash_transaction
+from src.blockchain.models import Block, Transaction
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.utils.encoding import dumps
+from src.utils.logger import setup_logger
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('blockchain.sqlite_store')
+
+# Heights are 0-based chain positions, like BlockStore's; block_index in results is the 1-based block index
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    height INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    prev_hash TEXT NOT NULL,
+    record BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_hash ON blocks (hash);
+CREATE TABLE IF NOT EXISTS transactions (
+    height INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    receiver TEXT NOT NULL,
+    amount REAL NOT NULL,
+    gas REAL NOT NULL,
+    extra TEXT,
+    PRIMARY KEY (height, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS transactions_hash ON transactions (hash);
+CREATE TABLE IF NOT EXISTS postings (
+    address TEXT NOT NULL,
+    height INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (address, height, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_height ON postings (height);
+CREATE TABLE IF NOT EXISTS balances (
+    address TEXT PRIMARY KEY,
+    balance REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS contracts (
+    address TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mempool (
+    hash TEXT PRIMARY KEY,
+    sender TEXT NOT NULL,
+    debit REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS mempool_sender ON mempool (sender);
+CREATE TABLE IF NOT EXISTS node_state (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Fixed statements, so sqlite3's statement cache prepares each of them once per connection
+INSERT_BLOCK = 'INSERT INTO blocks (height, hash, prev_hash, record) VALUES (?, ?, ?, ?)'
+INSERT_TRANSACTION = ('INSERT INTO transactions (height, position, hash, sender, receiver, amount, gas, extra) '
+                      'VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+INSERT_POSTING = 'INSERT OR IGNORE INTO postings (address, height, position) VALUES (?, ?, ?)'
+ADD_BALANCE = ('INSERT INTO balances (address, balance) VALUES (?, ?) '
+               'ON CONFLICT (address) DO UPDATE SET balance = balance + excluded.balance')
+SAVE_STATE = ('INSERT INTO node_state (name, data) VALUES (?, ?) '
+              'ON CONFLICT (name) DO UPDATE SET data = excluded.data')
+# Replacing a row gives it a new rowid, so rowid order stays arrival order
+ADD_PENDING = 'INSERT OR REPLACE INTO mempool (hash, sender, debit, data) VALUES (?, ?, ?, ?)'
+REMOVE_PENDING = 'DELETE FROM mempool WHERE hash = ?'
+SAVE_CONTRACT = ('INSERT INTO contracts (address, data) VALUES (?, ?) '
+                 'ON CONFLICT (address) DO UPDATE SET data = excluded.data')
+
+
+def _balance_deltas(transaction: Dict[str, Any], direction: int) -> List[Tuple[str, float]]:
+    # The same rules as Ledger._apply_transaction
+    sender, receiver = transaction['sender'], transaction['receiver']
+    deltas = [(sender, -direction * (transaction['amount'] + transaction['gas']))]
+    if receiver != sender:
+        deltas.append((receiver, direction * transaction['amount']))
+    return deltas
+
+
+def _pending_row(transaction_hash: str, transaction: Dict[str, Any]) -> Tuple[str, str, float, str]:
+    # The same debit as Ledger.add_pending, system rewards are never debited
+    sender = transaction['sender']
+    debit = 0 if sender == '0' else transaction['amount'] + transaction['gas']
+    return transaction_hash, sender, debit, json.dumps(transaction)
+
+
+class SQLiteStore:
+    # Same interface as BlockStore, plus indexed lookups that read from disk instead of the in-memory chain
+    def __init__(self, directory: str, batch_blocks: int = config['FSYNC_GROUP']) -> None:
+        self.directory: str = directory
+        self.batch_blocks: int = batch_blocks
+        os.makedirs(directory, exist_ok=True)
+        # Shared by every thread of the node. sqlite3 serializes single calls on the connection, _lock keeps
+        # each write method's statements and the BEGIN/COMMIT around them from interleaving with another's
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(os.path.join(directory, 'chain.sqlite3'), check_same_thread=False,
+                                          isolation_level=None, cached_statements=64)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # With WAL, NORMAL only risks the last transactions on power loss, never corruption
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self._in_transaction: bool = False
+        self._unsynced: int = 0
+        # Changes are applied to the mempool table in place, there is no log to compact
+        self.mempool_log_size: int = 0
+        self._height: int = self.connection.execute('SELECT COUNT(*) FROM blocks').fetchone()[0]
+        logger.info(f"Opened SQLite block store {self.directory} at height {self._height}")
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    def _begin(self) -> None:
+        with self._lock:
+            if not self._in_transaction:
+                self.connection.execute('BEGIN')
+                self._in_transaction = True
+
+    def append(self, block: Dict[str, Any]) -> None:
+        # Rows of consecutive blocks are written in one transaction, committed every batch_blocks blocks
+        block = Block.from_dict(block)
+        height = self._height
+        transactions, postings, balances = [], [], []
+        for position, transaction in enumerate(block.transactions):
+            transactions.append((height, position, hash_transaction(transaction), transaction.sender,
+                                 transaction.receiver, transaction.amount, transaction.gas,
+                                 json.dumps(transaction.extra) if transaction.extra else None))
+            postings.append((transaction.sender, height, position))
+            postings.append((transaction.receiver, height, position))
+            balances.extend(_balance_deltas(transaction, 1))
+        with self._lock:
+            self._begin()
+            self.connection.execute(INSERT_BLOCK, (height, hash_block(block), block.prev_hash, block.json()))
+            self.connection.executemany(INSERT_TRANSACTION, transactions)
+            self.connection.executemany(INSERT_POSTING, postings)
+            self.connection.executemany(ADD_BALANCE, balances)
+            self._height += 1
+            self._unsynced += 1
+            if self._unsynced >= self.batch_blocks:
+                self.sync()
+
+    def truncate(self, height: int) -> None:
+        with self._lock:
+            if height >= self._height:
+                return
+            logger.info(f"Truncating SQLite block store from height {self._height} to {height}")
+            rows = self.connection.execute(
+                'SELECT sender, receiver, amount, gas FROM transactions WHERE height >= ?', (height,)).fetchall()
+            balances = [delta for sender, receiver, amount, gas in rows
+                        for delta in _balance_deltas({'sender': sender, 'receiver': receiver, 'amount': amount, 'gas': gas}, -1)]
+            self._begin()
+            self.connection.executemany(ADD_BALANCE, balances)
+            for table in ('blocks', 'transactions', 'postings'):
+                self.connection.execute(f'DELETE FROM {table} WHERE height >= ?', (height,))
+            self._height = height
+            self.sync()
+
+    def tip(self) -> Tuple[int, str]:
+        # Height and tip hash as committed, which may be ahead of self.height when another process writes
+        row = self.connection.execute('SELECT height, hash FROM blocks ORDER BY height DESC LIMIT 1').fetchone()
+        return (row[0] + 1, row[1]) if row else (0, '')
+
+    def data_version(self) -> int:
+        # Changes whenever another connection commits, a cheap way for readers to notice new data
+        return self.connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def read_block(self, height: int) -> Dict[str, Any]:
+        row = self.connection.execute('SELECT record FROM blocks WHERE height = ?', (height,)).fetchone()
+        if row is None:
+            raise IndexError(f'No block at height {height}')
+        return json.loads(row[0])
+
+    def iter_records(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        # Streams from disk, so a range can be served without the whole chain in memory
+        end = self._height if end is None else end
+        for (record,) in self.connection.execute(
+                'SELECT record FROM blocks WHERE height >= ? AND height < ? ORDER BY height', (start, end)):
+            yield bytes(record)
+
+    def read_records(self, start: int = 0) -> List[bytes]:
+        return list(self.iter_records(start))
+
+    def read_blocks(self, start: int = 0) -> List[Dict[str, Any]]:
+        return [json.loads(record) for record in self.iter_records(start)]
+
+    def find_transaction(self, transaction_hash: str, end: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        # Only blocks below end are searched, like iter_records
+        end = self._height if end is None else end
+        row = self.connection.execute(
+            'SELECT height, position FROM transactions WHERE hash = ? AND height < ? ORDER BY height DESC LIMIT 1',
+            (transaction_hash, end)).fetchone()
+        return (row[0] + 1, row[1]) if row else None
+
+    def read_transaction(self, block_index: int, position: int) -> Optional[Transaction]:
+        row = self.connection.execute(
+            'SELECT sender, receiver, amount, gas, extra, hash FROM transactions WHERE height = ? AND position = ?',
+            (block_index - 1, position)).fetchone()
+        if row is None:
+            return None
+        sender, receiver, amount, gas, extra, transaction_hash = row
+        return Transaction(sender, receiver, amount, gas, json.loads(extra) if extra else None, transaction_hash)
+
+    def get_history(self, address: str, offset: int, limit: int,
+                    end: Optional[int] = None) -> Tuple[int, List[Tuple[int, int]]]:
+        # Newest first, like TransactionIndex.get_history
+        end = self._height if end is None else end
+        total = self.connection.execute('SELECT COUNT(*) FROM postings WHERE address = ? AND height < ?',
+                                        (address, end)).fetchone()[0]
+        rows = self.connection.execute(
+            'SELECT height, position FROM postings WHERE address = ? AND height < ? '
+            'ORDER BY height DESC, position DESC LIMIT ? OFFSET ?', (address, end, limit, max(offset, 0))).fetchall()
+        return total, [(height + 1, position) for height, position in rows]
+
+    def get_balance(self, address: str) -> float:
+        row = self.connection.execute('SELECT balance FROM balances WHERE address = ?', (address,)).fetchone()
+        return row[0] if row else 0
+
+    def save_contract(self, address: str, data: Dict[str, Any]) -> None:
+        # Contract code, state and compiled form, as ContractRegistry would write to CONTRACT_DIR
+        data = dumps(data).decode()
+        with self._lock:
+            self._begin()
+            self.connection.execute(SAVE_CONTRACT, (address, data))
+
+    def load_contract(self, address: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute('SELECT data FROM contracts WHERE address = ?', (address,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def contract_addresses(self) -> List[str]:
+        return [address for (address,) in self.connection.execute('SELECT address FROM contracts')]
+
+    def save_state(self, name: str, data: Any) -> None:
+        data = json.dumps(data)
+        with self._lock:
+            self._begin()
+            self.connection.execute(SAVE_STATE, (name, data))
+            self.sync()
+
+    def log_mempool(self, changes: List[Tuple[Any, ...]]) -> None:
+        with self._lock:
+            self._begin()
+            for change in changes:
+                if len(change) == 2:
+                    self.connection.execute(ADD_PENDING, _pending_row(*change))
+                else:
+                    self.connection.execute(REMOVE_PENDING, change)
+            self.sync()
+
+    def save_mempool(self, transactions: List[Tuple[str, Dict[str, Any]]]) -> None:
+        rows = [_pending_row(*item) for item in transactions]
+        with self._lock:
+            self._begin()
+            self.connection.execute('DELETE FROM mempool')
+            self.connection.executemany(ADD_PENDING, rows)
+            # Superseded by the table
+            self.connection.execute("DELETE FROM node_state WHERE name = 'mempool'")
+            self.sync()
+
+    def load_mempool(self) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+        rows = self.connection.execute('SELECT hash, data FROM mempool ORDER BY rowid').fetchall()
+        if rows:
+            return [(transaction_hash, json.loads(data)) for transaction_hash, data in rows]
+        legacy = self.load_state('mempool')
+        if legacy is None:
+            return [] if self._height else None
+        return [(hash_transaction(transaction), transaction) for transaction in legacy]
+
+    def get_pending_debit(self, address: str) -> float:
+        # Amount plus gas of the address's transactions still in the mempool
+        row = self.connection.execute('SELECT SUM(debit) FROM mempool WHERE sender = ?', (address,)).fetchone()
+        return row[0] or 0
+
+    def load_state(self, name: str, default: Any = None) -> Any:
+        row = self.connection.execute('SELECT data FROM node_state WHERE name = ?', (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._in_transaction:
+                self.connection.execute('COMMIT')
+                self._in_transaction = False
+            self._unsynced = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self.sync()
+            self.connection.close()
@@ -0,0 +1,190 @@
+from typing import Dict, Any, List, Tuple, Iterator, Iterable, Optional, Set
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import copy
+import itertools
+import threading
+from src.utils.logger import setup_logger
+from src.config.config import BLOCKCHAIN_CONFIG
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('blockchain.state')
+
+# Marks a key that did not exist, in overlays and in undo entries
+MISSING = object()
+IMMUTABLE_TYPES = (int, float, str, bytes, bool, type(None))
+
+
+class StateOverlay(MutableMapping):
+    # Copy-on-write view of a contract's state for one execution. Writes and deletes stay in the
+    # overlay, the base dict is never touched, so a failed or read-only call is discarded for free.
+    # Contracts never get the overlay itself, only the contract_view wrapped around it.
+    __slots__ = ('__base', '__writes', '__deleted', '__copied')
+
+    def __init__(self, base: Dict[Any, Any], writes: Optional[Dict[Any, Any]] = None,
+                 deleted: Iterable[Any] = ()) -> None:
+        self.__base: Dict[Any, Any] = base
+        self.__writes: Dict[Any, Any] = dict(writes or {})
+        self.__deleted: Set[Any] = set(deleted)
+        # Mutable values copied on read, since the contract may change them in place
+        self.__copied: Set[Any] = set()
+
+    def __getitem__(self, key: Any) -> Any:
+        if key in self.__writes:
+            return self.__writes[key]
+        if key in self.__deleted:
+            raise KeyError(key)
+        value = self.__base[key]
+        if not isinstance(value, IMMUTABLE_TYPES):
+            # Only the value being read is copied, never the whole state
+            value = copy.deepcopy(value)
+            self.__writes[key] = value
+            self.__copied.add(key)
+        return value
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self.__writes[key] = value
+        self.__deleted.discard(key)
+        self.__copied.discard(key)
+
+    def __delitem__(self, key: Any) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self.__writes.pop(key, None)
+        self.__copied.discard(key)
+        if key in self.__base:
+            self.__deleted.add(key)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.__writes or (key in self.__base and key not in self.__deleted)
+
+    def __iter__(self) -> Iterator[Any]:
+        for key in self.__base:
+            if key not in self.__deleted:
+                yield key
+        for key in self.__writes:
+            if key not in self.__base:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self.__base) - len(self.__deleted) + sum(1 for key in self.__writes if key not in self.__base)
+
+    def diff(self) -> Tuple[Dict[Any, Any], List[Any]]:
+        # Values that were only copied for reading and came back unchanged are left out
+        changes = {
+            key: value for key, value in self.__writes.items()
+            if key not in self.__copied or self.__base.get(key, MISSING) != value
+        }
+        return changes, list(self.__deleted)
+
+
+def contract_view(overlay: StateOverlay) -> MutableMapping:
+    # What a contract gets as `state`. The overlay is only held by the closure of the methods, so the
+    # instance has no attribute, pattern or slot leading back to the overlay or the state under it
+    class ContractState(MutableMapping):
+        __slots__ = ()
+
+        def __getitem__(self, key: Any) -> Any:
+            return overlay[key]
+
+        def __setitem__(self, key: Any, value: Any) -> None:
+            overlay[key] = value
+
+        def __delitem__(self, key: Any) -> None:
+            del overlay[key]
+
+        def __contains__(self, key: Any) -> bool:
+            return key in overlay
+
+        def __iter__(self) -> Iterator[Any]:
+            return iter(overlay)
+
+        def __len__(self) -> int:
+            return len(overlay)
+
+    return ContractState()
+
+
+def apply_diff(state: Dict[Any, Any], changes: Dict[Any, Any], deleted: Iterable[Any]) -> None:
+    state.update(changes)
+    for key in deleted:
+        state.pop(key, None)
+
+
+class ContractStateStore:
+    # Journal of contract state changes. Executions commit their diffs straight into the contracts,
+    # recording the previous value of every key they touch. Block creation seals those records
+    # under the block's index, so a reorganization can undo exactly the keys a block changed.
+    def __init__(self, contracts: Any, history: int = config['CONTRACT_STATE_HISTORY']) -> None:
+        self.contracts = contracts
+        self.history: int = history
+        # address -> key -> value before the first change since the last block (MISSING if it was unset)
+        self.pending: Dict[str, Dict[Any, Any]] = {}
+        self.blocks: 'OrderedDict[int, Dict[str, Dict[Any, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def commit(self, contract: Any, changes: Dict[Any, Any], deleted: Iterable[Any]) -> None:
+        deleted = list(deleted)
+        with self._lock:
+            undo = self.pending.setdefault(contract.address, {})
+            for key in itertools.chain(changes, deleted):
+                if key not in undo:
+                    undo[key] = contract.state.get(key, MISSING)
+            apply_diff(contract.state, changes, deleted)
+        self.contracts.mark_dirty(contract.address)
+
+    def _undo(self, undo: Dict[str, Dict[Any, Any]]) -> Set[str]:
+        for address, keys in undo.items():
+            contract = self.contracts.get(address)
+            if contract is None:
+                continue
+            for key, value in keys.items():
+                if value is MISSING:
+                    contract.state.pop(key, None)
+                else:
+                    contract.state[key] = value
+            self.contracts.mark_dirty(address)
+        return set(undo)
+
+    def apply_block(self, block: Dict[str, Any]) -> None:
+        with self._lock:
+            self.blocks[block['index']] = self.pending
+            self.pending = {}
+            while len(self.blocks) > self.history:
+                self.blocks.popitem(last=False)
+
+    def revert_pending(self) -> Set[str]:
+        # Executions since the last block ran on top of the tip, they go first when the tip is reverted
+        with self._lock:
+            undo, self.pending = self.pending, {}
+            return self._undo(undo)
+
+    def revert_block(self, block: Dict[str, Any]) -> Set[str]:
+        with self._lock:
+            undo = self.blocks.pop(block['index'], None)
+            if undo is None:
+                logger.warning(f"No contract state history for block {block['index']}, its changes are kept")
+                return set()
+            return self._undo(undo)
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Undo entries as [address, key, old value], or [address, key] for keys that did not exist
+        def entries(undo: Dict[str, Dict[Any, Any]]) -> List[List[Any]]:
+            return [[address, key] if value is MISSING else [address, key, value]
+                    for address, keys in undo.items() for key, value in keys.items()]
+        with self._lock:
+            return {
+                'pending': entries(self.pending),
+                'blocks': [[index, entries(undo)] for index, undo in self.blocks.items()]
+            }
+
+    def load(self, data: Dict[str, Any]) -> None:
+        def undo_from(entries: List[List[Any]]) -> Dict[str, Dict[Any, Any]]:
+            undo: Dict[str, Dict[Any, Any]] = {}
+            for entry in entries:
+                undo.setdefault(entry[0], {})[entry[1]] = entry[2] if len(entry) == 3 else MISSING
+            return undo
+        with self._lock:
+            self.pending = undo_from(data.get('pending', []))
+            self.blocks = OrderedDict((index, undo_from(entries)) for index, entries in data.get('blocks', []))
+
@@ -0,0 +1,291 @@
+from typing import List, Dict, Any, Optional, Tuple, Union, Iterator
+import json
+import os
+import struct
+import tempfile
+from src.utils.logger import setup_logger
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.blockchain.helpers import hash_transaction
+from src.blockchain.models import Block
+from src.blockchain.sqlite_store import SQLiteStore
+from src.utils.encoding import dumps
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('blockchain.storage')
+
+# One index entry per block: segment number, byte offset and record length
+INDEX_ENTRY = struct.Struct('<IQI')
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    # A temporary file of its own, so concurrent saves of the same file never replace each other's
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path) or '.', prefix=os.path.basename(path),
+                                     suffix='.tmp', delete=False) as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(file.name, path)
+
+
+def read_json(path: str, default: Any) -> Any:
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return default
+
+
+class BlockStore:
+    def __init__(self, directory: str, segment_size: int = config['SEGMENT_SIZE'],
+                 fsync_group: int = config['FSYNC_GROUP']) -> None:
+        self.directory: str = directory
+        self.segment_size: int = segment_size
+        self.fsync_group: int = fsync_group
+        self.offsets: List[Tuple[int, int, int]] = []
+        self._unsynced: int = 0
+        # Entries in mempool.log, live or not, so the caller knows when rewriting it pays off
+        self.mempool_log_size: int = 0
+        self._mempool_file = None
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        self._index_file = open(self._index_path(), 'ab')
+        self._segment_file = None
+        self._open_segment(self.offsets[-1][0] if self.offsets else 0)
+
+    @property
+    def height(self) -> int:
+        return len(self.offsets)
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, 'index.bin')
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f'segment_{segment:06d}.log')
+
+    def _mempool_path(self) -> str:
+        return os.path.join(self.directory, 'mempool.log')
+
+    def _state_path(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}.json')
+
+    def _segment_numbers(self) -> List[int]:
+        return sorted(int(name[8:14]) for name in os.listdir(self.directory)
+                      if name.startswith('segment_') and name.endswith('.log'))
+
+    def _open_segment(self, segment: int) -> None:
+        if self._segment_file is not None:
+            self._segment_file.close()
+        self._segment = segment
+        self._segment_file = open(self._segment_path(segment), 'ab')
+
+    def _recover(self) -> None:
+        # The index may lag behind or run ahead of the segments after a crash:
+        # keep the entries that point at complete records, then index any complete records past them
+        entries: List[Tuple[int, int, int]] = []
+        if os.path.exists(self._index_path()):
+            with open(self._index_path(), 'rb') as file:
+                data = file.read()
+            usable = len(data) - len(data) % INDEX_ENTRY.size
+            entries = [INDEX_ENTRY.unpack_from(data, pos) for pos in range(0, usable, INDEX_ENTRY.size)]
+
+        segment_sizes = {segment: os.path.getsize(self._segment_path(segment)) for segment in self._segment_numbers()}
+        while entries:
+            segment, offset, length = entries[-1]
+            if segment_sizes.get(segment, -1) >= offset + length:
+                break
+            entries.pop()
+
+        segment, offset = (entries[-1][0], entries[-1][1] + entries[-1][2]) if entries else (0, 0)
+        recovered = 0
+        for number in [s for s in sorted(segment_sizes) if s >= segment]:
+            position = offset if number == segment else 0
+            with open(self._segment_path(number), 'rb') as file:
+                file.seek(position)
+                for line in file:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        json.loads(line)
+                    except ValueError:
+                        break
+                    entries.append((number, position, len(line)))
+                    position += len(line)
+                    recovered += 1
+            with open(self._segment_path(number), 'r+b') as file:
+                file.truncate(position)
+            if position < segment_sizes[number]:
+                logger.warning(f"Discarded {segment_sizes[number] - position} bytes of partial records in segment {number}")
+                break
+
+        self.offsets = entries
+        self._remove_segments_after(entries[-1][0] if entries else 0)
+        with open(self._index_path(), 'wb') as file:
+            file.write(b''.join(INDEX_ENTRY.pack(*entry) for entry in entries))
+            file.flush()
+            os.fsync(file.fileno())
+        if recovered:
+            logger.info(f"Recovered {recovered} unindexed blocks from segments")
+        logger.info(f"Opened block store {self.directory} at height {self.height}")
+
+    def _remove_segments_after(self, segment: int) -> None:
+        for number in self._segment_numbers():
+            if number > segment:
+                os.remove(self._segment_path(number))
+
+    def append(self, block: Dict[str, Any]) -> None:
+        record = (block.json() if isinstance(block, Block) else dumps(block)) + b'\n'
+        offset = self._segment_file.tell()
+        if offset and offset + len(record) > self.segment_size:
+            self.sync()
+            self._open_segment(self._segment + 1)
+            offset = 0
+        self._segment_file.write(record)
+        self._index_file.write(INDEX_ENTRY.pack(self._segment, offset, len(record)))
+        # Flushed to the OS on every append so other readers see the block; fsync happens per group
+        self._segment_file.flush()
+        self._index_file.flush()
+        self.offsets.append((self._segment, offset, len(record)))
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_group:
+            self.sync()
+
+    def truncate(self, height: int) -> None:
+        if height >= self.height:
+            return
+        logger.info(f"Truncating block store from height {self.height} to {height}")
+        self.sync()
+        self.offsets = self.offsets[:height]
+        segment, end = (self.offsets[-1][0], self.offsets[-1][1] + self.offsets[-1][2]) if self.offsets else (0, 0)
+        self._segment_file.close()
+        self._segment_file = None
+        self._remove_segments_after(segment)
+        with open(self._segment_path(segment), 'r+b') as file:
+            file.truncate(end)
+        self._index_file.truncate(height * INDEX_ENTRY.size)
+        self._open_segment(segment)
+
+    def read_block(self, height: int) -> Dict[str, Any]:
+        segment, offset, length = self.offsets[height]
+        self._segment_file.flush()
+        with open(self._segment_path(segment), 'rb') as file:
+            file.seek(offset)
+            return json.loads(file.read(length))
+
+    def read_records(self, start: int = 0) -> List[bytes]:
+        # The stored JSON of each block from start on, without the trailing newline
+        self._segment_file.flush()
+        records: List[bytes] = []
+        if start >= self.height:
+            return records
+        segment, offset, _ = self.offsets[start]
+        remaining = self.height - start
+        while remaining:
+            with open(self._segment_path(segment), 'rb') as file:
+                file.seek(offset)
+                for line in file:
+                    records.append(line.rstrip(b'\n'))
+                    remaining -= 1
+                    if not remaining:
+                        break
+            segment, offset = segment + 1, 0
+        return records
+
+    def read_blocks(self, start: int = 0) -> List[Dict[str, Any]]:
+        return [json.loads(record) for record in self.read_records(start)]
+
+    def iter_records(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        # The records of blocks start to end, read at their indexed offsets like SQLiteStore.iter_records
+        end = self.height if end is None else min(end, self.height)
+        self._segment_file.flush()
+        file, file_segment = None, None
+        try:
+            for segment, offset, length in self.offsets[start:end]:
+                if segment != file_segment:
+                    if file is not None:
+                        file.close()
+                    file, file_segment = open(self._segment_path(segment), 'rb'), segment
+                file.seek(offset)
+                yield file.read(length).rstrip(b'\n')
+        finally:
+            if file is not None:
+                file.close()
+
+    def save_state(self, name: str, data: Any) -> None:
+        write_json_atomic(self._state_path(name), data)
+
+    def load_state(self, name: str, default: Any = None) -> Any:
+        return read_json(self._state_path(name), default)
+
+    def log_mempool(self, changes: List[Tuple[Any, ...]]) -> None:
+        # Admissions as [hash, transaction], removals as [hash]; replayed in order on load
+        if self._mempool_file is None:
+            self._mempool_file = open(self._mempool_path(), 'ab')
+        self._mempool_file.write(b''.join(dumps(list(change)) + b'\n' for change in changes))
+        self._mempool_file.flush()
+        self.mempool_log_size += len(changes)
+
+    def save_mempool(self, transactions: List[Tuple[str, Dict[str, Any]]]) -> None:
+        # Rewrites the log with only the live transactions
+        if self._mempool_file is not None:
+            self._mempool_file.close()
+            self._mempool_file = None
+        path = self._mempool_path()
+        with tempfile.NamedTemporaryFile('wb', dir=self.directory, prefix='mempool.log', suffix='.tmp',
+                                         delete=False) as file:
+            file.write(b''.join(dumps([transaction_hash, transaction]) + b'\n'
+                                for transaction_hash, transaction in transactions))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(file.name, path)
+        self.mempool_log_size = len(transactions)
+        # Superseded by the log
+        if os.path.exists(self._state_path('mempool')):
+            os.remove(self._state_path('mempool'))
+
+    def load_mempool(self) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+        if not os.path.exists(self._mempool_path()):
+            # Stores written before the log kept the whole mempool in mempool.json
+            legacy = self.load_state('mempool')
+            return None if legacy is None else [(hash_transaction(transaction), transaction) for transaction in legacy]
+        pending: Dict[str, Dict[str, Any]] = {}
+        self.mempool_log_size = 0
+        with open(self._mempool_path(), 'rb') as file:
+            for line in file:
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    # A torn last write, everything before it is intact
+                    break
+                self.mempool_log_size += 1
+                if len(change) == 2:
+                    pending[change[0]] = change[1]
+                else:
+                    pending.pop(change[0], None)
+        return list(pending.items())
+
+    def sync(self) -> None:
+        for file in (self._segment_file, self._index_file, self._mempool_file):
+            if file is not None:
+                file.flush()
+                os.fsync(file.fileno())
+        self._unsynced = 0
+
+    def close(self) -> None:
+        self.sync()
+        self._segment_file.close()
+        self._index_file.close()
+        if self._mempool_file is not None:
+            self._mempool_file.close()
+
+
+Store = Union[BlockStore, SQLiteStore]
+
+
+def open_store(directory: str, backend: Optional[str] = None) -> Store:
+    # Read at call time, so a serving mode can switch the backend after this module is imported
+    backend = backend or config['STORAGE_BACKEND']
+    if backend == 'segments':
+        return BlockStore(directory)
+    if backend == 'sqlite':
+        return SQLiteStore(directory)
+    raise ValueError(f'Unknown storage backend {backend}')
@@ -6,6 +6,9 @@ LOGGING_CONFIG: Dict[str, Any] = {
     'LOG_DIR': 'logs',
     'MAX_LOG_SIZE': 10 * 1024 * 1024,
     'BACKUP_COUNT': 5,
+    'QUEUE_SIZE': 10000,  # records waiting for the background writers, more are dropped rather than blocking
+    'INFO_RATE_LIMIT': 20,  # INFO records per second from a single logging call, 0 disables the limit
+    'INFO_SAMPLE_RATE': 1,  # keep one in every N INFO records from a single logging call
     'LOGGERS': {
         'api': {
             'level': logging.INFO,
@@ -23,19 +26,68 @@ LOGGING_CONFIG: Dict[str, Any] = {
 }
 
 
+METRICS_CONFIG: Dict[str, Any] = {
+    'ENABLED': True,  # when off, /metrics answers 404 and the timing wrappers only check this flag
+    'LATENCY_BUCKETS': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),  # seconds
+}
+
+
 BLOCKCHAIN_CONFIG: Dict[str, Any] = {
     # Mining settings
     'DIFFICULTY': 4,
     'BLOCK_REWARD': 1.0,
     'GAS_FEE': 0.01,
     'TARGET_BLOCK_TIME': 600,
+    'MINING_WORKERS': 0,  # 0 uses every available core
+    'MINING_BATCH_SIZE': 10000,
+    'BLOCK_MAX_TRANSACTIONS': 2000,
+    'CHECKPOINT_INTERVAL': 100,  # blocks between validation checkpoints
+    
+    # Mempool settings
+    'MEMPOOL_MAX_TRANSACTIONS': 50000,
+    'MEMPOOL_MAX_BYTES': 32 * 1024 * 1024,  # estimated from the JSON size of each transaction
+    'MEMPOOL_MAX_PER_SENDER': 1000,
+    'MEMPOOL_LOG_SLACK': 10000,  # stale mempool log entries tolerated before the log is rewritten
+    'MAX_BATCH_TRANSACTIONS': 10000,  # transactions accepted by one /add_transactions request
+    'DEDUP_WINDOW_BLOCKS': 100,  # newest blocks whose transaction hashes are kept exactly for duplicate checks
+    'DEDUP_BLOOM_CAPACITY': 100000,  # older transaction hashes the first Bloom filter holds, later ones double
+    'DEDUP_BLOOM_ERROR_RATE': 0.001,  # false positive rate of the Bloom filters together
+    
+    # Contract settings
+    'CONTRACT_WORKERS': 2,  # worker processes running contracts, 0 runs them in the request thread
+    'CONTRACT_QUEUE_DEPTH': 32,  # calls allowed to wait for a worker before new ones are refused
+    'CONTRACT_TIMEOUT': 2,  # seconds per call, including the wait for a worker
+    'CONTRACT_GAS_LIMIT': 1000000,  # gas per call: one unit per loop iteration, function call or comprehension item
+    'BLOCK_GAS_LIMIT': 10000000,  # gas all contract calls may use between two blocks
+    'CONTRACT_STATE_HISTORY': 1000,  # blocks whose contract state changes can be rolled back by a reorganization
     
     # Network settings
     'SYNC_INTERVAL': 60,
     'NODE_TIMEOUT': 5,
+    'SYNC_DEADLINE': 10,  # seconds a whole chain sync may take across all peers
+    'PEER_WORKERS': 16,
+    'GOSSIP_BATCH_SIZE': 500,  # transactions per /receive_transactions request
+    'GOSSIP_QUEUE_LIMIT': 10000,  # transactions queued per peer before the oldest are dropped
+    'GOSSIP_MAX_RETRIES': 5,
+    'GOSSIP_BACKOFF': 0.5,  # seconds, doubled after every failed attempt
+    'GOSSIP_SEEN_LIMIT': 100000,  # transaction hashes remembered per peer
+    'NODE_ADDRESS': None,  # host:port peers know this node by, sent with gossip so they do not echo it back
+    'CHAIN_PAGE_LIMIT': 1000,  # most blocks returned by one /get_chain?limit= page
+    'HEADERS_PAGE_LIMIT': 10000,  # most block headers returned by one /get_headers?limit= page
+    'HISTORY_PAGE_LIMIT': 1000,  # most transactions returned by one /get_history/<address> page
+    'WRITER_TIMEOUT': 600,  # seconds a reader process waits for the writer to answer a forwarded request, mining included
     
     # Storage settings
-    'CHAIN_FILE': 'blockchain.json',
+    'STORAGE_BACKEND': 'segments',  # 'segments' (JSON lines in segment files) or 'sqlite' (indexed database in WAL mode)
+    'CHAIN_DIR': 'chain_data',
+    'SEGMENT_SIZE': 64 * 1024 * 1024,
+    'FSYNC_GROUP': 16,  # blocks appended between fsyncs
+    'CONTRACT_DIR': 'chain_data/contracts',
+    'CONTRACT_CACHE_SIZE': 256,  # compiled contracts kept in memory, colder ones are evicted to CONTRACT_DIR
+    'BLOCK_JSON_CACHE': True,  # keep each block's serialized JSON in memory, so chain responses skip encoding
+    'SNAPSHOT_INTERVAL': 1000,  # blocks between snapshots of balances and indexes, 0 disables them
+    'SNAPSHOT_KEEP': 2,  # snapshots kept in CHAIN_DIR/snapshots, older ones are deleted
+    'CHAIN_CACHE_BLOCKS': 256,  # blocks read back from the store that stay parsed in memory
     
     # Hashing settings
     'HASH_CONFIG': {
@@ -44,6 +96,7 @@ BLOCKCHAIN_CONFIG: Dict[str, Any] = {
         'prime_limit': 9999999,
         'hash_size': 16,
         'mix_shift': 3,
-        'mix_rounds': 5
+        'mix_rounds': 5,
+        'prime_cache_dir': 'cache'  # where the memory-mapped prime table is kept
     }
 }
\ No newline at end of file
@@ -0,0 +1,5 @@
+from typing import List
+from .reader import ChainReader, create_reader_app
+from .server import serve
+
+__all__: List[str] = ['ChainReader', 'create_reader_app', 'serve']
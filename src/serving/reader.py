@@ -0,0 +1,175 @@
+from flask import request, Blueprint, Flask, Response
+from typing import Tuple, Dict, Any, Optional
+import threading
+import requests
+from src.blockchain.helpers import make_response, make_blocks_response, make_not_modified_response
+from src.blockchain.sqlite_store import SQLiteStore
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.utils.logger import setup_logger
+from src.utils.middleware import log_requests
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('api.reader')
+
+reader_routes = Blueprint('reader_routes', __name__)
+
+# Headers passed through to and back from the writer
+FORWARDED_REQUEST_HEADERS = ('Content-Type', 'If-None-Match')
+FORWARDED_RESPONSE_HEADERS = ('Content-Type', 'ETag')
+
+
+class ChainReader:
+    # Read-only view of the SQLite store the writer process keeps. Requests are served on their own threads,
+    # so each thread holds its own connection; cached values are refreshed only after the writer commits
+    def __init__(self, directory: str, writer_url: str) -> None:
+        self.directory: str = directory
+        self.writer_url: str = writer_url.rstrip('/')
+        self._local: threading.local = threading.local()
+
+    def store(self) -> SQLiteStore:
+        local = self._local
+        if getattr(local, 'store', None) is None:
+            local.store = SQLiteStore(self.directory)
+            local.version = None
+        version = local.store.data_version()
+        if version != local.version:
+            local.version = version
+            local.tip = local.store.tip()
+        return local.store
+
+    def tip(self) -> Tuple[int, str]:
+        self.store()
+        return self._local.tip
+
+    def forward(self) -> Tuple[Response, int]:
+        # Everything that changes state, or needs the mempool, is answered by the single writer
+        headers = {name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers}
+        # The writer only sees this process, so it is told which client the request came from
+        headers['X-Forwarded-For'] = request.remote_addr
+        try:
+            upstream = requests.request(
+                request.method, f'{self.writer_url}{request.full_path.rstrip("?")}',
+                data=request.get_data(), headers=headers, timeout=config['WRITER_TIMEOUT']
+            )
+        except requests.RequestException as e:
+            logger.error(f"Writer unreachable: {str(e)}")
+            return make_response('Writer unreachable', 502)
+        headers = {name: upstream.headers[name] for name in FORWARDED_RESPONSE_HEADERS if name in upstream.headers}
+        return Response(upstream.content, headers=headers), upstream.status_code
+
+
+reader: Optional[ChainReader] = None
+
+
+# The same responses as the writer's routes, built from the store instead of the in-memory chain
+@reader_routes.route('/chain_tip', methods=['GET'])
+@log_requests
+def chain_tip() -> Tuple[Response, int]:
+    height, tip_hash = reader.tip()
+    if request.if_none_match.contains(tip_hash):
+        return make_not_modified_response(tip_hash)
+    return make_response('Chain tip fetch successful', 200, {'height': height, 'tip_hash': tip_hash}, etag=tip_hash)
+
+
+@reader_routes.route('/get_chain', methods=['GET'])
+@log_requests
+def get_chain() -> Tuple[Response, int]:
+    try:
+        store = reader.store()
+        length, tip_hash = reader.tip()
+        start: int = request.args.get('from', 1, type=int)
+        end: int = request.args.get('to', length, type=int)
+        limit: Optional[int] = request.args.get('limit', type=int)
+        if limit is not None:
+            end = min(end, start + min(limit, config['CHAIN_PAGE_LIMIT']) - 1)
+        start, end = max(start, 1), min(end, length)
+
+        etag: str = f"{tip_hash}-{start}-{end}"
+        if request.if_none_match.contains(etag):
+            return make_not_modified_response(etag)
+        data: Dict[str, Any] = {'length': length, 'from': start, 'to': end}
+        # Stored records are the blocks' JSON, streamed straight from the database
+        return make_blocks_response('Blockchain length fetch successful', 200,
+                                    store.iter_records(start - 1, end), data, etag=etag)
+    except Exception as e:
+        logger.error(f"Error getting chain: {str(e)}")
+        return make_response(f'Error while getting chain: {str(e)}', 500)
+
+
+@reader_routes.route('/get_balance/<user>', methods=['GET'])
+@log_requests
+def get_user_balance(user: str) -> Tuple[Response, int]:
+    try:
+        balance: float = reader.store().get_balance(user)
+        data: Dict[str, Any] = {
+            'user': user,
+            'balance': balance,
+            'available_balance': balance - reader.store().get_pending_debit(user)
+        }
+        return make_response(f'Fetched {user}\'s balance successfully', 200, data)
+    except Exception as e:
+        logger.error(f"Error getting user balance: {str(e)}")
+        return make_response(f'Error while getting user balance: {str(e)}', 500)
+
+
+@reader_routes.route('/get_transaction/<transaction_hash>', methods=['GET'])
+@log_requests
+def get_transaction(transaction_hash: str) -> Tuple[Response, int]:
+    try:
+        store = reader.store()
+        location = store.find_transaction(transaction_hash)
+        if location is None:
+            # May still be pending, which only the writer knows
+            return reader.forward()
+        block_index, position = location
+        data: Dict[str, Any] = {
+            'transaction': store.read_transaction(block_index, position).to_dict(),
+            'status': 'confirmed',
+            'block_index': block_index,
+            'position': position,
+            'confirmations': reader.tip()[0] - block_index + 1
+        }
+        return make_response('Transaction fetch successful', 200, data)
+    except Exception as e:
+        logger.error(f"Error getting transaction: {str(e)}")
+        return make_response(f'Error while getting transaction: {str(e)}', 500)
+
+
+@reader_routes.route('/get_history/<address>', methods=['GET'])
+@log_requests
+def get_history(address: str) -> Tuple[Response, int]:
+    try:
+        store = reader.store()
+        offset: int = max(request.args.get('offset', 0, type=int), 0)
+        limit: int = request.args.get('limit', config['HISTORY_PAGE_LIMIT'], type=int)
+        limit = max(min(limit, config['HISTORY_PAGE_LIMIT']), 0)
+        total, locations = store.get_history(address, offset, limit)
+        history = []
+        for block_index, position in locations:
+            transaction = store.read_transaction(block_index, position)
+            history.append({
+                'transaction': transaction.to_dict(),
+                'transaction_hash': transaction.transaction_hash,
+                'block_index': block_index,
+                'position': position
+            })
+        data: Dict[str, Any] = {'address': address, 'history': history, 'total': total, 'offset': offset, 'limit': limit}
+        return make_response('Address history fetch successful', 200, data)
+    except Exception as e:
+        logger.error(f"Error getting address history: {str(e)}")
+        return make_response(f'Error while getting address history: {str(e)}', 500)
+
+
+@reader_routes.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'DELETE'])
+@reader_routes.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
+def forward(path: str) -> Tuple[Response, int]:
+    return reader.forward()
+
+
+def create_reader_app(directory: str, writer_url: str) -> Flask:
+    global reader
+    reader = ChainReader(directory, writer_url)
+    app = Flask(__name__)
+    app.register_blueprint(reader_routes)
+    logger.info(f"Reader serving {directory}, forwarding writes to {writer_url}")
+    return app
@@ -0,0 +1,90 @@
+import importlib
+import multiprocessing
+import os
+import socket
+from typing import List, Any
+from flask import Flask
+from werkzeug.serving import BaseWSGIServer, make_server
+from src.blockchain.sqlite_store import SQLiteStore
+from src.blockchain.storage import read_json
+from src.config.config import BLOCKCHAIN_CONFIG
+from src.utils.logger import setup_logger
+
+config = BLOCKCHAIN_CONFIG
+logger = setup_logger('application.server')
+
+
+def _run_reader(listener: socket.socket, host: str, port: int, directory: str, writer_url: str) -> None:
+    # Imported here so reader processes never build the writer's Blockchain
+    from src.serving.reader import create_reader_app
+    app = create_reader_app(directory, writer_url)
+    # A thread per request, each with its own SQLite connection, so requests forwarded to the writer
+    # never hold up reads; the kernel spreads connections on the shared listening socket across the processes
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    server.serve_forever()
+
+
+def make_writer(app: Flask, port: int) -> BaseWSGIServer:
+    # A thread per request: changes to the Blockchain are serialized by its lock, and proof of work runs
+    # outside it, so writes and a chain replacement cancelling the miner are served while a block is mined
+    return make_server('127.0.0.1', port, app, threaded=True)
+
+
+def migrate_segments(blockchain: Any, directory: str) -> bool:
+    # A node that ran on segment files keeps its chain, node state and contracts the first time it is
+    # served from SQLite: they are loaded with the segment backend and saved into the empty database
+    if not os.path.exists(os.path.join(directory, 'index.bin')):
+        return False
+    target = SQLiteStore(directory)
+    try:
+        if target.height or target.load_mempool() is not None:
+            return False
+    finally:
+        target.close()
+
+    blockchain.backend = 'segments'
+    try:
+        loaded = blockchain.load_chain(directory)
+        blockchain.close_store()
+    finally:
+        blockchain.backend = 'sqlite'
+    if not loaded:
+        return False
+    logger.info(f"Migrating {len(blockchain.chain)} blocks in {directory} from segment files to SQLite")
+    blockchain.save_chain(directory)
+    # Contracts not loaded by the chain only exist as files in CONTRACT_DIR
+    contract_dir = config['CONTRACT_DIR']
+    if os.path.isdir(contract_dir):
+        for name in os.listdir(contract_dir):
+            if name.endswith('.json'):
+                blockchain.store.save_contract(name[:-5], read_json(os.path.join(contract_dir, name), None))
+        blockchain.store.sync()
+        blockchain.contracts.attach(blockchain.store)
+    return True
+
+
+def serve(host: str, port: int, workers: int, writer_port: int) -> None:
+    routes = importlib.import_module('src.api.routes')
+    from src.api.app import app
+    # Readers need a store they can query while the writer commits
+    routes.blockchain.backend = 'sqlite'
+    directory = config['CHAIN_DIR']
+    if not migrate_segments(routes.blockchain, directory) and not routes.blockchain.load_chain(directory):
+        routes.blockchain.save_chain(directory)
+
+    listener = socket.create_server((host, port), backlog=socket.SOMAXCONN)
+    writer_url = f'http://127.0.0.1:{writer_port}'
+    context = multiprocessing.get_context('spawn')
+    readers: List[multiprocessing.process.BaseProcess] = [
+        context.Process(target=_run_reader, args=(listener, host, port, config['CHAIN_DIR'], writer_url), daemon=True)
+        for _ in range(workers)
+    ]
+    for reader in readers:
+        reader.start()
+    logger.info(f"Serving on {host}:{port} with {workers} reader processes, writer on {writer_url}")
+    try:
+        # The only process holding the chain in memory: mining, transactions and peer sync happen here
+        make_writer(app, writer_port).serve_forever()
+    finally:
+        for reader in readers:
+            reader.terminate()
@@ -0,0 +1,17 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library encoder is used without it
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    # Compact JSON bytes. Only for data sent or stored, hashes keep using the canonical json.dumps form
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError:  # integers past 64 bits and other types orjson refuses
+            pass
+    return json.dumps(value, separators=(',', ':')).encode()
@@ -1,46 +1,128 @@
+import atexit
 import logging
 import os
-from typing import Any
+import queue
+import threading
+import time
+from typing import Any, Dict, Tuple
 from logging import Logger
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from src.config.config import LOGGING_CONFIG
 
+# One queue and one background writer thread per log file, shared by every logger of that category
+_queues: Dict[str, 'queue.Queue[logging.LogRecord]'] = {}
+_listeners: Dict[str, QueueListener] = {}
+_lock = threading.Lock()
+
+
+class DroppingQueueHandler(QueueHandler):
+    # Never blocks the caller: when the writer falls behind and the queue is full the record is dropped
+    def __init__(self, record_queue: 'queue.Queue[logging.LogRecord]') -> None:
+        super().__init__(record_queue)
+        self.dropped: int = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    # Thins out INFO and lower records per logging call site: keeps one in sample_rate, then at most
+    # rate_limit a second. Warnings and errors always pass.
+    def __init__(self, rate_limit: int = LOGGING_CONFIG['INFO_RATE_LIMIT'],
+                 sample_rate: int = LOGGING_CONFIG['INFO_SAMPLE_RATE']) -> None:
+        super().__init__()
+        self.rate_limit: int = rate_limit
+        self.sample_rate: int = sample_rate
+        # call site -> [records seen, current second, records passed this second, records suppressed]
+        self._sites: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        now = int(time.monotonic())
+        with self._lock:
+            site = self._sites.setdefault((record.pathname, record.lineno), [0, now, 0, 0])
+            site[0] += 1
+            if self.sample_rate > 1 and (site[0] - 1) % self.sample_rate:
+                return False
+            if site[1] != now:
+                site[1], site[2] = now, 0
+            if self.rate_limit and site[2] >= self.rate_limit:
+                site[3] += 1
+                return False
+            site[2] += 1
+            suppressed, site[3] = site[3], 0
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+def _category_queue(category: str, logger_config: Dict[str, Any]) -> 'queue.Queue[logging.LogRecord]':
+    with _lock:
+        if category in _queues:
+            return _queues[category]
+
+        # Create formatter
+        formatter = logging.Formatter(LOGGING_CONFIG['LOG_FORMAT'])
+
+        # Ensure log directory exists
+        os.makedirs(LOGGING_CONFIG['LOG_DIR'], exist_ok=True)
+
+        # File handler
+        fh = RotatingFileHandler(
+            f"{LOGGING_CONFIG['LOG_DIR']}/{logger_config['file']}",
+            maxBytes=LOGGING_CONFIG['MAX_LOG_SIZE'],
+            backupCount=LOGGING_CONFIG['BACKUP_COUNT']
+        )
+        fh.setFormatter(formatter)
+
+        # Console handler
+        ch = logging.StreamHandler()
+        ch.setFormatter(formatter)
+
+        # The handlers only ever run on the listener thread, so file and console I/O stay off request threads
+        record_queue: 'queue.Queue[logging.LogRecord]' = queue.Queue(LOGGING_CONFIG['QUEUE_SIZE'])
+        listener = QueueListener(record_queue, fh, ch)
+        listener.start()
+        _queues[category] = record_queue
+        _listeners[category] = listener
+        return record_queue
+
+
 def setup_logger(name: str) -> Logger:
     # Determine the base category from the name
     base_category = name.split('.')[0]
-    
+    if base_category not in LOGGING_CONFIG['LOGGERS']:
+        base_category = 'application'
+
     # Get logger config based on category, default to 'application'
-    logger_config = LOGGING_CONFIG['LOGGERS'].get(
-        base_category, 
-        LOGGING_CONFIG['LOGGERS']['application']
-    )
-    
+    logger_config = LOGGING_CONFIG['LOGGERS'][base_category]
+
     logger = logging.getLogger(name)
     logger.setLevel(logger_config['level'])
-    
+
     # Clear existing handlers
     if logger.handlers:
         logger.handlers.clear()
+    logger.filters.clear()
+
+    logger.addHandler(DroppingQueueHandler(_category_queue(base_category, logger_config)))
+    logger.addFilter(RateLimitFilter())
+
+    return logger
+
+
+def stop_logging() -> None:
+    # Writes out whatever is still queued, registered to run at exit
+    with _lock:
+        for listener in _listeners.values():
+            listener.stop()
+        _listeners.clear()
+        _queues.clear()
+
 
-    # Create formatter
-    formatter = logging.Formatter(LOGGING_CONFIG['LOG_FORMAT'])
-    
-    # Ensure log directory exists
-    if not os.path.exists(LOGGING_CONFIG['LOG_DIR']):
-        os.makedirs(LOGGING_CONFIG['LOG_DIR'])
-    
-    # File handler
-    fh = RotatingFileHandler(
-        f"{LOGGING_CONFIG['LOG_DIR']}/{logger_config['file']}", 
-        maxBytes=LOGGING_CONFIG['MAX_LOG_SIZE'],
-        backupCount=LOGGING_CONFIG['BACKUP_COUNT']
-    )
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
-    
-    # Console handler
-    ch = logging.StreamHandler()
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
-    
-    return logger 
\ No newline at end of file
+atexit.register(stop_logging)
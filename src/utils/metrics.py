@@ -0,0 +1,140 @@
+import bisect
+import threading
+import time
+from functools import wraps
+from typing import Dict, Any, Callable, List, Tuple, Sequence
+from src.config.config import METRICS_CONFIG
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def enabled() -> bool:
+    return METRICS_CONFIG['ENABLED']
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.labels: Tuple[str, ...] = tuple(labels)
+        self.values: Dict[Tuple[Any, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values: Any) -> None:
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}')
+        return lines
+
+
+class Gauge:
+    # Read when /metrics is scraped, so keeping it current costs nothing on the hot paths
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.read: Callable[[], float] = read
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge',
+                f'{self.name} {_format_value(self.read())}']
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = METRICS_CONFIG['LATENCY_BUCKETS']) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.labels: Tuple[str, ...] = tuple(labels)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # label values -> [count per bucket (the last one is +Inf), sum of observations]
+        self.series: Dict[Tuple[Any, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: Any) -> None:
+        # Only the bucket the value falls in is counted here, render accumulates them
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (counts, total) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float('inf') else f'le="{_format_value(bound)}"'
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}')
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+                lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Any] = {}
+
+    def register(self, metric: Any) -> Any:
+        # Registering a name again replaces the old metric, which lets gauges be rebound to a new object
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'api_request_duration_seconds', 'Time spent handling API requests', ('route', 'method')))
+REQUESTS = REGISTRY.register(Counter(
+    'api_requests_total', 'API requests handled', ('route', 'method', 'status')))
+OPERATION_LATENCY = REGISTRY.register(Histogram(
+    'blockchain_operation_duration_seconds', 'Time spent in blockchain operations', ('operation',)))
+HASHES = REGISTRY.register(Counter('blockchain_pow_hashes_total', 'Proof of work candidates tried'))
+GOSSIP_TRANSACTIONS = REGISTRY.register(Counter(
+    'blockchain_gossip_transactions_total', 'Transactions gossiped to peers', ('result',)))
+
+
+def timed(operation: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    # Records the call's duration in OPERATION_LATENCY; with metrics off it costs one dict lookup
+    def decorator(f: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(f)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not METRICS_CONFIG['ENABLED']:
+                return f(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                OPERATION_LATENCY.observe(time.perf_counter() - start, operation)
+        return wrapper
+    return decorator
@@ -2,16 +2,20 @@ from typing import Callable, Any
 from functools import wraps
 from flask import request, Response, current_app
 from src.utils.logger import setup_logger
+from src.utils import metrics
 import json
+import logging
+import time
 
 logger = setup_logger('api.middleware')
 
 def log_requests(f: Callable[..., Response]) -> Callable[..., Response]:
     @wraps(f)
     def decorated_function(*args: Any, **kwargs: Any) -> Response:
-        logger.info(f"Incoming {request.method} request to {request.path}")
+        logger.info("Incoming %s request to %s", request.method, request.path)
         
-        if current_app.debug:
+        # Bodies are only parsed when debug records are actually written
+        if current_app.debug and logger.isEnabledFor(logging.DEBUG):
             if request.is_json:
                 body = request.get_json()
                 if isinstance(body, dict):
@@ -20,20 +24,29 @@ def log_requests(f: Callable[..., Response]) -> Callable[..., Response]:
                     for field in sensitive_fields:
                         if field in masked_body:
                             masked_body[field] = '****'
-                    logger.debug(f"Request body: {json.dumps(masked_body)}")
+                    logger.debug("Request body: %s", json.dumps(masked_body))
                 else:
-                    logger.debug(f"Request body: {body}")
+                    logger.debug("Request body: %s", body)
             elif request.form:
-                logger.debug(f"Form data: {dict(request.form)}")
+                logger.debug("Form data: %s", dict(request.form))
             
+        start = time.perf_counter()
         response = f(*args, **kwargs)
+        # routes return (Response, status) tuples built by make_response
+        body, status_code = response if isinstance(response, tuple) else (response, response.status_code)
+        if metrics.enabled():
+            # Labelled by the route pattern rather than the path, so addresses and users do not create new series
+            route = request.url_rule.rule if request.url_rule is not None else request.path
+            metrics.REQUEST_LATENCY.observe(time.perf_counter() - start, route, request.method)
+            metrics.REQUESTS.inc(1, route, request.method, status_code)
         
         if current_app.debug:
-            logger.debug(f"Response status: {response.status_code}")
-            if hasattr(response, 'json'):
-                logger.debug(f"Response body: {response.json}")
+            logger.debug("Response status: %s", status_code)
+            # Reading a streamed body here would leave nothing for the client
+            if logger.isEnabledFor(logging.DEBUG) and hasattr(body, 'json') and not body.is_streamed:
+                logger.debug("Response body: %s", body.get_data(as_text=True))
         else:
-            logger.info(f"Request completed with status {response.status_code}")
+            logger.info("Request completed with status %s", status_code)
             
         return response
     return decorated_function
@@ -0,0 +1,53 @@
+import unittest
+import argparse
+import importlib
+import tempfile
+from unittest import mock
+from typing import Dict
+from benchmarks.synthetic import build_chain, account_names
+from benchmarks.bench_node import compare, bench_routes
+from src.blockchain.blockchain import Blockchain
+from src.config.config import BLOCKCHAIN_CONFIG
+
+
+class TestSyntheticChain(unittest.TestCase):
+    def test_build_chain(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            blockchain: Blockchain = build_chain(transactions=50, accounts=10, block_size=20, cache_dir=cache_dir)
+
+        # genesis, one funding block and three blocks of transfers
+        self.assertEqual(len(blockchain.chain), 5)
+        self.assertEqual(sum(len(block['transactions']) for block in blockchain.chain), 60)
+        self.assertTrue(blockchain.is_chain_valid())
+        # transfers move funds around, only the gas leaves the accounts
+        total: float = sum(blockchain.get_user_balance(name) for name in account_names(10))
+        gas: float = sum(transaction['gas'] for block in blockchain.chain for transaction in block['transactions'])
+        self.assertAlmostEqual(total, 10 * 200 * 6 - gas)
+
+
+class TestRouteBenchmark(unittest.TestCase):
+    def test_routes_use_the_synthetic_chain(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            blockchain: Blockchain = build_chain(transactions=20, accounts=5, block_size=20, cache_dir=cache_dir)
+        routes = importlib.import_module('src.api.routes')
+        original: Blockchain = routes.blockchain
+        chain_dir: str = BLOCKCHAIN_CONFIG['CHAIN_DIR']
+        results: Dict[str, Dict[str, float]] = {}
+
+        with mock.patch.object(original, 'save_chain') as save_chain:
+            bench_routes(blockchain, argparse.Namespace(accounts=5, operations=10), results)
+        self.assertIn('route_add_transaction', results)
+        # The transactions reached the swapped in chain, which saved them outside CHAIN_DIR
+        self.assertEqual(len(blockchain.mempool), 1)
+        save_chain.assert_not_called()
+        self.assertIs(routes.blockchain, original)
+        self.assertEqual(BLOCKCHAIN_CONFIG['CHAIN_DIR'], chain_dir)
+        self.assertIsNone(blockchain.store)
+
+
+class TestBaselineComparison(unittest.TestCase):
+    def test_compare_flags_regressions(self) -> None:
+        baseline: Dict[str, Dict[str, float]] = {'fast': {'ops_per_sec': 100}, 'slow': {'ops_per_sec': 100}}
+        results: Dict[str, Dict[str, float]] = {'fast': {'ops_per_sec': 90}, 'slow': {'ops_per_sec': 50},
+                                                'new': {'ops_per_sec': 10}}
+        self.assertEqual(compare(results, baseline, tolerance=20), ['slow'])
@@ -1,11 +1,23 @@
 import unittest
-from typing import Dict, Any, Union
+import copy
+from unittest import mock
+from typing import Dict, Any, List, Union
 from src.blockchain.blockchain import Blockchain
+from src.blockchain.helpers import hash_block
+from src.blockchain.miner import Miner
 from src.config.config import BLOCKCHAIN_CONFIG
 
+
+def mine_blocks(blockchain: Blockchain, count: int) -> None:
+    for _ in range(count):
+        prev_block: Dict[str, Any] = blockchain.get_prev_block()
+        blockchain.create_block(blockchain.proof_of_work(prev_block['proof']), hash_block(prev_block))
+
+
 class TestBlockchain(unittest.TestCase):
     def setUp(self) -> None:
         self.blockchain: Blockchain = Blockchain()
+        self.blockchain.miner = Miner(workers=1)
 
     def test_create_block(self) -> None:
         initial_length: int = len(self.blockchain.chain)
@@ -31,4 +43,119 @@ class TestBlockchain(unittest.TestCase):
         
         # Test invalid amount
         with self.assertRaises(ValueError):
-            self.blockchain.add_transaction('user1', 'user2', -5) 
\ No newline at end of file
+            self.blockchain.add_transaction('user1', 'user2', -5) 
+
+    def test_balance_index_follows_blocks(self) -> None:
+        self.blockchain.add_transaction('0', 'alice', 10)
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        self.assertEqual(self.blockchain.get_user_balance('alice'), 10)
+
+        self.blockchain.add_transaction('alice', 'bob', 4)
+        # pending spends are not confirmed yet, but already count against the sender's funds
+        self.assertEqual(self.blockchain.get_user_balance('alice'), 10)
+        self.assertAlmostEqual(self.blockchain.get_available_balance('alice'), 10 - 4 * 1.01)
+
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        self.assertAlmostEqual(self.blockchain.get_user_balance('alice'), 10 - 4 * 1.01)
+        self.assertEqual(self.blockchain.get_user_balance('bob'), 4)
+        self.assertEqual(self.blockchain.ledger.pending_debits, {})
+
+    def test_pending_double_spend_rejected(self) -> None:
+        self.blockchain.add_transaction('0', 'alice', 10)
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+
+        self.assertTrue(self.blockchain.add_transaction('alice', 'bob', 6))
+        self.assertFalse(self.blockchain.add_transaction('alice', 'carol', 6))
+
+    def test_reorganize_rolls_back_balances(self) -> None:
+        self.blockchain.add_transaction('0', 'alice', 10)
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        fork: List[Dict[str, Any]] = self.blockchain.chain[:1] + [
+            {'index': 2, 'timestamp': '', 'proof': 7, 'prev_hash': 'other',
+             'transactions': [{'sender': '0', 'receiver': 'bob', 'amount': 3, 'gas': 0}]},
+            {'index': 3, 'timestamp': '', 'proof': 9, 'prev_hash': 'other', 'transactions': []}
+        ]
+
+        self.blockchain._reorganize(fork)
+        self.assertEqual(self.blockchain.get_user_balance('alice'), 0)
+        self.assertEqual(self.blockchain.get_user_balance('bob'), 3)
+
+    def test_validation_is_incremental(self) -> None:
+        mine_blocks(self.blockchain, 2)
+        self.assertTrue(self.blockchain.is_chain_valid())
+        self.assertEqual(self.blockchain.verified_height, 3)
+
+        mine_blocks(self.blockchain, 1)
+        with mock.patch('src.blockchain.blockchain.hash_block', wraps=hash_block) as hasher:
+            self.assertTrue(self.blockchain.is_chain_valid())
+        self.assertEqual(hasher.call_count, 1)
+        self.assertEqual(self.blockchain.verified_height, 4)
+
+    def test_peer_chain_checked_after_common_prefix(self) -> None:
+        with mock.patch.dict(BLOCKCHAIN_CONFIG, {'CHECKPOINT_INTERVAL': 2}):
+            mine_blocks(self.blockchain, 3)
+            self.assertTrue(self.blockchain.is_chain_valid())
+            self.assertEqual(set(self.blockchain.checkpoints), {2, 4})
+
+            peer: Blockchain = Blockchain()
+            peer.miner = self.blockchain.miner
+            peer.chain = copy.deepcopy(self.blockchain.chain)
+            mine_blocks(peer, 2)
+
+            self.assertEqual(self.blockchain._find_fork_point(peer.chain), 4)
+            self.assertTrue(self.blockchain.is_chain_valid(peer.chain))
+            # Blocks are immutable, a tampered block is what a peer would send over the wire
+            peer.chain[-1] = dict(peer.chain[-1].to_dict(), proof=peer.chain[-1]['proof'] + 1)
+            self.assertFalse(self.blockchain.is_chain_valid(peer.chain))
+
+    def test_transactions_checked_against_merkle_root(self) -> None:
+        self.blockchain.add_transaction('0', 'alice', 10)
+        self.blockchain.add_transaction('0', 'bob', 20)
+        mine_blocks(self.blockchain, 1)
+        peer_chain: List[Dict[str, Any]] = [block.to_dict() for block in self.blockchain.chain]
+        self.assertTrue(self.blockchain.is_chain_valid(peer_chain))
+
+        # The block hash only covers the header, so a changed transaction leaves the hash chain intact
+        peer_chain[-1]['transactions'][0]['amount'] = 1000
+        self.assertEqual(hash_block(peer_chain[-1]), hash_block(self.blockchain.chain[-1]))
+        self.assertFalse(self.blockchain.is_chain_valid(peer_chain))
+        peer_chain[-1]['transactions'][0]['amount'] = 10
+        peer_chain[-1]['transactions'].append(peer_chain[-1]['transactions'][-1])
+        self.assertFalse(self.blockchain.is_chain_valid(peer_chain))
+
+    def test_reorganize_resets_verified_height(self) -> None:
+        mine_blocks(self.blockchain, 2)
+        self.assertTrue(self.blockchain.is_chain_valid())
+        self.blockchain._reorganize(self.blockchain.chain[:1])
+
+        self.assertEqual(self.blockchain.verified_height, 1)
+        self.assertEqual(self.blockchain.verified_tip_hash, hash_block(self.blockchain.chain[0]))
+
+    def test_block_size_limit(self) -> None:
+        self.blockchain.add_transaction('0', 'alice', 100)
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        for amount in range(1, 6):
+            self.blockchain.add_transaction('alice', 'bob', amount)
+
+        with mock.patch.dict(BLOCKCHAIN_CONFIG, {'BLOCK_MAX_TRANSACTIONS': 2}):
+            block: Dict[str, Any] = self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        self.assertEqual([transaction['amount'] for transaction in block['transactions']], [5, 4])
+        self.assertEqual(len(self.blockchain.mempool), 3)
+        self.assertAlmostEqual(self.blockchain.get_available_balance('alice'), 100 - 15 * 1.01)
+
+    def test_reward_pays_for_the_block_it_is_in(self) -> None:
+        self.blockchain.add_transaction('0', 'alice', 100)
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        for amount in (3, 4, 5):
+            self.blockchain.add_transaction('alice', 'bob', amount)
+        # Pending system transactions are ordered with the reward, they must not shift the selection
+        self.blockchain.add_transaction('0', 'dave', 1)
+        self.blockchain.add_transaction('0', 'erin', 1)
+
+        with mock.patch.dict(BLOCKCHAIN_CONFIG, {'BLOCK_MAX_TRANSACTIONS': 4}):
+            block: Dict[str, Any] = self.blockchain.create_block(proof=100, prev_hash='test_hash', reward_address='miner')
+        reward, *others = block['transactions']
+        self.assertEqual((reward['sender'], reward['receiver']), ('0', 'miner'))
+        self.assertAlmostEqual(reward['amount'], BLOCKCHAIN_CONFIG['BLOCK_REWARD'] + sum(other['gas'] for other in others))
+        self.assertEqual(len(block['transactions']), 4)
+        self.assertNotIn('miner', [transaction['receiver'] for transaction in self.blockchain.mempool])
@@ -0,0 +1,120 @@
+import unittest
+import tempfile
+from unittest import mock
+from typing import Dict, Any
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.contract import SmartContract, SAFE_BUILTINS
+from src.blockchain.registry import ContractRegistry
+from src.blockchain.gas import OutOfGas
+
+COUNTER = "state['count'] = state.get('count', 0) + params.get('step', 1)"
+
+
+class TestSmartContract(unittest.TestCase):
+    def test_rejects_prohibited_operations(self) -> None:
+        for code in ['import os', "open('x')", 'x = ().__class__', "eval('1')",
+                     "def g():\n    yield 1\nx = g().gi_frame.f_builtins['ev' + 'al']",
+                     "def g():\n    yield 1\nmatch g():\n    case object(gi_frame=frame):\n        pass"]:
+            valid, error = SmartContract(code, 'owner').validate()
+            self.assertFalse(valid, code)
+            self.assertTrue(error.startswith('Prohibited operation'), code)
+
+    def test_only_safe_builtins_are_reachable(self) -> None:
+        # Code that got past validation still runs against the whitelisted builtins only
+        code: str = "def g():\n    yield 1\nstate['builtins'] = sorted(g().gi_frame.f_builtins)"
+        contract: SmartContract = SmartContract(code, 'owner')
+        contract.compiled = compile(code, '<contract>', 'exec')
+        state: Dict[str, Any] = contract.execute(Blockchain(), {})[0]
+        self.assertEqual(state['builtins'], sorted(SAFE_BUILTINS))
+        self.assertNotIn('eval', state['builtins'])
+        self.assertNotIn('__import__', state['builtins'])
+
+        blockchain: Blockchain = Blockchain()
+        address: str = blockchain.deploy_contract("class Box:\n    size = 2\nstate['size'] = Box.size * len([1, 2])", 'owner')
+        self.assertEqual(blockchain.execute_smart_contract(address, {})['state'], {'size': 4})
+
+    def test_strings_are_not_flagged(self) -> None:
+        valid, error = SmartContract("state['note'] = 'import a file'", 'owner').validate()
+        self.assertTrue(valid, error)
+
+    def test_executes_cached_code_without_parsing(self) -> None:
+        blockchain: Blockchain = Blockchain()
+        address: str = blockchain.deploy_contract(COUNTER, 'owner')
+
+        with mock.patch('ast.parse') as parse, mock.patch('builtins.compile') as compile_:
+            blockchain.execute_smart_contract(address, {'step': 2})
+            result: Dict[str, Any] = blockchain.execute_smart_contract(address, {'step': 3})
+        parse.assert_not_called()
+        compile_.assert_not_called()
+        self.assertEqual(result['state'], {'count': 5})
+
+    def test_deploy_rejects_invalid_code(self) -> None:
+        with self.assertRaises(ValueError):
+            Blockchain().deploy_contract('import os', 'owner')
+
+
+class TestGasMetering(unittest.TestCase):
+    def setUp(self) -> None:
+        self.blockchain: Blockchain = Blockchain()
+        self.blockchain.executor = None
+
+    def test_gas_is_deterministic(self) -> None:
+        # 1 to enter, 6 for the loop (5 items and the final check), 5 calls and 4 comprehension items
+        code: str = ("def double(x):\n    return x * 2\n"
+                     "for i in range(5):\n    state[i] = double(i)\n"
+                     "state['sum'] = sum([v for v in (1, 2, 3)])")
+        address: str = self.blockchain.deploy_contract(code, 'owner')
+        results = [self.blockchain.execute_smart_contract(address, {})['gas_used'] for _ in range(3)]
+        self.assertEqual(results, [16, 16, 16])
+        self.assertEqual(self.blockchain.contracts[address].gas_used, 48)
+
+    def test_runaway_loops_run_out_of_gas(self) -> None:
+        self.blockchain.contract_gas_limit = 1000
+        for code in ['while True:\n    pass',
+                     'while True:\n    try:\n        x = 1\n    except Exception:\n        pass',
+                     'x = [i for i in range(10 ** 12)]',
+                     'for i in range(10 ** 12):\n    pass\nstate[1] = 1']:
+            address: str = self.blockchain.deploy_contract(code, 'owner')
+            with self.assertRaises(OutOfGas, msg=code):
+                self.blockchain.execute_smart_contract(address, {})
+            self.assertEqual(self.blockchain.contracts[address].gas_used, 1000)
+
+    def test_block_gas_limit(self) -> None:
+        self.blockchain.block_gas_limit = 33  # three calls of 11
+        address: str = self.blockchain.deploy_contract('for i in range(9):\n    pass', 'owner')
+        for _ in range(3):
+            self.blockchain.execute_smart_contract(address, {})
+        with self.assertRaisesRegex(OutOfGas, 'Block gas limit'):
+            self.blockchain.execute_smart_contract(address, {})
+
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        self.assertEqual(self.blockchain.execute_smart_contract(address, {})['gas_used'], 11)
+
+
+class TestContractRegistry(unittest.TestCase):
+    def test_evicts_cold_contracts_to_disk(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            blockchain: Blockchain = Blockchain()
+            blockchain.contracts = ContractRegistry(directory, capacity=1)
+            first: str = blockchain.deploy_contract(COUNTER, 'alice')
+            blockchain.execute_smart_contract(first, {'step': 4})
+            second: str = blockchain.deploy_contract(COUNTER, 'bob')
+
+            self.assertEqual(list(blockchain.contracts.hot), [second])
+            self.assertEqual(len(blockchain.contracts), 2)
+            # reloaded with its state and compiled code, which pushes the other one out
+            result: Dict[str, Any] = blockchain.execute_smart_contract(first, {'step': 1})
+            self.assertEqual(result['state'], {'count': 5})
+            self.assertEqual(list(blockchain.contracts.hot), [first])
+
+    def test_registry_survives_restart(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            registry: ContractRegistry = ContractRegistry(directory)
+            contract: SmartContract = SmartContract(COUNTER, 'alice')
+            contract.validate()
+            registry.deploy(contract)
+            registry.flush()
+
+            reopened: ContractRegistry = ContractRegistry(directory)
+            self.assertIn(contract.address, reopened)
+            self.assertIsNotNone(reopened[contract.address].compiled)
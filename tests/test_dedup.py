@@ -0,0 +1,65 @@
+import unittest
+import hashlib
+from unittest import mock
+from typing import List
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.dedup import ScalableBloomFilter
+
+
+def digests(start: int, count: int) -> List[bytes]:
+    return [hashlib.sha256(str(i).encode()).digest() for i in range(start, start + count)]
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives_and_bounded_false_positives(self) -> None:
+        bloom: ScalableBloomFilter = ScalableBloomFilter(capacity=1000, error_rate=0.01)
+        added: List[bytes] = digests(0, 5000)
+        for digest in added:
+            bloom.add(digest)
+
+        self.assertGreater(len(bloom.filters), 1)
+        self.assertTrue(all(digest in bloom for digest in added))
+        false_positives: int = sum(digest in bloom for digest in digests(10000, 20000))
+        self.assertLess(false_positives / 20000, 0.01)
+        # A few bytes per item, against well over a hundred for a set of hex strings
+        self.assertLess(bloom.nbytes / len(bloom), 4)
+
+
+class TestProcessedTransactions(unittest.TestCase):
+    def setUp(self) -> None:
+        self.blockchain: Blockchain = Blockchain()
+        self.blockchain.executor = None
+        self.blockchain.processed_transactions.window_blocks = 2
+
+    def seal(self) -> None:
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+
+    def test_duplicates_rejected_inside_and_outside_the_window(self) -> None:
+        self.blockchain.add_transaction('0', 'alice', 10)
+        self.assertFalse(self.blockchain.add_transaction('0', 'alice', 10))  # pending
+        self.seal()
+        self.assertFalse(self.blockchain.add_transaction('0', 'alice', 10))  # recent block
+        for amount in (1, 2, 3):
+            self.blockchain.add_transaction('0', 'bob', amount)
+            self.seal()
+
+        processed = self.blockchain.processed_transactions
+        self.assertEqual(len(processed.window), 2)
+        self.assertGreater(len(processed.older), 0)
+        self.assertFalse(self.blockchain.add_transaction('0', 'alice', 10))  # old block, Bloom filter and index
+
+    def test_bloom_false_positive_is_confirmed_by_the_index(self) -> None:
+        processed = self.blockchain.processed_transactions
+        with mock.patch.object(processed, 'may_be_older', return_value=True):
+            self.assertTrue(self.blockchain.add_transaction('0', 'carol', 7))
+
+    def test_reverted_block_leaves_the_window(self) -> None:
+        self.blockchain.add_transaction('0', 'alice', 10)
+        self.seal()
+        self.blockchain._reorganize(self.blockchain.chain[:1])
+        self.assertEqual(self.blockchain.processed_transactions.recent, {})
+        self.assertTrue(self.blockchain.add_transaction('0', 'alice', 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
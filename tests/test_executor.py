@@ -0,0 +1,141 @@
+import unittest
+import threading
+from typing import Dict, Any, List
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.executor import ContractExecutor, ExecutorBusy
+from src.blockchain.contract import SmartContract
+from src.blockchain.gas import OutOfGas
+
+COUNTER = "state['count'] = state.get('count', 0) + params.get('step', 1)"
+
+
+class TestContractExecutor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.executor: ContractExecutor = ContractExecutor(workers=2, queue_depth=8, timeout=5)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.executor.shutdown()
+
+    def setUp(self) -> None:
+        self.blockchain: Blockchain = Blockchain()
+        self.blockchain.executor = self.executor
+
+    def test_state_changes_come_back(self) -> None:
+        address: str = self.blockchain.deploy_contract(COUNTER + "\nstate.pop('old', None)", 'owner')
+        self.blockchain.contracts[address].state['old'] = True
+        for step in range(1, 5):
+            result: Dict[str, Any] = self.blockchain.execute_smart_contract(address, {'step': step})
+        self.assertEqual(result['state'], {'count': 10})
+
+    def test_read_only_calls_leave_the_worker_cache_alone(self) -> None:
+        address: str = self.blockchain.deploy_contract(COUNTER, 'owner')
+        self.blockchain.execute_smart_contract(address, {'step': 2})
+        for _ in range(3):
+            result: Dict[str, Any] = self.blockchain.execute_smart_contract(address, {'step': 5}, read_only=True)
+            self.assertEqual(result['state'], {'count': 7})
+        self.assertEqual(self.blockchain.execute_smart_contract(address, {'step': 1})['state'], {'count': 3})
+
+    def test_reorganize_invalidates_worker_state(self) -> None:
+        address: str = self.blockchain.deploy_contract(COUNTER, 'owner')
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        for _ in range(4):
+            self.blockchain.execute_smart_contract(address, {})
+        self.blockchain._reorganize(self.blockchain.chain[:1] + [
+            {'index': 2, 'timestamp': '', 'proof': 7, 'prev_hash': 'other', 'transactions': []}
+        ])
+        self.assertEqual(self.blockchain.execute_smart_contract(address, {})['state'], {'count': 1})
+
+    def test_balance_lookups_reach_the_parent(self) -> None:
+        self.blockchain.add_transaction('0', 'alice', 7)
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        address: str = self.blockchain.deploy_contract(
+            "state['balance'] = blockchain.get_balance('alice')\nstate['height'] = blockchain.get_block_number()", 'owner')
+
+        result: Dict[str, Any] = self.blockchain.execute_smart_contract(address, {})
+        self.assertEqual(result['state'], {'balance': 7, 'height': 2})
+
+    def test_failed_balance_lookups_keep_the_workers(self) -> None:
+        address: str = self.blockchain.deploy_contract("state['balance'] = blockchain.get_balance([1])", 'owner')
+        for _ in range(3):
+            with self.assertRaisesRegex(Exception, 'TypeError'):
+                self.blockchain.execute_smart_contract(address, {})
+        self.assertEqual(self.executor._idle.qsize(), 2)
+        counter: str = self.blockchain.deploy_contract(COUNTER, 'owner')
+        self.assertEqual(self.blockchain.execute_smart_contract(counter, {})['state'], {'count': 1})
+
+    def test_failed_call_leaves_state_alone(self) -> None:
+        address: str = self.blockchain.deploy_contract("state['count'] = 1\nstate['boom'] = 1 / params['zero']", 'owner')
+        with self.assertRaises(Exception):
+            self.blockchain.execute_smart_contract(address, {'zero': 0})
+        self.assertEqual(self.blockchain.contracts[address].state, {})
+
+    def test_out_of_gas_in_worker(self) -> None:
+        address: str = self.blockchain.deploy_contract('while True:\n    state[1] = 1', 'owner')
+        self.blockchain.contract_gas_limit = 500
+        with self.assertRaises(OutOfGas):
+            self.blockchain.execute_smart_contract(address, {})
+        self.assertEqual(self.blockchain.contracts[address].gas_used, 500)
+        self.assertEqual(self.blockchain.contracts[address].state, {})
+
+    def test_concurrent_calls(self) -> None:
+        addresses: List[str] = [self.blockchain.deploy_contract(COUNTER, owner) for owner in ('a', 'b')]
+        threads: List[threading.Thread] = [
+            threading.Thread(target=self.blockchain.execute_smart_contract, args=(address, {}))
+            for address in addresses for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([self.blockchain.contracts[address].state['count'] for address in addresses], [5, 5])
+
+
+class TestExecutorLimits(unittest.TestCase):
+    def test_runaway_contract_is_killed(self) -> None:
+        executor: ContractExecutor = ContractExecutor(workers=1, queue_depth=4, timeout=1)
+        blockchain: Blockchain = Blockchain()
+        blockchain.executor = executor
+        try:
+            # a single builtin call is not metered, so the deadline is what stops it
+            runaway: str = blockchain.deploy_contract('state[1] = sum(range(10 ** 12))', 'owner')
+            with self.assertRaisesRegex(Exception, 'timed out'):
+                blockchain.execute_smart_contract(runaway, {})
+            # the replacement worker picks up the next call
+            counter: str = blockchain.deploy_contract(COUNTER, 'owner')
+            self.assertEqual(blockchain.execute_smart_contract(counter, {})['state'], {'count': 1})
+        finally:
+            executor.shutdown()
+
+    def test_shutdown_stops_busy_workers(self) -> None:
+        executor: ContractExecutor = ContractExecutor(workers=1, queue_depth=4, timeout=30)
+        blockchain: Blockchain = Blockchain()
+        blockchain.executor = executor
+        runaway: str = blockchain.deploy_contract('state[1] = sum(range(10 ** 12))', 'owner')
+        errors: List[Exception] = []
+
+        def call() -> None:
+            try:
+                blockchain.execute_smart_contract(runaway, {})
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        while not executor._workers or executor._idle.qsize():
+            thread.join(0.01)
+        worker = next(iter(executor._workers))
+        executor.shutdown()
+        thread.join(5)
+        self.assertFalse(worker.process.is_alive())
+        self.assertEqual([str(e) for e in errors], ['Contract worker crashed'])
+        self.assertEqual((executor._workers, executor._idle.qsize()), (set(), 0))
+
+    def test_queue_depth(self) -> None:
+        executor: ContractExecutor = ContractExecutor(workers=1, queue_depth=0)
+        contract: SmartContract = SmartContract(COUNTER, 'owner')
+        contract.validate()
+        with self.assertRaises(ExecutorBusy):
+            executor.execute(contract, Blockchain(), {})
+        executor.shutdown()
@@ -0,0 +1,81 @@
+import unittest
+from collections import deque
+from unittest import mock
+from typing import Dict, Any, List, Tuple
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.network import PeerClient, TransactionGossip
+
+
+def transactions(count: int, start: int = 0) -> List[Tuple[str, Dict[str, Any]]]:
+    return [(f'hash{i}', {'sender': 'alice', 'receiver': 'bob', 'amount': i + 1, 'gas': 0})
+            for i in range(start, start + count)]
+
+
+class TestTransactionGossip(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client: PeerClient = PeerClient(max_workers=2)
+        self.sent: List[Tuple[str, int]] = []
+        self.failing: Dict[str, int] = {}
+        self.client.post_json = self._post
+        self.gossip: TransactionGossip = TransactionGossip(self.client, batch_size=10, queue_limit=5, backoff=0.01)
+
+    def tearDown(self) -> None:
+        self.gossip.stop()
+        self.client.close()
+
+    def _post(self, node: str, path: str, data: Dict[str, Any]) -> mock.Mock:
+        if self.failing.get(node, 0) > 0:
+            self.failing[node] -= 1
+            return mock.Mock(status_code=503)
+        self.sent.append((node, len(data['transactions'])))
+        return mock.Mock(status_code=201)
+
+    def test_batches_per_peer(self) -> None:
+        self.gossip.enqueue(['a:1', 'b:1'], transactions(3))
+
+        self.assertTrue(self.gossip.flush(timeout=2))
+        self.assertEqual(sorted(self.sent), [('a:1', 3), ('b:1', 3)])
+
+    def test_seen_transactions_are_not_resent(self) -> None:
+        self.gossip.enqueue(['a:1'], transactions(3))
+        self.assertTrue(self.gossip.flush(timeout=2))
+        self.gossip.enqueue(['a:1'], transactions(4))
+
+        self.assertTrue(self.gossip.flush(timeout=2))
+        self.assertEqual(self.sent, [('a:1', 3), ('a:1', 1)])
+
+    def test_retries_with_backoff(self) -> None:
+        self.failing['a:1'] = 2
+        self.gossip.enqueue(['a:1'], transactions(2))
+
+        self.assertTrue(self.gossip.flush(timeout=2))
+        self.assertEqual(self.sent, [('a:1', 2)])
+
+    def test_received_transactions_are_not_echoed(self) -> None:
+        blockchain: Blockchain = Blockchain()
+        blockchain.executor = None
+        blockchain.gossip = self.gossip
+        blockchain.nodes = {'a:1', 'b:1'}
+        results = blockchain.add_transactions([{'sender': '0', 'receiver': 'alice', 'amount': 1}], origin='a:1')
+
+        self.assertEqual(results[0]['status'], 'accepted')
+        self.assertTrue(self.gossip.flush(timeout=2))
+        self.assertEqual(self.sent, [('b:1', 1)])
+
+    def test_queue_is_bounded(self) -> None:
+        self.failing['a:1'] = 1
+        self.gossip.enqueue(['a:1'], transactions(8))
+
+        self.assertTrue(self.gossip.flush(timeout=2))
+        self.assertEqual(self.gossip.dropped, 3)
+        self.assertEqual(self.sent, [('a:1', 5)])
+
+    def test_requeued_batch_overflow_is_counted(self) -> None:
+        self.failing['a:1'] = 1
+        self.gossip.queues['a:1'] = deque(transactions(4), maxlen=5)
+        # Runs the failed send directly, so nothing else touches the queue
+        self.gossip._send('a:1', transactions(3, start=10))
+
+        self.assertEqual(self.gossip.dropped, 2)
+        self.assertEqual([transaction_hash for transaction_hash, _ in self.gossip.queues['a:1']],
+                         ['hash10', 'hash11', 'hash12', 'hash0', 'hash1'])
@@ -0,0 +1,77 @@
+import unittest
+import os
+import tempfile
+import threading
+from typing import List
+from src.blockchain.hashing import hashing_algorithm, hashing_algorithm_many, get_dynamic_primes
+from src.blockchain.primes import PrimeTable, sieve_primes
+
+
+def trial_division_primes(count: int) -> List[int]:
+    primes: List[int] = []
+    candidate = 2
+    while len(primes) < count:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+
+class TestPrimeTable(unittest.TestCase):
+    def test_sieve_matches_trial_division(self) -> None:
+        self.assertEqual(list(sieve_primes(2000)), trial_division_primes(2000))
+
+    def test_table_is_cached_on_disk(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            table: PrimeTable = PrimeTable(cache_dir, max_count=10 ** 6)
+            self.assertEqual(table.nth(1), 2)
+            self.assertEqual(table.nth(1000), 7919)
+            self.assertEqual(os.listdir(cache_dir), [f'primes_{table.count}.bin'])
+            table.close()
+
+            reopened: PrimeTable = PrimeTable(cache_dir, max_count=10 ** 6)
+            self.assertEqual(reopened.nth(1000), 7919)
+            reopened.close()
+
+    def test_concurrent_growth(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            table: PrimeTable = PrimeTable(cache_dir, max_count=10 ** 6)
+            expected: List[int] = list(sieve_primes(300000))
+            errors: List[Exception] = []
+
+            def lookup(step: int) -> None:
+                try:
+                    for n in range(step, 300000, 997 * step):
+                        self.assertEqual(table.nth(n), expected[n - 1])
+                except Exception as e:
+                    errors.append(e)
+
+            threads: List[threading.Thread] = [threading.Thread(target=lookup, args=(step,)) for step in range(1, 9)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            self.assertEqual([name for name in os.listdir(cache_dir) if name.endswith('.tmp')], [])
+            table.close()
+
+    def test_limit(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            table: PrimeTable = PrimeTable(cache_dir, max_count=100)
+            with self.assertRaises(ValueError):
+                table.nth(101)
+
+
+class TestHashing(unittest.TestCase):
+    def test_primes_only_depend_on_length(self) -> None:
+        # 7 ** 5 = 16807, so the primes are the 16807th and 8403rd
+        self.assertEqual(get_dynamic_primes('abcdefg'), [185707, 86399])
+        self.assertEqual(get_dynamic_primes('abcdefg'), get_dynamic_primes('gfedcba'))
+
+    def test_batch_matches_single(self) -> None:
+        inputs: List[str] = ['block', 'transaction', 'abcdefghij', 'block']
+        hashes: List[str] = hashing_algorithm_many(inputs)
+
+        self.assertEqual(hashes, [hashing_algorithm(s) for s in inputs])
+        self.assertEqual(hashes[0], hashes[3])
+        self.assertEqual(len(hashes[0]), 16)
@@ -0,0 +1,58 @@
+import unittest
+from typing import Dict, Any, List
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.helpers import hash_transaction
+from src.blockchain.index import TransactionIndex
+
+
+def seal(blockchain: Blockchain) -> None:
+    blockchain.create_block(proof=100, prev_hash='test_hash')
+
+
+class TestTransactionIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.blockchain: Blockchain = Blockchain()
+        self.blockchain.executor = None
+        self.blockchain.add_transaction('0', 'alice', 100)
+        seal(self.blockchain)
+        for amount in (1, 2, 3):
+            self.blockchain.add_transaction('alice', 'bob', amount)
+            seal(self.blockchain)
+
+    def test_locate_and_history(self) -> None:
+        block: Dict[str, Any] = self.blockchain.chain[3]
+        transaction_hash: str = hash_transaction(block['transactions'][0])
+
+        result = self.blockchain.get_transaction(transaction_hash)
+        self.assertEqual((result['block_index'], result['position'], result['status']), (4, 0, 'confirmed'))
+        self.assertEqual(result['transaction']['amount'], 2)
+        self.assertEqual(result['confirmations'], 2)
+
+        total, history = self.blockchain.get_history('alice', 0, 2)
+        self.assertEqual(total, 4)
+        self.assertEqual([entry['transaction']['amount'] for entry in history], [3, 2])
+        self.assertEqual([entry['transaction']['amount'] for entry in self.blockchain.get_history('alice', 2, 10)[1]], [1, 100])
+        self.assertEqual(self.blockchain.get_history('nobody', 0, 10), (0, []))
+
+    def test_pending_transactions_are_found(self) -> None:
+        self.blockchain.add_transaction('alice', 'carol', 5)
+        pending_hash: str = next(iter(self.blockchain.mempool.entries))
+        self.assertEqual(self.blockchain.get_transaction(pending_hash)['status'], 'pending')
+        self.assertIsNone(self.blockchain.get_transaction('unknown'))
+
+    def test_reorganize_matches_rebuild(self) -> None:
+        reverted: Dict[str, Any] = self.blockchain.chain[-1]
+        self.blockchain._reorganize(self.blockchain.chain[:2])
+        self.blockchain.add_transaction('alice', 'carol', 1)
+        seal(self.blockchain)
+
+        rebuilt: TransactionIndex = TransactionIndex()
+        rebuilt.rebuild(self.blockchain.chain)
+        self.assertEqual(self.blockchain.index.transactions, rebuilt.transactions)
+        self.assertEqual(self.blockchain.index.history, rebuilt.history)
+        self.assertIsNone(self.blockchain.index.locate(hash_transaction(reverted['transactions'][0])))
+        self.assertEqual(self.blockchain.get_history('carol', 0, 10)[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
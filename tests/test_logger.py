@@ -0,0 +1,41 @@
+import unittest
+import logging
+import queue
+from unittest import mock
+from typing import List
+from src.utils.logger import RateLimitFilter, DroppingQueueHandler
+
+
+def make_record(level: int = logging.INFO, lineno: int = 1) -> logging.LogRecord:
+    return logging.LogRecord('blockchain.test', level, 'test.py', lineno, 'message %s', ('x',), None)
+
+
+class TestRateLimitFilter(unittest.TestCase):
+    def test_rate_limit_per_call_site(self) -> None:
+        log_filter: RateLimitFilter = RateLimitFilter(rate_limit=3, sample_rate=1)
+        with mock.patch('time.monotonic', return_value=100.0):
+            passed: List[bool] = [log_filter.filter(make_record()) for _ in range(10)]
+            self.assertTrue(log_filter.filter(make_record(lineno=2)))
+            self.assertTrue(log_filter.filter(make_record(logging.WARNING)))
+        self.assertEqual(passed.count(True), 3)
+
+        with mock.patch('time.monotonic', return_value=101.0):
+            record: logging.LogRecord = make_record()
+            self.assertTrue(log_filter.filter(record))
+        self.assertEqual(record.getMessage(), 'message x (7 similar messages suppressed)')
+
+    def test_sampling(self) -> None:
+        log_filter: RateLimitFilter = RateLimitFilter(rate_limit=0, sample_rate=4)
+        passed: List[bool] = [log_filter.filter(make_record()) for _ in range(10)]
+        self.assertEqual(passed, [True, False, False, False, True, False, False, False, True, False])
+
+
+class TestDroppingQueueHandler(unittest.TestCase):
+    def test_full_queue_drops_instead_of_blocking(self) -> None:
+        handler: DroppingQueueHandler = DroppingQueueHandler(queue.Queue(2))
+        for _ in range(5):
+            handler.handle(make_record())
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+        # formatted on the calling thread, so the writer thread never sees the arguments
+        self.assertEqual(handler.queue.get().msg, 'message x')
@@ -0,0 +1,45 @@
+import unittest
+from typing import Dict, Any, List, Tuple
+from src.blockchain.mempool import Mempool
+
+
+def transaction(sender: str, gas: float, amount: float = 1) -> Tuple[str, Dict[str, Any]]:
+    data: Dict[str, Any] = {'sender': sender, 'receiver': 'bob', 'amount': amount, 'gas': gas}
+    return f'{sender}-{gas}-{amount}', data
+
+
+class TestMempool(unittest.TestCase):
+    def test_pops_highest_fee_first(self) -> None:
+        mempool: Mempool = Mempool()
+        for sender, gas in [('a', 0.1), ('b', 0.5), ('c', 0.3), ('0', 0)]:
+            mempool.add(*transaction(sender, gas))
+
+        selected: List[Tuple[str, Dict[str, Any]]] = mempool.pop_best(3)
+        self.assertEqual([data['sender'] for _, data in selected], ['0', 'b', 'c'])
+        self.assertEqual(mempool.to_list(), [transaction('a', 0.1)[1]])
+
+    def test_peek_matches_pop(self) -> None:
+        mempool: Mempool = Mempool()
+        for gas in range(10):
+            mempool.add(*transaction(f'user{gas}', gas))
+        mempool.remove(transaction('user9', 9)[0])
+
+        self.assertEqual(mempool.peek(3), [data for _, data in mempool.pop_best(3)])
+
+    def test_evicts_lowest_fee_when_full(self) -> None:
+        mempool: Mempool = Mempool(max_transactions=2)
+        mempool.add(*transaction('a', 0.1))
+        mempool.add(*transaction('b', 0.2))
+
+        self.assertEqual(mempool.add(*transaction('c', 0.05)), (False, []))
+        admitted, evicted = mempool.add(*transaction('d', 0.3))
+        self.assertTrue(admitted)
+        self.assertEqual([data['sender'] for _, data in evicted], ['a'])
+        self.assertEqual(len(mempool), 2)
+
+    def test_per_sender_limit(self) -> None:
+        mempool: Mempool = Mempool(max_per_sender=2)
+        self.assertTrue(mempool.add(*transaction('a', 0.1, 1))[0])
+        self.assertTrue(mempool.add(*transaction('a', 0.1, 2))[0])
+        self.assertFalse(mempool.add(*transaction('a', 0.1, 3))[0])
+        self.assertEqual(len(mempool.transactions_from('a')), 2)
@@ -0,0 +1,41 @@
+import unittest
+import hashlib
+from typing import List
+from src.blockchain.merkle import merkle_root, merkle_proof, verify_proof, EMPTY_ROOT
+
+
+def leaves(count: int) -> List[str]:
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(count)]
+
+
+class TestMerkle(unittest.TestCase):
+    def test_root(self) -> None:
+        a, b, c = leaves(3)
+        pair = lambda left, right: hashlib.sha256((left + right).encode()).hexdigest()
+
+        self.assertEqual(merkle_root([]), EMPTY_ROOT)
+        self.assertEqual(merkle_root([a]), a)
+        self.assertEqual(merkle_root([a, b]), pair(a, b))
+        self.assertEqual(merkle_root([a, b, c]), pair(pair(a, b), pair(c, c)))
+
+    def test_every_leaf_has_a_valid_proof(self) -> None:
+        for count in range(1, 18):
+            hashes: List[str] = leaves(count)
+            root: str = merkle_root(hashes)
+            for index, leaf in enumerate(hashes):
+                proof = merkle_proof(hashes, index)
+                self.assertLessEqual(len(proof), count.bit_length())
+                self.assertTrue(verify_proof(leaf, proof, root))
+
+    def test_wrong_leaf_or_root_is_rejected(self) -> None:
+        hashes: List[str] = leaves(5)
+        proof = merkle_proof(hashes, 2)
+
+        self.assertFalse(verify_proof(hashes[3], proof, merkle_root(hashes)))
+        self.assertFalse(verify_proof(hashes[2], proof, merkle_root(hashes[:4])))
+        with self.assertRaises(IndexError):
+            merkle_proof(hashes, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
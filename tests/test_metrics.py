@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+from flask.testing import FlaskClient
+from src.api.app import app
+from src.utils import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self) -> None:
+        histogram: metrics.Histogram = metrics.Histogram('test_seconds', 'Test', ('operation',), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value, 'sync')
+        self.assertEqual(histogram.render()[2:], [
+            'test_seconds_bucket{operation="sync",le="0.1"} 1',
+            'test_seconds_bucket{operation="sync",le="1"} 3',
+            'test_seconds_bucket{operation="sync",le="+Inf"} 4',
+            'test_seconds_sum{operation="sync"} 4.05',
+            'test_seconds_count{operation="sync"} 4',
+        ])
+
+    def test_timed_is_skipped_when_disabled(self) -> None:
+        histogram: metrics.Histogram = metrics.Histogram('test_seconds', 'Test', ('operation',))
+        with mock.patch.object(metrics, 'OPERATION_LATENCY', histogram):
+            timed_sum = metrics.timed('sum')(sum)
+            self.assertEqual(timed_sum([1, 2]), 3)
+            with mock.patch.dict(metrics.METRICS_CONFIG, {'ENABLED': False}):
+                timed_sum([3])
+        self.assertEqual(histogram.series[('sum',)][0][0], 1)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self) -> None:
+        self.app: FlaskClient = app.test_client()
+
+    def test_metrics_endpoint(self) -> None:
+        self.app.get('/get_balance/metrics_user')
+        response = self.app.get('/metrics')
+        text: str = response.data.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn('api_request_duration_seconds_count{route="/get_balance/<user>",method="GET"}', text)
+        self.assertIn('blockchain_operation_duration_seconds_count{operation="get_user_balance"}', text)
+        self.assertIn('# TYPE blockchain_chain_height gauge', text)
+
+    def test_metrics_can_be_switched_off(self) -> None:
+        with mock.patch.dict(metrics.METRICS_CONFIG, {'ENABLED': False}):
+            self.assertEqual(self.app.get('/metrics').status_code, 404)
@@ -0,0 +1,34 @@
+import unittest
+import threading
+from typing import Optional
+from src.blockchain.miner import Miner, valid_proof
+
+
+class TestMiner(unittest.TestCase):
+    def test_single_worker_finds_valid_proof(self) -> None:
+        miner: Miner = Miner(workers=1, batch_size=1000)
+        proof: Optional[int] = miner.mine(prev_proof=1, difficulty=3)
+
+        self.assertIsNotNone(proof)
+        self.assertTrue(valid_proof(proof, 1, 3))
+        self.assertGreater(miner.last_stats['hashes'], 0)
+
+    def test_parallel_workers_find_valid_proof(self) -> None:
+        miner: Miner = Miner(workers=2, batch_size=500)
+        try:
+            proof: Optional[int] = miner.mine(prev_proof=533, difficulty=4)
+            self.assertIsNotNone(proof)
+            self.assertTrue(valid_proof(proof, 533, 4))
+            self.assertGreater(miner.last_stats['hash_rate'], 0)
+        finally:
+            miner.shutdown()
+
+    def test_cancel_stops_mining(self) -> None:
+        miner: Miner = Miner(workers=1, batch_size=1000)
+        # difficulty 64 is unreachable, so only the cancel can end the search
+        timer = threading.Timer(0.2, miner.cancel)
+        timer.start()
+        proof: Optional[int] = miner.mine(prev_proof=1, difficulty=64)
+
+        self.assertIsNone(proof)
+        self.assertTrue(miner.last_stats['cancelled'])
@@ -0,0 +1,77 @@
+import json
+import hashlib
+import unittest
+from unittest import mock
+from typing import Dict, Any
+from src.blockchain.models import Block, Transaction
+from src.blockchain.helpers import hash_block, hash_transaction
+from src.utils import encoding
+
+
+def block_dict() -> Dict[str, Any]:
+    return {
+        'index': 2,
+        'timestamp': '2024-01-01 00:00:00',
+        'transactions': [
+            {'sender': 'alice', 'receiver': 'bob', 'amount': 5, 'gas': 0.01},
+            {'sender': '0', 'receiver': 'carol', 'amount': 1.5, 'gas': 0, 'memo': 'ünïcode'}
+        ],
+        'proof': 533,
+        'prev_hash': 'ab' * 32
+    }
+
+
+class TestModels(unittest.TestCase):
+    def test_hash_matches_the_dict_encoding(self) -> None:
+        data: Dict[str, Any] = block_dict()
+        block: Block = Block.from_dict(data)
+
+        self.assertEqual(block.canonical(), json.dumps(data, sort_keys=True).encode())
+        self.assertEqual(hash_block(block), hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest())
+        for transaction, raw in zip(block.transactions, data['transactions']):
+            self.assertEqual(hash_transaction(transaction), hash_transaction(raw))
+
+    def test_round_trip_and_mapping_access(self) -> None:
+        data: Dict[str, Any] = block_dict()
+        block: Block = Block.from_dict(data)
+
+        self.assertEqual(block.to_dict(), data)
+        self.assertEqual(block, data)
+        self.assertEqual(Block.from_dict(block.to_dict()), block)
+        self.assertEqual(block['transactions'][1]['memo'], 'ünïcode')
+        self.assertEqual(block.get('missing', 'default'), 'default')
+        self.assertEqual(set(block), set(data))
+        with self.assertRaises(TypeError):
+            block['proof'] = 1  # type: ignore[index]
+        with self.assertRaises(AttributeError):
+            block.nonce = 1  # type: ignore[attr-defined]
+
+    def test_hash_is_computed_once(self) -> None:
+        block: Block = Block.from_dict(block_dict())
+        digest: str = block.block_hash
+        with mock.patch.object(Block, 'canonical', side_effect=AssertionError('re-encoded')):
+            self.assertEqual(hash_block(block), digest)
+
+    def test_json_is_encoded_once(self) -> None:
+        block: Block = Block.from_dict(block_dict())
+        encoded: bytes = block.json()
+        self.assertEqual(json.loads(encoded), block_dict())
+        with mock.patch.object(Block, 'to_dict', side_effect=AssertionError('re-encoded')):
+            self.assertIs(block.json(), encoded)
+
+        loaded: Block = Block.from_json(encoded)
+        self.assertIs(loaded.json(), encoded)
+        self.assertEqual(loaded, block)
+
+    def test_encoding_without_orjson(self) -> None:
+        with mock.patch.object(encoding, 'orjson', None):
+            self.assertEqual(json.loads(encoding.dumps(block_dict())), block_dict())
+        self.assertEqual(json.loads(encoding.dumps({'amount': 2 ** 70})), {'amount': 2 ** 70})
+
+    def test_transaction_hash_can_be_handed_over(self) -> None:
+        transaction: Transaction = Transaction.from_dict(block_dict()['transactions'][0], 'known')
+        self.assertEqual(hash_transaction(transaction), 'known')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import copy
+import time
+from unittest import mock
+from typing import Dict, Any, List, Tuple
+from urllib.parse import parse_qsl
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.helpers import hash_block
+from src.blockchain.miner import Miner
+from tests.test_blockchain import mine_blocks
+
+
+def fake_peer(chain: List[Dict[str, Any]], delay: float = 0) -> Dict[str, Any]:
+    return {'chain': chain, 'delay': delay}
+
+
+class TestPeerSync(unittest.TestCase):
+    def setUp(self) -> None:
+        self.blockchain: Blockchain = Blockchain()
+        self.blockchain.miner = Miner(workers=1)
+        self.peers: Dict[str, Dict[str, Any]] = {}
+        self.requests: List[Tuple[str, str, Dict[str, int]]] = []
+        self.blockchain.peers.session.get = self._get
+
+    def tearDown(self) -> None:
+        self.blockchain.peers.close()
+
+    def _get(self, url: str, timeout: float) -> mock.Mock:
+        node, path = url[len('http://'):].split('/', 1)
+        peer = self.peers[node]
+        time.sleep(peer['delay'])
+        chain: List[Dict[str, Any]] = peer['chain']
+        path, query = (path.split('?', 1) + [''])[:2]
+        args: Dict[str, int] = {key: int(value) for key, value in parse_qsl(query)}
+        blocks: List[Dict[str, Any]] = chain[args.get('from', 1) - 1:args.get('to', len(chain))]
+        self.requests.append((node, path, args))
+        if path == 'chain_tip':
+            body: Dict[str, Any] = {'height': len(chain)}
+        elif path == 'get_headers':
+            body = {'headers': [{'index': block['index'], 'hash': hash_block(block)} for block in blocks]}
+        else:
+            body = peer.get('body', {'chain': blocks, 'length': len(chain)})
+        return mock.Mock(status_code=200, json=mock.Mock(return_value=body))
+
+    def _peer_chain(self, extra_blocks: int) -> List[Dict[str, Any]]:
+        peer: Blockchain = Blockchain()
+        peer.miner = self.blockchain.miner
+        peer.chain = copy.deepcopy(self.blockchain.chain)
+        mine_blocks(peer, extra_blocks)
+        # Peers send the dict wire format
+        return [block.to_dict() for block in peer.chain]
+
+    def test_picks_longest_valid_chain(self) -> None:
+        mine_blocks(self.blockchain, 1)
+        self.assertTrue(self.blockchain.is_chain_valid())
+        longer: List[Dict[str, Any]] = self._peer_chain(1)
+        invalid: List[Dict[str, Any]] = self._peer_chain(3)
+        invalid[-1]['proof'] += 1
+        self.peers = {'a:1': fake_peer(longer), 'b:1': fake_peer(invalid), 'c:1': fake_peer(self.blockchain.chain)}
+        self.blockchain.nodes = set(self.peers)
+
+        self.assertTrue(self.blockchain.replace_chain())
+        self.assertEqual(len(self.blockchain.chain), len(longer))
+        self.assertEqual(self.blockchain.chain[-1], longer[-1])
+        self.assertEqual(self.blockchain.verified_height, len(longer))
+
+    def test_only_blocks_after_the_fork_point_are_fetched(self) -> None:
+        mine_blocks(self.blockchain, 3)
+        self.assertTrue(self.blockchain.is_chain_valid())
+        # The peer shares our first two blocks and mined four of its own on top
+        peer: Blockchain = Blockchain()
+        peer.miner = self.blockchain.miner
+        peer.chain = copy.deepcopy(self.blockchain.chain[:2])
+        mine_blocks(peer, 4)
+        self.peers = {'a:1': fake_peer([block.to_dict() for block in peer.chain])}
+        self.blockchain.nodes = set(self.peers)
+
+        # The newest page of headers does not reach back to the fork, so it is found by binary search
+        with mock.patch.dict('src.config.config.BLOCKCHAIN_CONFIG', {'HEADERS_PAGE_LIMIT': 2}):
+            self.assertTrue(self.blockchain.replace_chain())
+        self.assertEqual(self.blockchain.chain[-1], peer.chain[-1].to_dict())
+        self.assertEqual([args for _, path, args in self.requests if path != 'chain_tip'],
+                         [{'from': 3, 'to': 4}, {'from': 1, 'to': 1}, {'from': 2, 'to': 2}, {'from': 3}])
+
+    def test_malformed_peer_answers_are_skipped(self) -> None:
+        self.peers = {'a:1': fake_peer(self._peer_chain(1)), 'b:1': fake_peer(self._peer_chain(2))}
+        self.peers['b:1']['body'] = {'chain': 5, 'length': 4}
+        self.peers['c:1'] = dict(fake_peer(self._peer_chain(2)), body={'chain': [1, 2, 3, 4], 'length': 4})
+        self.blockchain.nodes = set(self.peers)
+
+        candidates = self.blockchain.peers.fetch_chains(self.blockchain.nodes, len(self.blockchain.chain))
+        self.assertEqual(list(candidates), ['a:1'])
+
+    def test_slow_peers_are_cut_off_by_deadline(self) -> None:
+        self.peers = {'slow:1': fake_peer(self._peer_chain(2), delay=1), 'fast:1': fake_peer(self._peer_chain(1))}
+        self.blockchain.nodes = set(self.peers)
+
+        started: float = time.perf_counter()
+        candidates = self.blockchain.peers.fetch_chains(self.blockchain.nodes, len(self.blockchain.chain), deadline=0.3)
+        self.assertLess(time.perf_counter() - started, 0.9)
+        self.assertEqual(list(candidates), ['fast:1'])
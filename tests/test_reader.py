@@ -0,0 +1,83 @@
+import unittest
+import json
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from src.serving.reader import create_reader_app
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.helpers import hash_block, hash_transaction
+
+
+class TestReader(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = mock.patch.dict('src.config.config.BLOCKCHAIN_CONFIG', {'STORAGE_BACKEND': 'sqlite'})
+        self.backend.start()
+        # The writer: the only process with the chain in memory
+        self.blockchain: Blockchain = Blockchain()
+        self.blockchain.executor = None
+        self.blockchain.add_transaction('0', 'alice', 10)
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        self.blockchain.add_transaction('alice', 'bob', 2)
+        self.blockchain.save_chain(self.tmp.name)
+        self.client = create_reader_app(self.tmp.name, 'http://writer').test_client()
+
+    def tearDown(self) -> None:
+        self.blockchain.store.close()
+        self.backend.stop()
+        self.tmp.cleanup()
+
+    def test_chain_and_tip_from_store(self) -> None:
+        response = self.client.get('/chain_tip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json['height'], response.json['tip_hash']), (2, hash_block(self.blockchain.chain[-1])))
+
+        response = self.client.get('/get_chain')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['chain'], [block.to_dict() for block in self.blockchain.chain])
+        self.assertEqual(response.json['length'], 2)
+
+    def test_balance_history_and_transaction(self) -> None:
+        data = self.client.get('/get_balance/alice').json
+        # The pending transfer is only reserved, like the writer's available balance
+        self.assertEqual(data['balance'], 10)
+        self.assertAlmostEqual(data['available_balance'], self.blockchain.get_available_balance('alice'))
+
+        history = self.client.get('/get_history/alice').json
+        self.assertEqual(history['total'], 1)
+        self.assertEqual(history['history'][0]['block_index'], 2)
+
+        transaction_hash = hash_transaction(self.blockchain.chain[-1]['transactions'][0])
+        data = self.client.get(f'/get_transaction/{transaction_hash}').json
+        self.assertEqual(data['status'], 'confirmed')
+        self.assertEqual(data['confirmations'], 1)
+
+    def test_sees_new_blocks(self) -> None:
+        self.assertEqual(self.client.get('/chain_tip').json['height'], 2)
+        self.blockchain.create_block(proof=200, prev_hash=hash_block(self.blockchain.chain[-1]))
+        self.blockchain.save_chain(self.tmp.name)
+        self.assertEqual(self.client.get('/chain_tip').json['height'], 3)
+        self.assertAlmostEqual(self.client.get('/get_balance/bob').json['balance'], 2)
+
+    def test_writes_are_forwarded(self) -> None:
+        upstream = mock.Mock(status_code=201, content=b'{"message": "ok"}',
+                             headers={'Content-Type': 'application/json'})
+        with mock.patch('src.serving.reader.requests.request', return_value=upstream) as request:
+            response = self.client.post('/add_transaction', json={'sender': 'alice', 'receiver': 'bob', 'amount': 1})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json, {'message': 'ok'})
+        method, url = request.call_args[0]
+        self.assertEqual((method, url), ('POST', 'http://writer/add_transaction'))
+        self.assertEqual(json.loads(request.call_args[1]['data']), {'sender': 'alice', 'receiver': 'bob', 'amount': 1})
+        self.assertEqual(request.call_args[1]['headers'],
+                         {'Content-Type': 'application/json', 'X-Forwarded-For': '127.0.0.1'})
+
+    def test_import_leaves_the_writer_alone(self) -> None:
+        # Reader processes must not build the module-level Blockchain of src.api.routes
+        code = "import sys, src.serving.reader; print('src.api.routes' in sys.modules)"
+        self.assertEqual(subprocess.check_output([sys.executable, '-c', code], text=True).strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,34 @@
 import unittest
+import importlib
 import json
+import os
+import tempfile
+from unittest import mock
 from typing import Dict, Any
 from flask.testing import FlaskClient
 from src.api.app import app
+from src.blockchain.helpers import hash_block, hash_transaction
+from src.blockchain.merkle import verify_proof
 
 class TestBlockchainAPI(unittest.TestCase):
     def setUp(self) -> None:
         self.app: FlaskClient = app.test_client()
         self.app.testing = True
+        # The routes save the module-level node, which must not touch the real chain_data
+        self.tmp = tempfile.TemporaryDirectory()
+        self.chain_dir = mock.patch.dict('src.config.config.BLOCKCHAIN_CONFIG', {
+            'CHAIN_DIR': self.tmp.name,
+            'CONTRACT_DIR': os.path.join(self.tmp.name, 'contracts')
+        })
+        self.chain_dir.start()
+
+    def tearDown(self) -> None:
+        # Saved blocks are read back from the store, so it is closed before its directory goes
+        blockchain = importlib.import_module('src.api.routes').blockchain
+        if blockchain.store is not None:
+            blockchain.close_store()
+        self.chain_dir.stop()
+        self.tmp.cleanup()
 
     def test_get_chain(self) -> None:
         response = self.app.get('/get_chain')
@@ -26,4 +47,152 @@ class TestBlockchainAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn('index', data)
         self.assertIn('timestamp', data)
-        self.assertIn('proof', data)
\ No newline at end of file
+        self.assertIn('proof', data)
+
+    def test_get_chain_range(self) -> None:
+        self.app.post('/mine_block', json={'miner_address': 'test_miner'})
+        response = self.app.get('/get_chain?from=2&limit=1')
+        data: Dict[str, Any] = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(data['chain']), 1)
+        self.assertEqual(data['chain'][0]['index'], 2)
+        self.assertEqual((data['from'], data['to']), (2, 2))
+
+    def test_get_chain_streams_cached_blocks(self) -> None:
+        self.app.post('/mine_block', json={'miner_address': 'test_miner'})
+        response = self.app.get('/get_chain')
+        data: Dict[str, Any] = json.loads(response.data)
+
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(len(data['chain']), data['length'])
+        self.assertEqual(data['chain'][-1]['index'], data['length'])
+        self.assertIn('merkle_root', data['chain'][-1])
+
+    def test_debug_logging(self) -> None:
+        with mock.patch.dict(app.config, {'DEBUG': True}), mock.patch('src.utils.middleware.logger') as logger:
+            logger.isEnabledFor.return_value = True
+            self.app.post('/add_transaction', json={'sender': '0', 'receiver': 'debug_user', 'amount': 1})
+            response = self.app.get('/get_chain')
+        bodies = [json.loads(call[0][1]) for call in logger.debug.call_args_list if call[0][0] == 'Request body: %s']
+        self.assertEqual(bodies, [{'sender': '0', 'receiver': 'debug_user', 'amount': 1}])
+        # The streamed chain is left for the client
+        self.assertEqual(len(json.loads(response.data)['chain']), json.loads(response.data)['length'])
+
+    def test_get_chain_not_modified(self) -> None:
+        response = self.app.get('/get_chain')
+        etag: str = response.headers['ETag']
+
+        cached = self.app.get('/get_chain', headers={'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.data, b'')
+
+    def test_headers_and_inclusion_proof(self) -> None:
+        block: Dict[str, Any] = json.loads(self.app.post('/mine_block', json={'miner_address': 'light_client'}).data)
+        transaction_hash: str = hash_transaction(block['transactions'][-1])
+
+        response = self.app.get(f"/get_headers?from={block['index']}")
+        header: Dict[str, Any] = json.loads(response.data)['headers'][0]
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('transactions', header)
+        self.assertEqual(header['transaction_count'], len(block['transactions']))
+
+        response = self.app.get(f'/get_proof/{transaction_hash}')
+        proof: Dict[str, Any] = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        # What a light client checks: the header hashes to the block hash and the path leads to its root
+        verified_header: Dict[str, Any] = {k: v for k, v in header.items() if k not in ('hash', 'transaction_count')}
+        self.assertEqual(hash_block(verified_header), header['hash'])
+        self.assertEqual(proof['block_hash'], header['hash'])
+        self.assertTrue(verify_proof(transaction_hash, proof['proof'], header['merkle_root']))
+        self.assertEqual(self.app.get('/get_proof/unknown').status_code, 404)
+
+    def test_transaction_lookup_and_history(self) -> None:
+        block: Dict[str, Any] = json.loads(self.app.post('/mine_block', json={'miner_address': 'explorer_user'}).data)
+        # The reward comes first in the block
+        transaction_hash: str = hash_transaction(block['transactions'][0])
+
+        response = self.app.get(f'/get_transaction/{transaction_hash}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['block_index'], block['index'])
+        self.assertEqual(self.app.get('/get_transaction/unknown').status_code, 404)
+
+        response = self.app.get('/get_history/explorer_user?limit=1')
+        data: Dict[str, Any] = json.loads(response.data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['history'][0]['transaction_hash'], transaction_hash)
+
+    def test_chain_tip(self) -> None:
+        response = self.app.get('/chain_tip')
+        data: Dict[str, Any] = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['height'], json.loads(self.app.get('/get_chain').data)['length'])
+        self.assertEqual(response.headers['ETag'], f'"{data["tip_hash"]}"')
+        self.assertEqual(self.app.get('/chain_tip', headers={'If-None-Match': response.headers['ETag']}).status_code, 304)
+
+    def test_receive_transactions(self) -> None:
+        response = self.app.post('/receive_transactions', json={'transactions': [
+            {'sender': '0', 'receiver': 'gossip_user', 'amount': 3, 'gas': 0},
+            {'sender': 'nobody', 'receiver': 'gossip_user', 'amount': 3, 'gas': 0.03},
+            {'sender': '0'}
+        ]})
+        data: Dict[str, Any] = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(data['accepted'], 1)
+
+    def test_receive_transactions_from_known_peer(self) -> None:
+        blockchain = importlib.import_module('src.api.routes').blockchain
+        with mock.patch.object(blockchain, 'nodes', {'127.0.0.1:5001', '10.0.0.2:5000'}), \
+                mock.patch.object(blockchain, 'add_transactions', return_value=[]) as add_transactions:
+            self.app.post('/receive_transactions', json={'transactions': []})
+            self.app.post('/receive_transactions', json={'transactions': [], 'origin': '10.0.0.2:5000'})
+            # Forwarded by a reader process, which names the peer it came from
+            self.app.post('/receive_transactions', json={'transactions': []}, headers={'X-Forwarded-For': '10.0.0.2'})
+        # The test client connects from 127.0.0.1
+        self.assertEqual([call[1]['origin'] for call in add_transactions.call_args_list],
+                         ['127.0.0.1:5001', '10.0.0.2:5000', '10.0.0.2:5000'])
+
+    def test_add_transactions_batch(self) -> None:
+        self.app.post('/add_transaction', json={'sender': '0', 'receiver': 'batch_user', 'amount': 10})
+        self.app.post('/mine_block', json={'miner_address': 'test_miner'})
+        response = self.app.post('/add_transactions', json={'transactions': [
+            {'sender': 'batch_user', 'receiver': 'bob', 'amount': 6},
+            {'sender': 'batch_user', 'receiver': 'carol', 'amount': 6},
+            {'sender': 'batch_user', 'receiver': 'bob', 'amount': -1},
+            {'sender': 'batch_user'}
+        ]})
+        data: Dict[str, Any] = json.loads(response.data)
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(data['accepted'], 1)
+        self.assertEqual([result['status'] for result in data['results']], ['accepted', 'rejected', 'rejected', 'rejected'])
+        self.assertEqual(data['results'][1]['error'], 'Insufficient balance')
+        self.assertEqual(data['results'][3]['error'], 'Missing fields: receiver, amount')
+
+        response = self.app.post('/add_transactions', json={'transactions': [{'sender': 'batch_user', 'receiver': 'bob', 'amount': -1}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['accepted'], 0)
+        response = self.app.post('/add_transactions', json={'transactions': [{'sender': '0', 'receiver': 'batch_user', 'amount': 2}]})
+        self.assertEqual(response.status_code, 201)
+
+    def test_deploy_and_execute_contract(self) -> None:
+        response = self.app.post('/deploy_contract', json={'code': "state['calls'] = state.get('calls', 0) + 1", 'owner': 'dev'})
+        address: str = json.loads(response.data)['contract_address']
+        self.assertEqual(response.status_code, 201)
+
+        response = self.app.post(f'/execute_contract/{address}', json={})
+        data: Dict[str, Any] = json.loads(response.data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(data['result']['state'], {'calls': 1})
+
+        response = self.app.post(f'/call_contract/{address}', json={})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['result']['state'], {'calls': 2})
+        self.assertEqual(json.loads(self.app.post(f'/execute_contract/{address}', json={}).data)['result']['state'], {'calls': 2})
+
+        self.assertEqual(self.app.post('/deploy_contract', json={'code': 'import os', 'owner': 'dev'}).status_code, 400)
+        self.assertEqual(self.app.post('/execute_contract/unknown', json={}).status_code, 404)
@@ -0,0 +1,166 @@
+import unittest
+import importlib
+import os
+import tempfile
+import threading
+from unittest import mock
+from typing import List
+import requests
+from src.api.app import app
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.sqlite_store import SQLiteStore
+from src.serving.server import make_writer, migrate_segments
+
+
+class TestWriter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = mock.patch.dict('src.config.config.BLOCKCHAIN_CONFIG', {
+            'STORAGE_BACKEND': 'sqlite',
+            'CHAIN_DIR': self.tmp.name,
+            'CONTRACT_DIR': os.path.join(self.tmp.name, 'contracts')
+        })
+        self.config.start()
+        self.routes = importlib.import_module('src.api.routes')
+        self.blockchain: Blockchain = Blockchain()
+        self.blockchain.executor = None
+        self.blockchain.save_chain()
+        self.original, self.routes.blockchain = self.routes.blockchain, self.blockchain
+
+    def tearDown(self) -> None:
+        self.routes.blockchain = self.original
+        self.blockchain.store.close()
+        self.config.stop()
+        self.tmp.cleanup()
+
+    def test_concurrent_writes_are_serialized(self) -> None:
+        server = make_writer(app, 0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        save_chain = self.blockchain.save_chain
+        active: List[int] = [0, 0]
+
+        def tracked_save_chain(*args, **kwargs) -> None:
+            active[0] += 1
+            active[1] = max(active)
+            try:
+                save_chain(*args, **kwargs)
+            finally:
+                active[0] -= 1
+
+        statuses: List[int] = []
+
+        def post(i: int) -> None:
+            statuses.append(requests.post(f'http://127.0.0.1:{server.server_port}/add_transaction',
+                                          json={'sender': '0', 'receiver': f'user_{i}', 'amount': 1}).status_code)
+
+        clients: List[threading.Thread] = [threading.Thread(target=post, args=(i,)) for i in range(16)]
+        with mock.patch.object(self.blockchain, 'save_chain', tracked_save_chain):
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+        server.shutdown()
+        thread.join()
+
+        self.assertEqual(statuses, [201] * 16)
+        # No two requests ever saved at once, and every transaction reached the store
+        self.assertEqual(active[1], 1)
+        self.assertEqual(len(self.blockchain.store.load_mempool()), 16)
+
+    def test_writes_are_served_while_mining(self) -> None:
+        server = make_writer(app, 0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url: str = f'http://127.0.0.1:{server.server_port}'
+        mining, release = threading.Event(), threading.Event()
+
+        def mine_proof(prev_proof: int, difficulty: int) -> int:
+            mining.set()
+            release.wait(10)
+            self.blockchain.miner.last_stats = {'hashes': 1, 'hash_rate': 1.0}
+            return 100
+
+        statuses: List[int] = []
+
+        def mine() -> None:
+            statuses.append(requests.post(f'{url}/mine_block', json={'miner_address': 'miner'}).status_code)
+
+        with mock.patch.object(self.blockchain.miner, 'mine', mine_proof):
+            miner = threading.Thread(target=mine)
+            miner.start()
+            self.assertTrue(mining.wait(10))
+            response = requests.post(f'{url}/add_transaction', json={'sender': '0', 'receiver': 'alice', 'amount': 1},
+                                     timeout=5)
+            self.assertEqual(response.status_code, 201)
+            release.set()
+            miner.join()
+            self.assertEqual(statuses, [200])
+
+            # A proof found for a tip that changed meanwhile is not turned into a block
+            release.clear()
+            mining.clear()
+            miner = threading.Thread(target=mine)
+            miner.start()
+            self.assertTrue(mining.wait(10))
+            with self.blockchain.lock:
+                self.blockchain.create_block(proof=100, prev_hash='test_hash')
+            release.set()
+            miner.join()
+        server.shutdown()
+        thread.join()
+
+        self.assertEqual(statuses, [200, 409])
+        self.assertEqual(len(self.blockchain.chain), 3)
+
+
+class TestMigration(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory: str = os.path.join(self.tmp.name, 'chain')
+        self.config = mock.patch.dict('src.config.config.BLOCKCHAIN_CONFIG', {
+            'STORAGE_BACKEND': 'segments',
+            'CHAIN_DIR': self.directory,
+            'CONTRACT_DIR': os.path.join(self.tmp.name, 'contracts')
+        })
+        self.config.start()
+
+    def tearDown(self) -> None:
+        self.config.stop()
+        self.tmp.cleanup()
+
+    def test_segment_store_is_migrated(self) -> None:
+        node: Blockchain = Blockchain()
+        node.executor = None
+        node.add_transaction('0', 'alice', 10)
+        node.create_block(proof=100, prev_hash='test_hash')
+        node.add_transaction('alice', 'bob', 2)
+        node.add_node('http://127.0.0.1:5001')
+        address: str = node.deploy_contract("state['calls'] = 1", 'owner')
+        node.save_chain()
+        node.close_store()
+
+        blockchain: Blockchain = Blockchain()
+        blockchain.executor = None
+        self.assertTrue(migrate_segments(blockchain, self.directory))
+        self.assertIsInstance(blockchain.store, SQLiteStore)
+        self.assertEqual(blockchain.chain, node.chain)
+        self.assertEqual(blockchain.mempool.to_list(), node.mempool.to_list())
+        self.assertEqual(blockchain.nodes, node.nodes)
+        self.assertEqual(blockchain.contracts[address].code, node.contracts[address].code)
+        blockchain.store.close()
+
+        # Served from SQLite from now on, the segment files are not read again
+        store: SQLiteStore = SQLiteStore(self.directory)
+        self.assertEqual(store.height, len(node.chain))
+        self.assertIsNotNone(store.load_contract(address))
+        store.close()
+        self.assertFalse(migrate_segments(Blockchain(), self.directory))
+
+    def test_fresh_directory_is_left_alone(self) -> None:
+        self.assertFalse(migrate_segments(Blockchain(), self.directory))
+        self.assertFalse(os.path.exists(self.directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
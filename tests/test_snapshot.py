@@ -0,0 +1,83 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest import mock
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.helpers import hash_block
+from src.blockchain.models import Block
+from src.blockchain.snapshot import SnapshotStore
+
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        # The SQLite backend keeps balances and locations in the database and takes no snapshots
+        self.interval = mock.patch.dict('src.config.config.BLOCKCHAIN_CONFIG', {'SNAPSHOT_INTERVAL': 2,
+                                                                                'STORAGE_BACKEND': 'segments'})
+        self.interval.start()
+        self.blockchain: Blockchain = Blockchain()
+        self.blockchain.executor = None
+        for amount in (10, 20):
+            self.blockchain.add_transaction('0', 'alice', amount)
+            self.blockchain.create_block(proof=amount, prev_hash=hash_block(self.blockchain.chain[-1]))
+        self.blockchain.save_chain(self.tmp.name)
+
+    def tearDown(self) -> None:
+        self.interval.stop()
+        self.tmp.cleanup()
+
+    def mine(self, amount: float) -> None:
+        self.blockchain.add_transaction('0', 'bob', amount)
+        self.blockchain.create_block(proof=amount, prev_hash=hash_block(self.blockchain.chain[-1]))
+
+    def load(self) -> Blockchain:
+        loaded: Blockchain = Blockchain()
+        loaded.executor = None
+        self.assertTrue(loaded.load_chain(self.tmp.name))
+        return loaded
+
+    def test_load_replays_only_blocks_after_snapshot(self) -> None:
+        self.assertEqual(SnapshotStore(self.tmp.name).heights(), [3])
+        self.mine(5)
+        self.blockchain.add_transaction('alice', 'bob', 1)
+        self.blockchain.save_chain(self.tmp.name)
+
+        with mock.patch('src.blockchain.ledger.Ledger.rebuild') as rebuild, \
+                mock.patch.object(Blockchain, '_save_snapshot'), \
+                mock.patch.object(Block, 'from_json', side_effect=Block.from_json) as from_json:
+            loaded = self.load()
+        rebuild.assert_not_called()
+        self.assertEqual(loaded.snapshot_height, 3)
+        # Only the snapshot's block, for its hash, and the block after it were parsed, the rest stay on disk
+        self.assertEqual({json.loads(call[0][0])['index'] for call in from_json.call_args_list}, {3, 4})
+        self.assertEqual(loaded.chain, self.blockchain.chain)
+        self.assertEqual(loaded.ledger.balances, self.blockchain.ledger.balances)
+        self.assertEqual(loaded.get_available_balance('alice'), self.blockchain.get_available_balance('alice'))
+        self.assertEqual(loaded.index.transactions, self.blockchain.index.transactions)
+        self.assertEqual(loaded.index.history, self.blockchain.index.history)
+        self.assertEqual(loaded.processed_transactions.recent, self.blockchain.processed_transactions.recent)
+
+    def test_snapshots_are_rotated(self) -> None:
+        for amount in range(1, 7):
+            self.mine(amount)
+            self.blockchain.save_chain(self.tmp.name)
+        self.assertEqual(SnapshotStore(self.tmp.name).heights(), [9, 7])
+
+    def test_stale_or_corrupt_snapshots_are_skipped(self) -> None:
+        snapshots = SnapshotStore(self.tmp.name)
+        # A snapshot from a fork this chain no longer contains, and one that cannot be read
+        snapshots.save(2, 'orphaned', {})
+        with open(os.path.join(snapshots.directory, f'{1:012d}.snapshot'), 'wb') as file:
+            file.write(b'garbage')
+        self.mine(5)
+        self.blockchain.save_chain(self.tmp.name)
+        self.assertIsNone(snapshots.load(self.blockchain.chain[:2]))
+
+        loaded = self.load()
+        self.assertEqual(loaded.snapshot_height, 3)
+        self.assertEqual(loaded.ledger.balances, self.blockchain.ledger.balances)
+
+
+if __name__ == '__main__':
+    unittest.main()
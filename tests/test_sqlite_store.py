@@ -0,0 +1,165 @@
+import unittest
+import tempfile
+import threading
+from unittest import mock
+from typing import Dict, Any, List
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.chain import StoredChain
+from src.blockchain.helpers import hash_transaction
+from src.blockchain.sqlite_store import SQLiteStore
+from src.config.config import BLOCKCHAIN_CONFIG as config
+
+
+def make_block(index: int, transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {'index': index, 'timestamp': '', 'proof': index, 'prev_hash': str(index - 1), 'transactions': transactions}
+
+
+def transfer(sender: str, receiver: str, amount: float) -> Dict[str, Any]:
+    return {'sender': sender, 'receiver': receiver, 'amount': amount, 'gas': 0 if sender == '0' else amount * 0.01}
+
+
+class TestSQLiteStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory: str = self.tmp.name
+        self.store: SQLiteStore = SQLiteStore(self.directory, batch_blocks=2)
+        self.store.append(make_block(1, [transfer('0', 'alice', 100)]))
+        self.store.append(make_block(2, [transfer('alice', 'bob', 10), transfer('alice', 'alice', 5)]))
+        self.store.append(make_block(3, [transfer('bob', 'carol', 4)]))
+
+    def tearDown(self) -> None:
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_indexed_lookups(self) -> None:
+        self.assertEqual(self.store.height, 3)
+        self.assertEqual(self.store.read_block(2)['index'], 3)
+        self.assertEqual(self.store.find_transaction(hash_transaction(transfer('alice', 'bob', 10))), (2, 0))
+        self.assertEqual(self.store.read_transaction(2, 1).to_dict(), transfer('alice', 'alice', 5))
+        self.assertIsNone(self.store.find_transaction('unknown'))
+
+        self.assertEqual(self.store.get_history('alice', 0, 10), (3, [(2, 1), (2, 0), (1, 0)]))
+        self.assertEqual(self.store.get_history('alice', 1, 1), (3, [(2, 0)]))
+        self.assertAlmostEqual(self.store.get_balance('alice'), 100 - 10.1 - 5.05)
+        self.assertAlmostEqual(self.store.get_balance('bob'), 10 - 4.04)
+        self.assertEqual(self.store.get_balance('nobody'), 0)
+
+    def test_truncate_and_reopen(self) -> None:
+        self.store.truncate(1)
+        self.store.append(make_block(2, [transfer('alice', 'dave', 1)]))
+        self.store.save_state('nodes', ['a:1'])
+        self.store.close()
+
+        self.store = SQLiteStore(self.directory)
+        self.assertEqual([block['index'] for block in self.store.read_blocks()], [1, 2])
+        self.assertEqual(self.store.get_balance('bob'), 0)
+        self.assertAlmostEqual(self.store.get_balance('alice'), 100 - 1.01)
+        self.assertEqual(self.store.get_history('bob', 0, 10), (0, []))
+        self.assertEqual(self.store.load_state('nodes'), ['a:1'])
+        self.assertEqual(self.store.connection.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+    def test_concurrent_writers(self) -> None:
+        errors: List[Exception] = []
+
+        def write(worker: int) -> None:
+            try:
+                for i in range(50):
+                    self.store.save_state(f'state_{worker}', i)
+                    self.store.save_contract(f'contract_{worker}', {'calls': i})
+                    self.store.log_mempool([(f'{worker}_{i}', transfer(f'sender_{worker}', 'bob', 1))])
+            except Exception as e:
+                errors.append(e)
+
+        threads: List[threading.Thread] = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for index in range(4, 54):
+            self.store.append(make_block(index, [transfer('0', 'alice', 1)]))
+        for thread in threads:
+            thread.join()
+        self.store.close()
+
+        self.store = SQLiteStore(self.directory)
+        self.assertEqual(errors, [])
+        self.assertEqual(self.store.height, 53)
+        self.assertEqual([self.store.load_state(f'state_{worker}') for worker in range(4)], [49] * 4)
+        self.assertEqual([self.store.load_contract(f'contract_{worker}') for worker in range(4)], [{'calls': 49}] * 4)
+        self.assertEqual(len(self.store.load_mempool()), 200)
+
+
+class TestSQLiteBackend(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = mock.patch.dict('src.config.config.BLOCKCHAIN_CONFIG', {'STORAGE_BACKEND': 'sqlite'})
+        self.backend.start()
+
+    def tearDown(self) -> None:
+        self.backend.stop()
+        self.tmp.cleanup()
+
+    def test_blockchain_round_trip(self) -> None:
+        blockchain: Blockchain = Blockchain()
+        blockchain.executor = None
+        blockchain.add_transaction('0', 'alice', 10)
+        blockchain.create_block(proof=100, prev_hash='test_hash')
+        blockchain.save_chain(self.tmp.name)
+        address: str = blockchain.deploy_contract("state['calls'] = state.get('calls', 0) + 1", 'dev')
+        blockchain.execute_smart_contract(address, {})
+        blockchain.save_chain(self.tmp.name)
+        self.assertIsInstance(blockchain.store, SQLiteStore)
+        self.assertEqual(blockchain.store.get_balance('alice'), blockchain.get_user_balance('alice'))
+        blockchain.close_store()
+
+        loaded: Blockchain = Blockchain()
+        loaded.executor = None
+        self.assertTrue(loaded.load_chain(self.tmp.name))
+        self.assertEqual(loaded.chain, blockchain.chain)
+        self.assertEqual(loaded.get_user_balance('alice'), 10)
+        # Read back from the database, not CONTRACT_DIR
+        self.assertEqual(loaded.store.load_contract(address)['state'], {'calls': 1})
+        self.assertEqual(loaded.contracts[address].state, {'calls': 1})
+        loaded.store.close()
+
+    def test_lookups_are_served_from_the_store(self) -> None:
+        blockchain: Blockchain = Blockchain()
+        blockchain.executor = None
+        for amount in (10, 20, 30):
+            blockchain.add_transaction('0', 'alice', amount)
+            blockchain.create_block(proof=amount, prev_hash='test_hash')
+        blockchain.add_transaction('alice', 'bob', 5)
+        blockchain.save_chain(self.tmp.name)
+        blockchain.store.close()
+
+        loaded: Blockchain = Blockchain()
+        loaded.executor = None
+        self.assertTrue(loaded.load_chain(self.tmp.name))
+        # Only the tip was parsed, balances and locations stay in the database
+        self.assertIsInstance(loaded.chain, StoredChain)
+        self.assertEqual(loaded.chain.stored, 3)
+        self.assertEqual((loaded.ledger.balances, loaded.index.transactions), ({}, {}))
+        self.assertEqual(loaded.get_user_balance('alice'), 60)
+        self.assertEqual(loaded.get_available_balance('alice'), 60 - 5 - config['GAS_FEE'] * 5)
+        reward_hash: str = hash_transaction(loaded.chain[2]['transactions'][0])
+        self.assertEqual(loaded.get_transaction(reward_hash)['block_index'], 3)
+        self.assertEqual(loaded.get_history('alice', 0, 10)[0], 3)
+        # Mined before the duplicate filter's window, so only the store knows about it
+        loaded.processed_transactions.rebuild([])
+        self.assertFalse(loaded.add_transaction('0', 'alice', 10))
+
+        # A block not saved yet is looked up in memory, a reverted one is hidden in the store
+        loaded.create_block(proof=40, prev_hash='test_hash')
+        self.assertEqual(loaded.get_history('alice', 0, 10)[0], 4)
+        self.assertEqual(loaded.get_history('bob', 0, 10)[1][0]['block_index'], 5)
+        loaded._reorganize(loaded.chain[:2])
+        self.assertIsNone(loaded.get_transaction(reward_hash))
+        self.assertEqual(loaded.get_user_balance('alice'), 10)
+        total, history = loaded.get_history('alice', 0, 10)
+        self.assertEqual((total, [entry['block_index'] for entry in history]), (1, [2]))
+        loaded.save_chain()
+        self.assertEqual(loaded.get_user_balance('alice'), 10)
+        self.assertEqual(loaded.store.height, 2)
+        loaded.store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from typing import Dict, Any, List
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.state import StateOverlay, contract_view
+
+
+class TestStateOverlay(unittest.TestCase):
+    def test_writes_stay_in_the_overlay(self) -> None:
+        base: Dict[str, Any] = {'count': 1, 'owners': ['alice'], 'gone': True}
+        overlay: StateOverlay = StateOverlay(base)
+        overlay['count'] += 1
+        overlay['owners'].append('bob')
+        overlay['new'] = 'x'
+        del overlay['gone']
+
+        self.assertEqual(base, {'count': 1, 'owners': ['alice'], 'gone': True})
+        self.assertEqual(dict(overlay), {'count': 2, 'owners': ['alice', 'bob'], 'new': 'x'})
+        self.assertEqual(overlay.diff(), ({'count': 2, 'owners': ['alice', 'bob'], 'new': 'x'}, ['gone']))
+
+    def test_reads_are_not_part_of_the_diff(self) -> None:
+        overlay: StateOverlay = StateOverlay({'owners': ['alice'], 'count': 1})
+        self.assertEqual(len(overlay['owners']) + overlay['count'], 2)
+        self.assertEqual(overlay.diff(), ({}, []))
+
+
+class TestContractState(unittest.TestCase):
+    def setUp(self) -> None:
+        self.blockchain: Blockchain = Blockchain()
+        self.blockchain.executor = None
+        self.address: str = self.blockchain.deploy_contract(
+            "state['count'] = state.get('count', 0) + params.get('step', 1)\n"
+            "state['fail'] = 1 / params.get('divisor', 1)", 'owner')
+
+    def execute(self, **params: Any) -> Dict[str, Any]:
+        return self.blockchain.execute_smart_contract(self.address, params)['state']
+
+    def test_failed_call_leaves_state_alone(self) -> None:
+        self.execute(step=2)
+        with self.assertRaises(Exception):
+            self.execute(step=5, divisor=0)
+        self.assertEqual(self.blockchain.contracts[self.address].state, {'count': 2, 'fail': 1.0})
+
+    def test_read_only_call(self) -> None:
+        self.execute(step=2)
+        result: Dict[str, Any] = self.blockchain.execute_smart_contract(self.address, {'step': 3}, read_only=True)
+        self.assertEqual(result['state']['count'], 5)
+        self.assertEqual(self.blockchain.contracts[self.address].state['count'], 2)
+
+    def test_overlay_internals_are_unreachable(self) -> None:
+        address: str = self.blockchain.deploy_contract("state.base['owned'] = 'yes'", 'owner')
+        with self.assertRaisesRegex(Exception, 'base'):
+            self.blockchain.execute_smart_contract(address, {}, read_only=True)
+        self.assertEqual(self.blockchain.contracts[address].state, {})
+        with self.assertRaisesRegex(ValueError, 'Prohibited operation'):
+            self.blockchain.deploy_contract("state._StateOverlay__base['owned'] = 'yes'", 'owner')
+        with self.assertRaisesRegex(ValueError, 'Prohibited operation'):
+            self.blockchain.deploy_contract(
+                "match state:\n    case object(_StateOverlay__base=base):\n        base['owned'] = 'yes'", 'owner')
+        # Even code that got past validation finds nothing on the state it is given
+        view = contract_view(StateOverlay({'count': 1}))
+        self.assertEqual([name for name in ('_StateOverlay__base', 'base', '__dict__') if hasattr(view, name)], [])
+
+    def test_reorganize_rolls_back_contract_state(self) -> None:
+        self.execute(step=1)
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        self.execute(step=10)
+        self.blockchain.create_block(proof=101, prev_hash='test_hash')
+        self.execute(step=100)
+        self.assertEqual(self.blockchain.contracts[self.address].state['count'], 111)
+
+        fork: List[Dict[str, Any]] = self.blockchain.chain[:2] + [
+            {'index': 3, 'timestamp': '', 'proof': 7, 'prev_hash': 'other', 'transactions': []},
+            {'index': 4, 'timestamp': '', 'proof': 9, 'prev_hash': 'other', 'transactions': []}
+        ]
+        self.blockchain._reorganize(fork)
+        self.assertEqual(self.blockchain.contracts[self.address].state, {'count': 1, 'fail': 1.0})
+
+    def test_journal_round_trip(self) -> None:
+        self.execute(step=1)
+        self.blockchain.create_block(proof=100, prev_hash='test_hash')
+        self.execute(step=1)
+
+        reloaded: Blockchain = Blockchain()
+        reloaded.contracts = self.blockchain.contracts
+        reloaded.contract_state.contracts = self.blockchain.contracts
+        reloaded.contract_state.load(self.blockchain.contract_state.to_dict())
+        reloaded.contract_state.revert_pending()
+        reloaded.contract_state.revert_block(self.blockchain.chain[-1])
+        self.assertEqual(self.blockchain.contracts[self.address].state, {})
@@ -0,0 +1,126 @@
+import unittest
+import os
+import tempfile
+import threading
+from unittest import mock
+from typing import Dict, Any, List
+from src.blockchain.blockchain import Blockchain
+from src.blockchain.storage import BlockStore, write_json_atomic, read_json
+
+
+def make_block(index: int) -> Dict[str, Any]:
+    return {'index': index, 'timestamp': '', 'proof': index, 'prev_hash': str(index - 1), 'transactions': []}
+
+
+class TestBlockStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory: str = self.tmp.name
+        self.backend = mock.patch.dict('src.config.config.BLOCKCHAIN_CONFIG', {'STORAGE_BACKEND': 'segments'})
+        self.backend.start()
+
+    def tearDown(self) -> None:
+        self.backend.stop()
+        self.tmp.cleanup()
+
+    def test_append_and_reopen(self) -> None:
+        store: BlockStore = BlockStore(self.directory, segment_size=200)
+        for index in range(1, 11):
+            store.append(make_block(index))
+        store.close()
+
+        reopened: BlockStore = BlockStore(self.directory, segment_size=200)
+        blocks: List[Dict[str, Any]] = reopened.read_blocks()
+        self.assertEqual([block['index'] for block in blocks], list(range(1, 11)))
+        self.assertEqual(reopened.read_block(4)['index'], 5)
+        self.assertGreater(len(reopened._segment_numbers()), 1)
+        # Ranges across segments, as the records read_records returns
+        self.assertEqual(list(reopened.iter_records(2, 8)), reopened.read_records(2)[:6])
+
+    def test_truncate(self) -> None:
+        store: BlockStore = BlockStore(self.directory, segment_size=200)
+        for index in range(1, 11):
+            store.append(make_block(index))
+        store.truncate(3)
+        store.append(make_block(99))
+        store.close()
+
+        blocks: List[Dict[str, Any]] = BlockStore(self.directory).read_blocks()
+        self.assertEqual([block['index'] for block in blocks], [1, 2, 3, 99])
+
+    def test_recovers_from_torn_writes(self) -> None:
+        store: BlockStore = BlockStore(self.directory)
+        for index in range(1, 4):
+            store.append(make_block(index))
+        store.close()
+        # a record that never made it into the index, followed by a half-written one
+        with open(os.path.join(self.directory, 'segment_000000.log'), 'ab') as file:
+            file.write(b'{"index":4,"transactions":[]}\n{"index":5,"trans')
+
+        recovered: BlockStore = BlockStore(self.directory)
+        self.assertEqual(recovered.height, 4)
+        self.assertEqual(recovered.read_blocks(3)[0]['index'], 4)
+
+    def test_blockchain_round_trip(self) -> None:
+        blockchain: Blockchain = Blockchain()
+        blockchain.add_transaction('0', 'alice', 10)
+        blockchain.create_block(proof=100, prev_hash='test_hash')
+        blockchain.add_transaction('alice', 'bob', 2)
+        blockchain.add_node('http://127.0.0.1:5001')
+        blockchain.save_chain(self.directory)
+
+        loaded: Blockchain = Blockchain()
+        self.assertTrue(loaded.load_chain(self.directory))
+        self.assertEqual(loaded.chain, blockchain.chain)
+        self.assertEqual(loaded.mempool.to_list(), blockchain.mempool.to_list())
+        self.assertEqual(loaded.nodes, blockchain.nodes)
+        self.assertEqual(loaded.processed_transactions.recent, blockchain.processed_transactions.recent)
+        self.assertEqual(loaded.get_user_balance('alice'), 10)
+
+    def test_mempool_changes_are_logged(self) -> None:
+        blockchain: Blockchain = Blockchain()
+        blockchain.add_transaction('0', 'alice', 10)
+        blockchain.create_block(proof=100, prev_hash='test_hash')
+        blockchain.save_chain(self.directory)
+
+        # Between blocks a save appends the new transactions instead of rewriting the pool or node state
+        with mock.patch.object(BlockStore, 'save_mempool') as save_mempool, \
+                mock.patch.object(BlockStore, 'save_state') as save_state:
+            blockchain.add_transaction('alice', 'bob', 2)
+            blockchain.save_chain(self.directory)
+            blockchain.add_transaction('alice', 'carol', 3)
+            blockchain.save_chain(self.directory)
+        save_mempool.assert_not_called()
+        save_state.assert_not_called()
+        self.assertEqual(blockchain.store.mempool_log_size, 2)
+
+        loaded: Blockchain = Blockchain()
+        self.assertTrue(loaded.load_chain(self.directory))
+        self.assertEqual(loaded.mempool.to_list(), blockchain.mempool.to_list())
+        self.assertAlmostEqual(loaded.get_available_balance('alice'), blockchain.get_available_balance('alice'))
+
+        # Mining empties the pool, and the next save compacts the log
+        blockchain.create_block(proof=200, prev_hash='next_hash')
+        blockchain.save_chain(self.directory)
+        self.assertEqual(blockchain.store.mempool_log_size, 0)
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, 'mempool.log')), 0)
+
+    def test_concurrent_atomic_writes(self) -> None:
+        path = os.path.join(self.directory, 'state.json')
+        errors: List[Exception] = []
+
+        def write(value: int) -> None:
+            try:
+                for _ in range(50):
+                    write_json_atomic(path, {'value': value})
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(value,)) for value in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertIn(read_json(path, None)['value'], range(4))
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.tmp')], [])